@@ -1,14 +1,87 @@
-import fitz  # PyMuPDF：用於處理 PDF 的核心函式庫
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from tkinterdnd2 import DND_FILES, TkinterDnD  # 支援拖放檔案功能
-import ctypes
+import time
+STARTUP_T0 = time.perf_counter()  # 啟動計時起點，見 StartupTimer
 import os
-import webbrowser
 import platform
 import threading  # 用於非同步處理轉換，避免介面卡死
-import queue      # 用於執行緒間的安全通訊
 import re
+import importlib
+import importlib.util
+import collections
+import multiprocessing
+import sys
+import json
+import argparse
+import contextlib
+import hashlib
+import sqlite3
+import struct
+import io
+import heapq
+import itertools
+import zlib
+import mmap
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+try:  # 只有圖形介面需要 Tk；未安裝 python3-tk 的伺服器仍可使用 convert / batch / serve
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+except ImportError:
+    tk = filedialog = messagebox = ttk = None
+
+class StartupTimer:
+    """記錄啟動各階段距行程開始的時間。環境變數 IMG2PDF_STARTUP_REPORT=1 時於結束時印出到 stderr，
+    設為檔案路徑時則附加一行 JSON，便於比較不同版本的啟動時間"""
+    def __init__(self, t0):
+        self.t0 = t0; self.stages = []; self._lock = threading.Lock()
+
+    def mark(self, stage):
+        with self._lock: self.stages.append((stage, time.perf_counter() - self.t0))
+
+    def report(self, target=None):
+        target = os.environ.get("IMG2PDF_STARTUP_REPORT") if target is None else target
+        if not target: return
+        with self._lock: stages = list(self.stages)
+        if target == "1":
+            prev = 0.0
+            for stage, t in stages:
+                print(f"[啟動] {stage:<20} +{(t - prev) * 1000:7.1f} ms  累計 {t * 1000:7.1f} ms", file=sys.stderr); prev = t
+            return
+        try:
+            with open(target, "a", encoding="utf-8") as f:
+                f.write(json.dumps({'time': time.time(), 'argv': sys.argv[1:], 'stages': [{'stage': n, 'ms': round(t * 1000, 1)} for n, t in stages]}, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+startup_timer = StartupTimer(STARTUP_T0)
+
+class _LazyModule:
+    """延後匯入的模組代理：第一次存取屬性時才真正匯入，讓介面不必等待 PyMuPDF、numpy 等大型函式庫載入即可顯示"""
+    def __init__(self, name):
+        self.__dict__.update(_name=name, _module=None, _lock=threading.Lock())
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                t = time.perf_counter(); module = importlib.import_module(self._name)
+                startup_timer.mark(f"匯入 {self._name} ({(time.perf_counter() - t) * 1000:.0f} ms)")
+                self.__dict__['_module'] = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self._load(), attr)
+
+    def preload(self):
+        self._load(); return self
+
+def _optional_module(name):
+    """選用模組：已安裝時回傳延後匯入的代理，未安裝時回傳 None (只查詢套件位置，不執行匯入)"""
+    try: found = importlib.util.find_spec(name.split(".")[0]) is not None
+    except (ImportError, ValueError): found = False
+    return _LazyModule(name) if found else None
+
+fitz = _LazyModule("fitz")  # PyMuPDF：用於處理 PDF 的核心函式庫
+PILImage, ImageOps = _optional_module("PIL.Image"), _optional_module("PIL.ImageOps")  # 選用：以 DCT 縮放解碼快速產生大型 JPEG 的縮圖
+np = _optional_module("numpy")  # 選用：掃描文件模式的二值化、去斑點與歪斜校正
+pikepdf = _optional_module("pikepdf")  # 選用：輸出線性化 (快速網頁檢視) 的 PDF
 
 # 1. 跨平台動態字體偵測與大小補償
 def get_system_font():
@@ -28,6 +101,7 @@ FONT_OFFSET = 2 if platform.system() == "Darwin" else 0
 
 try:
     if platform.system() == "Windows":
+        import ctypes
         ctypes.windll.shcore.SetProcessDpiAwareness(1)
 except Exception:
     pass
@@ -47,7 +121,1572 @@ PAGE_SIZES = {
     "5 x 7 吋 (相片)": (360.0, 504.0),
 }
 
-class PlaceholderEntry(tk.Entry):
+# 2. 平行渲染引擎：點陣化與編碼交由子行程處理，主行程再依清單順序組裝
+OUTPUT_DPI_CHOICES = (150, 200, 300)  # 點陣化時相對於「最終放置尺寸」的輸出解析度
+DEFAULT_OUTPUT_DPI = 300
+DEFAULT_RENDER_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+DEFAULT_MAX_INFLIGHT = DEFAULT_RENDER_WORKERS * 4
+DEFAULT_STREAM_WINDOW = 0  # 串流輸出的頁窗大小；0 表示整份文件於記憶體中組裝，完成後一次存檔
+# 存檔方式：以 CPU 時間換取檔案大小。garbage >= 2 會重新編號物件，串流模式只在最後整份重寫時套用
+SAVE_PROFILES = {
+    "fast": {'garbage': 1},  # 只清除未引用的物件，不壓縮、不比對重複物件
+    "standard": {'garbage': 1, 'deflate': True, 'use_objstms': 1},
+    "compact": {'garbage': 4, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True, 'use_objstms': 1},
+    "web": {'garbage': 4, 'deflate': True, 'deflate_images': True, 'deflate_fonts': True},  # 之後再以 pikepdf 線性化
+}
+SAVE_PROFILE_LABELS = {"fast": "快速存檔", "standard": "標準", "compact": "最小檔案", "web": "網頁最佳化"}
+DEFAULT_SAVE_PROFILE = "standard"
+DEFAULT_CHECKPOINT_PAGES = 100  # 續傳模式未指定串流頁窗時，每累積此頁數寫入一次進度
+DEFAULT_PROGRESS_FPS = 10  # 進度事件的最高發送頻率，逐頁回報會塞滿 Tk 事件佇列
+INSERT_CHUNK_PAGES = 200  # 非串流模式下單次 insert_pdf 的最大頁數，讓取消要求能在合理時間內生效
+PARALLEL_MIN_PAGES = 4  # 需渲染頁數過少時直接在本行程處理，省去建立行程池的成本
+DEFAULT_MAX_OPEN_DOCS = 64  # 文件池同時開啟的檔案上限，避免耗盡檔案描述元
+_WORKER_DOC_LIMIT = 8       # 每個渲染子行程最多保留開啟的來源文件數
+DEFAULT_PREFETCH_BYTES = 256 * 1024 * 1024  # 預讀但尚未取用的來源資料上限；0 表示不預讀
+DEFAULT_PREFETCH_WORKERS = 2
+
+class _PooledDoc:
+    __slots__ = ('doc', 'lock', 'users', 'stale')
+    def __init__(self):
+        self.doc = None; self.lock = threading.Lock(); self.users = 0; self.stale = False
+
+class DocumentPool:
+    """執行緒安全的已開啟文件池，以 LRU 淘汰並限制同時開啟的檔案數。
+    PyMuPDF 文件不可同時被多個執行緒使用，acquire() 會持有該文件專屬的鎖直到離開 with 區塊"""
+    def __init__(self, max_open=DEFAULT_MAX_OPEN_DOCS, passwords=None):
+        self.max_open = max_open
+        self.passwords = passwords if passwords is not None else {}
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    @contextlib.contextmanager
+    def acquire(self, path, password=None, prefetch=None):
+        """取得已開啟的文件；尚未開啟且 prefetch (SourcePrefetcher) 已預讀該檔時由記憶體中的資料開啟"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry.stale:
+                entry = _PooledDoc(); self._entries[path] = entry; self.misses += 1
+            else:
+                self._entries.move_to_end(path); self.hits += 1
+            entry.users += 1
+        try:
+            with entry.lock:
+                if entry.doc is None:
+                    data = prefetch.get(path) if prefetch is not None else None
+                    doc = fitz.open(stream=data, filetype=os.path.splitext(path)[1][1:]) if data is not None else fitz.open(path)
+                    if doc.is_encrypted: doc.authenticate(password if password is not None else self.passwords.get(path, ""))
+                    entry.doc = doc
+                yield entry.doc
+        finally:
+            with self._lock:
+                entry.users -= 1
+                if entry.stale and not entry.users: self._close(path, entry)  # 使用期間已被 discard / clear
+                elif entry.doc is None and self._entries.get(path) is entry: del self._entries[path]  # 開啟失敗
+                self._evict()
+
+    def _evict(self):
+        # 呼叫端需持有 self._lock；正在使用中的文件不會被關閉
+        for path, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_open: break
+            if not entry.users:
+                self._close(path, entry); self.evictions += 1
+
+    def _close(self, path, entry):
+        if self._entries.get(path) is entry: del self._entries[path]
+        if entry.doc is not None: entry.doc.close(); entry.doc = None
+
+    def discard(self, path):
+        """關閉指定檔案；若仍在使用中則於最後一位使用者釋放時關閉"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None: return
+            entry.stale = True
+            if not entry.users: self._close(path, entry)
+            else: del self._entries[path]
+
+    def clear(self):
+        with self._lock:
+            for path, entry in list(self._entries.items()):
+                entry.stale = True
+                if not entry.users: self._close(path, entry)
+            self._entries.clear()
+
+    def is_open(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            return entry is not None and entry.doc is not None and not entry.stale
+
+    def stats(self):
+        with self._lock:
+            return {'open': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class SourcePrefetcher:
+    """依處理順序於背景執行緒預先讀入來源檔案，讓 NAS/SMB 上的讀檔與渲染、編碼重疊進行。
+    已讀入但尚未釋放的資料不超過 budget 位元組；大於預算的檔案改以 mmap 對映並提示系統預讀。
+    get() 取得的資料於 release() 後即不再保留 (已由其開啟的文件仍可使用)"""
+    def __init__(self, paths, budget=DEFAULT_PREFETCH_BYTES, workers=DEFAULT_PREFETCH_WORKERS):
+        self.budget = budget
+        self._cond = threading.Condition()
+        self._queue = collections.deque(dict.fromkeys(paths))
+        self._state = dict.fromkeys(self._queue, 'queued')  # 路徑 -> 'queued'、'loading'、(資料, 計入預算的位元組數) 或 None
+        self._held = 0; self._closed = False
+        self.hits = self.misses = 0
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers if self._queue else 0)]
+        for thread in self._threads: thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed or not self._queue: return
+                path = self._queue.popleft(); self._state[path] = 'loading'
+            loaded = self._load(path)
+            with self._cond:
+                if self._closed or self._state.get(path) != 'loading': self._drop(loaded)  # 已關閉
+                else: self._state[path] = loaded
+                self._cond.notify_all()
+
+    def _load(self, path):
+        """讀入檔案並回傳 (資料, 計入預算的位元組數)；讀取失敗時回傳 None，由呼叫端照常開啟檔案以取得錯誤訊息"""
+        try: size = os.path.getsize(path)
+        except OSError: return None
+        if size > self.budget:
+            try:
+                with open(path, "rb") as f: mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError): return None
+            if hasattr(mapped, "madvise"): mapped.madvise(mmap.MADV_WILLNEED)
+            return memoryview(mapped), 0
+        with self._cond:
+            # 預算不足時等待先前的資料被釋放；目前沒有保留任何資料時一定放行
+            while self._held and self._held + size > self.budget and not self._closed: self._cond.wait()
+            if self._closed: return None
+            self._held += size
+        try:
+            with open(path, "rb") as f: return f.read(), size
+        except OSError:
+            with self._cond: self._held -= size; self._cond.notify_all()
+            return None
+
+    def _drop(self, loaded):
+        # 呼叫端需持有 self._cond
+        if loaded is None: return
+        self._held -= loaded[1]; self._cond.notify_all()
+
+    def get(self, path):
+        """回傳已預讀的資料 (bytes 或 memoryview)；未列入預讀或已釋放時回傳 None，由呼叫端直接開啟檔案"""
+        with self._cond:
+            if self._state.get(path) == 'queued':
+                # 預讀落後於處理進度：不再等待，改由呼叫端同步讀取
+                self._queue.remove(path); self._state[path] = None
+            while self._state.get(path) == 'loading': self._cond.wait()
+            loaded = self._state.get(path)
+            if loaded is None: self.misses += 1; return None
+            self.hits += 1; return loaded[0]
+
+    def release(self, path):
+        """不再需要 path 的預讀資料，釋出預算讓後續檔案繼續讀入"""
+        with self._cond:
+            loaded = self._state.get(path)
+            if loaded in ('queued', 'loading'): return
+            self._state[path] = None; self._drop(loaded)
+
+    def close(self):
+        with self._cond:
+            self._closed = True; self._queue.clear()
+            for path, loaded in list(self._state.items()):
+                if loaded not in ('queued', 'loading'): self._drop(loaded); self._state[path] = None
+            self._cond.notify_all()
+        for thread in self._threads: thread.join()
+
+    def stats(self):
+        with self._cond: return {'hits': self.hits, 'misses': self.misses}
+
+# 渲染子行程各自持有的文件池（行程內渲染時亦使用此池）
+_render_docs = DocumentPool(max_open=_WORKER_DOC_LIMIT)
+
+def compute_page_layout(src_w, src_h, base_size, orient, auto_rotate, scale_mode):
+    """依頁面尺寸設定計算 (頁寬, 頁高, 放置矩形)；base_size 為 None 時沿用來源大小"""
+    if not base_size: return src_w, src_h, (0, 0, src_w, src_h)
+    tw, th = base_size if orient == "直式" else (base_size[1], base_size[0])
+    if auto_rotate and ((src_w > src_h) != (tw > th)): tw, th = th, tw
+    rect = (0, 0, tw, th) if scale_mode == "自動填滿" else (0, 0, src_w, src_h)
+    return tw, th, rect
+
+def placement_scale(src_w, src_h, rect):
+    """來源以保持比例方式放入 rect 時的縮放倍率"""
+    return min((rect[2] - rect[0]) / src_w, (rect[3] - rect[1]) / src_h)
+
+# 掃描文件模式：灰階頁面經區域自適應門檻轉為 1-bit 影像，文字掃描檔的輸出遠小於 8-bit JPEG/PNG
+SCAN_MAX_SKEW = 5.0  # 自動校正歪斜的最大角度 (度)
+
+def gray_array(pix):
+    """以 samples_mv 零複製取得單通道 Pixmap 的 (高, 寬) 陣列；pix 須在使用期間保持存活"""
+    return np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+def adaptive_threshold(gray, block, ratio=0.15):
+    """Bradley 區域自適應門檻：以積分影像求 block×block 鄰域平均，比平均暗 ratio 以上者為黑色 (True)"""
+    h, w = gray.shape; r = block // 2
+    integral = np.zeros((h + 1, w + 1), dtype=np.uint32)
+    np.cumsum(np.cumsum(gray, axis=0, dtype=np.uint32), axis=1, dtype=np.uint32, out=integral[1:, 1:])
+    ys, xs = np.arange(h), np.arange(w)
+    y0, y1 = np.clip(ys - r, 0, h), np.clip(ys + r + 1, 0, h)
+    x0, x1 = np.clip(xs - r, 0, w), np.clip(xs + r + 1, 0, w)
+    # 無號整數的溢位在加減之間互相抵銷，區域總和仍然正確
+    total = integral[np.ix_(y1, x1)]
+    total -= integral[np.ix_(y0, x1)]; total -= integral[np.ix_(y1, x0)]; total += integral[np.ix_(y0, x0)]
+    area = (y1 - y0).astype(np.float32)[:, None] * (x1 - x0).astype(np.float32)[None, :]
+    return gray * area < total * np.float32(1.0 - ratio)
+
+def despeckle(black):
+    """移除 1~2 像素的細小斑點：八鄰域內最多只有一個其他黑點的黑點改為白色"""
+    h, w = black.shape
+    padded = np.pad(black, 1).view(np.uint8)
+    neighbours = sum(padded[dy:dy + h, dx:dx + w] for dy in range(3) for dx in range(3))  # 含自身
+    return black & (neighbours > 2)
+
+def estimate_skew(black, max_angle=SCAN_MAX_SKEW):
+    """投影輪廓法估計文字行的傾斜角度 (度)：沿候選角度投影黑點，列分布越集中代表越接近文字行方向"""
+    sub = max(1, black.shape[1] // 1200)  # 降取樣至寬約 1200 點，兼顧速度與角度解析度
+    ys, xs = np.nonzero(black[::sub, ::sub])
+    if len(ys) < 200: return 0.0
+    step = max(1, len(ys) // 200000)
+    ys, xs = ys[::step].astype(np.float64), xs[::step].astype(np.float64)
+    def score(angle):
+        rows = np.round(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+        counts = np.bincount(rows - rows.min())
+        return float(np.dot(counts, counts))
+    coarse = max(np.arange(-max_angle, max_angle + 1e-9, 0.5), key=score)
+    return float(max(np.arange(coarse - 0.5, coarse + 0.5 + 1e-9, 0.05), key=score))
+
+def render_bilevel(page, zoom, despeckle_on=True, deskew_on=False):
+    """將頁面渲染為灰階後二值化，回傳黑色為 True 的陣列"""
+    matrix = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+    black = adaptive_threshold(gray_array(pix), max(15, (pix.width // 24) | 1))
+    if deskew_on:
+        angle = estimate_skew(black)
+        if abs(angle) >= 0.1:
+            # 以 MuPDF 直接渲染旋轉後的頁面 (品質優於旋轉點陣)，再裁回原尺寸的中央區域
+            h, w = black.shape
+            pix = page.get_pixmap(matrix=matrix.prerotate(-angle), colorspace=fitz.csGRAY, alpha=False)
+            top, left = (pix.height - h) // 2, (pix.width - w) // 2
+            gray = gray_array(pix)[top:top + h, left:left + w]
+            black = adaptive_threshold(gray, max(15, (w // 24) | 1))
+    return despeckle(black) if despeckle_on else black
+
+def encode_bilevel(black):
+    """將黑白陣列編碼為 PDF 影像串流，回傳 (資料, Filter, DecodeParms)。
+    Pillow 具備 libtiff 時使用 CCITT G4，否則以 Flate 壓縮逐列打包的 1-bit 資料"""
+    h, w = black.shape
+    packed = np.packbits(~black, axis=1)  # DeviceGray 1-bit：0 為黑、1 為白，每列補齊至整數位元組
+    if PILImage is not None:
+        from PIL import features
+        if features.check("libtiff"):
+            buf = io.BytesIO()
+            PILImage.frombytes("1", (w, h), packed.tobytes()).save(buf, "TIFF", compression="group4", tiffinfo={278: h})  # 單一 strip
+            with PILImage.open(buf) as tif:
+                offset, length = tif.tag_v2[273][0], tif.tag_v2[279][0]
+                black_is_1 = "true" if tif.tag_v2.get(262) == 1 else "false"
+            return buf.getvalue()[offset:offset + length], "/CCITTFaxDecode", f"<< /K -1 /Columns {w} /Rows {h} /BlackIs1 {black_is_1} >>"
+    return zlib.compress(packed.tobytes(), 9), "/FlateDecode", None
+
+def render_page_payload(task):
+    """子行程進入點：將單一來源頁面點陣化並編碼，回傳影像位元組與目標頁面幾何資訊"""
+    path, page_no, password, opts = task
+    with _render_docs.acquire(path, password or "") as src_doc:
+        src = src_doc[page_no]
+        src_rect = src.rect
+        width, height, rect = compute_page_layout(src_rect.width, src_rect.height, opts['base_size'], opts['orient'], opts['auto_rotate'], opts['scale_mode'])
+        # 依放置後的實際大小換算輸出解析度；圖片另以原始像素為上限，不做無意義的放大
+        zoom = placement_scale(src_rect.width, src_rect.height, rect) * opts['dpi'] / 72
+        if not src_doc.is_pdf:
+            images = src.get_image_info()
+            if images: zoom = min(zoom, images[0]['xres'] / 72)
+        if opts['scan']:
+            black = render_bilevel(src, zoom, opts['despeckle'], opts['deskew'])
+        else:
+            pix = src.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    if opts['scan']:
+        data, filt, parms = encode_bilevel(black)
+        return {'data': data, 'width': width, 'height': height, 'rect': rect, 'bilevel': (black.shape[1], black.shape[0], filt, parms)}
+    if opts['grayscale']: pix = fitz.Pixmap(fitz.csGRAY, pix)
+    if opts['jpeg'] and pix.alpha:
+        new_pix = fitz.Pixmap(fitz.csRGB, pix.width, pix.height, 0); new_pix.clear_with(255); new_pix.copy(pix, pix.irect); pix = new_pix
+    data = pix.tobytes("jpg", jpg_quality=opts['quality']) if opts['jpeg'] else pix.tobytes("png")
+    return {'data': data, 'width': width, 'height': height, 'rect': rect}
+
+def iter_rendered_payloads(tasks, workers=DEFAULT_RENDER_WORKERS, max_inflight=DEFAULT_MAX_INFLIGHT, pool=None):
+    """依 tasks 順序產出渲染結果；進行中的頁數不超過 max_inflight，避免結果堆積占用記憶體。
+    傳入 pool 時共用既有行程池（批次模式），結束時只取消未完成的工作而不關閉行程池"""
+    if pool is None and (workers <= 1 or len(tasks) < PARALLEL_MIN_PAGES):
+        try:
+            for task in tasks: yield render_page_payload(task)
+        finally: _render_docs.clear()
+        return
+    own_pool = pool is None
+    if own_pool: pool = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+    pending = collections.deque()
+    try:
+        it = iter(tasks)
+        for task in it:
+            pending.append(pool.submit(render_page_payload, task))
+            if len(pending) >= max(1, max_inflight): break
+        while pending:
+            payload = pending.popleft().result()
+            task = next(it, None)
+            if task is not None: pending.append(pool.submit(render_page_payload, task))
+            yield payload
+    finally:
+        if own_pool: pool.shutdown(wait=True, cancel_futures=True)
+        else:
+            for fut in pending: fut.cancel()
+
+def iter_cached_payloads(tasks, cache, stats, workers=DEFAULT_RENDER_WORKERS, max_inflight=DEFAULT_MAX_INFLIGHT, pool=None):
+    """先查詢渲染快取，只把未命中的工作交給 iter_rendered_payloads；結果依 tasks 原順序產出並寫回快取。
+    stats 累計命中 (hits) 與未命中 (misses) 頁數"""
+    if cache is None:
+        yield from iter_rendered_payloads(tasks, workers, max_inflight, pool); return
+    fingerprints = {}; keys = []
+    for path, page_no, _, opts in tasks:
+        if path not in fingerprints: fingerprints[path] = file_fingerprint(path)
+        keys.append(RenderCache.make_key(fingerprints[path], page_no, opts))
+    cached = cache.contains(keys)
+    rendered = iter_rendered_payloads([t for t, k in zip(tasks, keys) if k not in cached], workers, max_inflight, pool)
+    try:
+        for task, key in zip(tasks, keys):
+            payload = cache.get_payload(key) if key in cached else None
+            if payload is not None: stats['hits'] += 1
+            else:
+                # 查詢後才被淘汰的項目改在本行程渲染
+                payload = next(rendered) if key not in cached else render_page_payload(task)
+                cache.put_payload(key, payload); stats['misses'] += 1
+            yield payload
+    finally:
+        rendered.close(); _render_docs.clear()
+
+def insert_payload(doc, payload):
+    """新增一頁並放入渲染結果，回傳影像的 xref 供重複頁面直接引用"""
+    page = doc.new_page(width=payload['width'], height=payload['height'])
+    if payload.get('bilevel'):
+        # insert_image 不接受已壓縮的 1-bit 串流，直接建立影像物件再以 xref 引用
+        w, h, filt, parms = payload['bilevel']
+        xref = doc.get_new_xref()
+        doc.update_object(xref, f"<< /Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace /DeviceGray /BitsPerComponent 1 >>")
+        doc.update_stream(xref, payload['data'], compress=0)
+        doc.xref_set_key(xref, "Filter", filt)  # update_stream 會移除 Filter，須於其後設定
+        if parms: doc.xref_set_key(xref, "DecodeParms", parms)
+        page.insert_image(fitz.Rect(payload['rect']), xref=xref, keep_proportion=True)
+        return xref
+    return page.insert_image(fitz.Rect(payload['rect']), stream=payload['data'], keep_proportion=True)
+
+# 3. 與介面無關的轉換核心：GUI、命令列與批次模式共用
+SUPPORTED_EXTS = ('.jpg', '.jpeg', '.png', '.pdf', '.bmp', '.tiff')
+
+class FileEntry:
+    """清單中的一個項目：整份檔案 (page 為 None) 或 PDF 的單一頁面"""
+    __slots__ = ('path', 'page', 'page_count', 'size')
+    def __init__(self, path, page=None, page_count=1, size=None):
+        self.path = path; self.page = page; self.page_count = page_count
+        self.size = size  # 圖片像素尺寸或 PDF 首頁尺寸 (點)；未探測時為 None
+
+    def __repr__(self): return f"FileEntry({self.path!r}, {self.page!r}, {self.page_count!r})"
+
+class ConversionOptions:
+    """一次轉換作業的全部參數，取代直接讀取 Tk 變數"""
+    def __init__(self, page_size="原始大小", orientation="直式", scale_mode="自動填滿", compress=False, quality=80,
+                 grayscale=False, auto_rotate=False, flatten=False, encrypt_password="", metadata=None,
+                 creator="圖片轉PDF小工具", workers=DEFAULT_RENDER_WORKERS, max_inflight=DEFAULT_MAX_INFLIGHT,
+                 stream_window=DEFAULT_STREAM_WINDOW, dpi=DEFAULT_OUTPUT_DPI, scan_mode=False, despeckle=True, deskew=False,
+                 save_profile=DEFAULT_SAVE_PROFILE, checkpoint=False, prefetch_bytes=DEFAULT_PREFETCH_BYTES):
+        if page_size not in PAGE_SIZES: raise ValueError(f"不支援的頁面尺寸：{page_size}")
+        if orientation not in ("直式", "橫式"): raise ValueError(f"不支援的方向：{orientation}")
+        if scale_mode not in ("自動填滿", "保持原尺寸"): raise ValueError(f"不支援的縮放模式：{scale_mode}")
+        self.page_size = page_size; self.orientation = orientation; self.scale_mode = scale_mode
+        if not 36 <= int(dpi) <= 1200: raise ValueError(f"輸出解析度需介於 36 與 1200 DPI：{dpi}")
+        if scan_mode and np is None: raise ValueError("掃描文件模式需要安裝 numpy")
+        if save_profile not in SAVE_PROFILES: raise ValueError(f"不支援的存檔方式：{save_profile}")
+        if save_profile == "web" and pikepdf is None: raise ValueError("網頁最佳化 (線性化) 需要安裝 pikepdf")
+        self.save_profile = save_profile
+        self.compress = bool(compress); self.quality = int(quality); self.dpi = int(dpi)
+        self.grayscale = bool(grayscale); self.auto_rotate = bool(auto_rotate); self.flatten = bool(flatten)
+        self.scan_mode = bool(scan_mode); self.despeckle = bool(despeckle); self.deskew = bool(deskew)
+        self.encrypt_password = encrypt_password or ""
+        self.metadata = dict(metadata or {}); self.creator = creator
+        self.workers = int(workers); self.max_inflight = int(max_inflight)
+        self.stream_window = int(stream_window or 0); self.prefetch_bytes = max(0, int(prefetch_bytes))
+        # 續傳模式沿用串流輸出：每次寫出頁窗時一併記錄進度
+        self.checkpoint = bool(checkpoint)
+        if self.checkpoint and not self.stream_window: self.stream_window = DEFAULT_CHECKPOINT_PAGES
+
+    @property
+    def base_size(self): return PAGE_SIZES.get(self.page_size)
+
+    def layout(self):
+        return {'base_size': self.base_size, 'orient': self.orientation, 'auto_rotate': self.auto_rotate, 'scale_mode': self.scale_mode}
+
+    def job_signature(self, items):
+        """識別「相同輸入與相同設定」的作業，續傳前比對；不影響頁面內容的設定 (平行度、頁窗、文件資訊、存檔方式) 不列入"""
+        ignored = ('workers', 'max_inflight', 'stream_window', 'metadata', 'creator', 'save_profile', 'checkpoint', 'prefetch_bytes')
+        settings = {k: v for k, v in vars(self).items() if k not in ignored}
+        # 展開成單頁的 PDF 會有大量項目指向同一檔案，每個路徑只計算一次指紋
+        fingerprints = {path: file_fingerprint(path) for path in dict.fromkeys(item.path for item in items)}
+        sources = [(item.path, item.page, item.page_count, fingerprints[item.path]) for item in items]
+        return hashlib.sha1(json.dumps([settings, sources], sort_keys=True).encode()).hexdigest()
+
+class ConversionCancelled(Exception):
+    """使用者要求取消轉換；續傳模式下已完成的頁面保留於 .part 檔"""
+
+def iter_source_files(paths, cancel=None):
+    """依序產出 paths 中的檔案；資料夾以 os.scandir 遞迴展開 (依名稱排序、略過隱藏項目與不支援的格式)"""
+    for path in paths:
+        if cancel is not None and cancel.is_set(): return
+        if not os.path.isdir(path): yield path; continue
+        stack = [path]
+        while stack:
+            if cancel is not None and cancel.is_set(): return
+            try:
+                with os.scandir(stack.pop()) as it: entries = sorted(it, key=lambda e: e.name.lower())
+            except OSError: continue  # 無權限或已被移除的資料夾直接略過
+            subdirs = []
+            for entry in entries:
+                if entry.name.startswith('.'): continue
+                try: is_dir = entry.is_dir()
+                except OSError: continue
+                if is_dir: subdirs.append(entry.path)
+                elif entry.name.lower().endswith(SUPPORTED_EXTS): yield entry.path
+            stack.extend(reversed(subdirs))
+
+def probe_source(path, password=None):
+    """讀取來源的頁數與尺寸；加密 PDF 未提供正確密碼時回傳 None"""
+    if path.lower().endswith('.pdf'):
+        with fitz.open(path) as doc:
+            if doc.needs_pass and not doc.authenticate(password or ""): return None
+            return FileEntry(path, None, len(doc), tuple(doc[0].rect[2:]) if len(doc) else None)
+    if not path.lower().endswith(SUPPORTED_EXTS): raise ValueError(f"不支援的檔案格式：{path}")
+    info = read_jpeg_info(path) if path.lower().endswith(('.jpg', '.jpeg')) else None
+    if info and info['width']:
+        size = (info['width'], info['height'])
+        return FileEntry(path, None, 1, size[::-1] if info['orientation'] in (5, 6, 7, 8) else size)
+    if PILImage is not None:
+        with PILImage.open(path) as im: return FileEntry(path, None, 1, im.size)  # 只讀取標頭
+    with fitz.open(path) as doc:
+        return FileEntry(path, None, 1, tuple(doc[0].rect[2:]))
+
+DEFAULT_INGEST_WORKERS = max(2, min(8, 2 * (os.cpu_count() or 1)))  # 探測以 I/O 為主，執行緒可多於核心數
+
+INGEST_BATCH_ROWS = 500   # 每次取回插入 Treeview 的最多列數，避免單次更新過久
+INGEST_POLL_MS = 100
+
+class SourceIngestor:
+    """背景匯入：遞迴掃描資料夾，以執行緒池探測頁數與尺寸，並依加入順序累積結果供 UI 執行緒分批取回。
+    需要密碼的 PDF 不會阻塞匯入，而是另行回報，由呼叫端詢問密碼"""
+    def __init__(self, paths, passwords=None, workers=DEFAULT_INGEST_WORKERS):
+        self.found = 0; self.probed = 0; self.done = False
+        self._passwords = dict(passwords or {}); self._workers = max(1, workers)
+        self._lock = threading.Lock(); self._cancel = threading.Event()
+        self._entries = collections.deque(); self._locked = []; self._failed = []
+        self._thread = threading.Thread(target=self._run, args=(list(paths),), daemon=True)
+        self._thread.start()
+
+    def _run(self, paths):
+        inflight = collections.deque(); limit = 4 * self._workers
+        try:
+            with ThreadPoolExecutor(max_workers=self._workers) as executor:
+                for path in iter_source_files(paths, self._cancel):
+                    inflight.append((path, executor.submit(probe_source, path, self._passwords.get(path))))
+                    with self._lock: self.found += 1
+                    while inflight and (len(inflight) >= limit or inflight[0][1].done()): self._collect(*inflight.popleft())
+                while inflight and not self._cancel.is_set(): self._collect(*inflight.popleft())
+                for _, future in inflight: future.cancel()
+        finally:
+            self.done = True
+
+    def _collect(self, path, future):
+        try: entry = future.result(); error = None
+        except Exception as e: entry = None; error = e
+        with self._lock:
+            self.probed += 1
+            if error is not None: self._failed.append((path, str(error)))
+            elif entry is None: self._locked.append(path)
+            else: self._entries.append(entry)
+
+    def drain(self, limit=None):
+        """取回 (已探測項目, 需要密碼的 PDF, 失敗清單)；limit 限制單次取回的項目數，其餘留待下次"""
+        with self._lock:
+            n = len(self._entries) if limit is None else min(limit, len(self._entries))
+            entries = [self._entries.popleft() for _ in range(n)]
+            locked, self._locked = self._locked, []
+            failed, self._failed = self._failed, []
+        return entries, locked, failed
+
+    @property
+    def finished(self):
+        with self._lock: return self.done and not self._entries and not self._locked and not self._failed
+
+    def cancel(self): self._cancel.set()
+
+def build_items(paths, passwords=None, doc_pool=None):
+    """將檔案路徑轉為轉換清單項目；資料夾遞迴展開為其中支援的檔案，PDF 會讀取頁數並驗證密碼"""
+    passwords = passwords if passwords is not None else {}
+    doc_pool = doc_pool or DocumentPool(passwords=passwords)
+    items = []
+    for path in iter_source_files(paths):
+        if not path.lower().endswith(SUPPORTED_EXTS): raise ValueError(f"不支援的檔案格式：{path}")
+        count = 1
+        if path.lower().endswith('.pdf'):
+            with doc_pool.acquire(path, passwords.get(path, "")) as doc:
+                if doc.is_encrypted: raise ValueError(f"PDF 密碼不正確或未提供：{path}")
+                count = len(doc)
+        items.append(FileEntry(path, None, count))
+    return items
+
+def current_rss_bytes():
+    """目前行程的常駐記憶體用量 (RSS)；無法取得時回傳 0"""
+    try:
+        if platform.system() == "Linux":
+            with open("/proc/self/statm") as f: return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if platform.system() == "Windows":
+            import ctypes
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong)] + [(n, ctypes.c_size_t) for n in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+            counters = PROCESS_MEMORY_COUNTERS(); counters.cb = ctypes.sizeof(counters)
+            ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+            return counters.WorkingSetSize
+        import resource  # macOS 等平台僅能取得行程生命週期內的峰值 (bytes)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return 0
+
+def total_memory_bytes():
+    """實體記憶體總量；無法取得時回傳 0"""
+    try:
+        if platform.system() == "Windows":
+            import ctypes
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong)] + [(n, ctypes.c_ulonglong) for n in (
+                    "ullTotalPhys", "ullAvailPhys", "ullTotalPageFile", "ullAvailPageFile", "ullTotalVirtual", "ullAvailVirtual", "ullAvailExtendedVirtual")]
+            status = MEMORYSTATUSEX(); status.dwLength = ctypes.sizeof(status)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullTotalPhys
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except Exception:
+        return 0
+
+class MemoryMonitor:
+    """於背景定期取樣 RSS，記錄單次轉換期間的記憶體峰值"""
+    def __init__(self, interval=0.05):
+        self.interval = interval; self.peak = current_rss_bytes()
+        self._stop = threading.Event(); self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval): self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True); self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set(); self._thread.join(); self.peak = max(self.peak, current_rss_bytes())
+
+    @property
+    def peak_mb(self): return self.peak / (1024 * 1024)
+
+class ProgressReporter:
+    """將逐頁進度合併為固定頻率的結構化事件，依序交給 listeners (GUI、終端機、JSON Lines 檔) 處理。
+    事件欄位：event (start/progress/done/cancelled/error)、page、total、stage、bytes (已寫入磁碟的位元組)、
+    elapsed、stages (各階段累計秒數)、pages_per_sec、eta (預估剩餘秒數)"""
+    def __init__(self, *listeners, fps=DEFAULT_PROGRESS_FPS):
+        self.listeners = [listener for listener in listeners if listener]
+        self.interval = 1.0 / fps if fps else 0.0
+        self.page = self.total = self.bytes = self._first_page = 0; self.stage = None; self.stages = {}
+        self._started = self._last = time.perf_counter(); self._last_emit = 0.0; self._save_seconds = 0.0
+
+    def start(self, total, resumed=0, **extra):
+        self.total = total; self.page = self._first_page = resumed
+        self._started = self._last = time.perf_counter(); self.emit('start', **extra)
+
+    def update(self, page, stage, bytes_written=0, save_seconds=0.0):
+        """記錄進度；距上次發送未滿一個間隔時只累計，最後一頁一定發送。save_seconds 為輸出累計的存檔秒數，差額計入 save 階段"""
+        now = time.perf_counter()
+        saved = save_seconds - self._save_seconds; self._save_seconds = save_seconds
+        if saved: self.stages['save'] = self.stages.get('save', 0.0) + saved
+        self.stages[stage] = self.stages.get(stage, 0.0) + max(0.0, now - self._last - saved)
+        self._last = now; self.page = page; self.stage = stage; self.bytes = bytes_written
+        if now - self._last_emit >= self.interval or page >= self.total: self.emit('progress', now)
+
+    def emit(self, kind, now=None, **extra):
+        now = now or time.perf_counter(); self._last_emit = now
+        elapsed = now - self._started; rate = (self.page - self._first_page) / elapsed if elapsed > 0 else 0.0
+        event = {'event': kind, 'page': self.page, 'total': self.total, 'stage': self.stage, 'bytes': self.bytes,
+                 'elapsed': round(elapsed, 3), 'stages': {k: round(v, 3) for k, v in self.stages.items()},
+                 'pages_per_sec': round(rate, 2), 'eta': round((self.total - self.page) / rate, 1) if rate else None, **extra}
+        for listener in self.listeners: listener(event)
+
+def jsonl_listener(stream):
+    """將進度事件逐行寫為 JSON 的 listener"""
+    def write(event):
+        stream.write(json.dumps(event, ensure_ascii=False) + "\n"); stream.flush()
+    return write
+
+def terminal_listener(stream=sys.stderr):
+    """於終端機同一行更新進度的 listener"""
+    def write(event):
+        eta = f"，剩餘約 {event['eta']:.0f} 秒" if event['eta'] is not None and event['event'] == 'progress' else ""
+        line = f"\r{event['page']}/{event['total']} 頁，{event['pages_per_sec']:.1f} 頁/秒{eta}"
+        stream.write(f"{line:<48}" + ("\n" if event['event'] in ('done', 'cancelled', 'error') else "")); stream.flush()
+    return write
+
+class PdfOutput:
+    """輸出文件的組裝與存檔。window > 0 時為串流模式：每累積 window 頁即寫入磁碟並重新開啟，
+    之後的頁面以增量更新方式附加，記憶體用量只受頁窗大小限制，而非整份文件"""
+    def __init__(self, save_path, window=0, password="", profile=DEFAULT_SAVE_PROFILE, signature=None):
+        self.save_path = save_path; self.window = max(0, int(window)); self.password = password; self.profile = profile
+        self.part_path = save_path + ".part" if self.window else None
+        self.doc = fitz.open(); self.pending = 0; self.written = False
+        self.save_seconds = 0.0  # 所有存檔動作 (含串流模式的中間寫出) 的累計耗時
+        self.bytes_written = 0
+        self.placed = {}  # 內容鍵 -> (影像 xref, 頁寬, 頁高, 放置矩形, 旋轉角度)，供重複頁面引用
+        # 續傳模式：signature 為作業識別碼，每次寫出頁窗後把已完成頁數與 placed 記錄在 .part.json
+        self.signature = signature; self.state_path = self.part_path + ".json" if signature and self.part_path else None
+        self.resumed_pages = self._resume() if self.state_path else 0
+
+    def _resume(self):
+        """讀取相同作業留下的 .part 與進度檔，回傳已完成的頁數；不相符或損毀時重新開始"""
+        try:
+            with open(self.state_path, encoding="utf-8") as f: state = json.load(f)
+            if state['signature'] != self.signature: return 0
+            doc = fitz.open(self.part_path)
+            if doc.is_encrypted and not doc.authenticate(self.password): doc.close(); return 0
+            if len(doc) != state['pages']: doc.close(); return 0
+        except (OSError, ValueError, KeyError, RuntimeError):
+            return 0
+        self.doc.close(); self.doc = doc; self.written = True
+        self.placed = {_freeze(key): tuple(value) for key, value in state['placed']}
+        return state['pages']
+
+    def _save_kwargs(self):
+        if self.password: return dict(encryption=fitz.PDF_ENCRYPT_AES_256, user_pw=self.password, owner_pw=self.password)
+        return {}
+
+    def page_added(self, count=1):
+        self.pending += count
+        if self.window and self.pending >= self.window: self.flush()
+
+    def room(self):
+        """目前頁窗尚可容納的頁數；非串流模式不設上限"""
+        return self.window - self.pending if self.window else sys.maxsize
+
+    def flush(self):
+        if not self.window or not self.pending: return
+        self._write(self.part_path)
+        self.doc.close(); self.doc = fitz.open(self.part_path)
+        if self.doc.is_encrypted: self.doc.authenticate(self.password)
+        self.pending = 0
+        if self.state_path:
+            # 先寫暫存檔再取代，中途當機也不會留下不完整的進度檔
+            state = {'signature': self.signature, 'pages': len(self.doc), 'placed': list(self.placed.items())}
+            with open(self.state_path + ".tmp", "w", encoding="utf-8") as f: json.dump(state, f)
+            os.replace(self.state_path + ".tmp", self.state_path)
+
+    def _write(self, path, final=False):
+        started = time.perf_counter()
+        # 重複內容已於插入時合併，standard 只需清除未引用的物件 (garbage=1 不重新編號，串流模式記錄的 xref 仍有效)，
+        # 並以物件串流 (use_objstms) 壓縮大量小型物件；串流模式的中間寫出不可重新編號
+        kwargs = SAVE_PROFILES[self.profile]
+        if not final and kwargs['garbage'] > 1: kwargs = SAVE_PROFILES["standard"]
+        # 重新開啟的串流輸出以 garbage=4 比對串流內容需逐一解壓縮 (2000 頁約 30 秒)，大小與 garbage=3 相差無幾
+        elif final and self.window: kwargs = dict(kwargs, garbage=min(kwargs['garbage'], 3))
+        if self.written: self.doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+        elif final and self.profile == "web":
+            # MuPDF 已不支援線性化：先存成未加密的暫存檔，再交由 pikepdf 線性化並加密。
+            # 暫存檔放在只有本人可讀取的暫存資料夾，而非輸出檔旁，避免中途結束時留下未加密的副本
+            import shutil, tempfile
+            temp_dir = tempfile.mkdtemp(prefix="img2pdf-")
+            try:
+                temp_path = os.path.join(temp_dir, "linearize.pdf")
+                self.doc.save(temp_path, **kwargs); linearize_pdf(temp_path, path, self.password)
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        else:
+            self.doc.save(path, **kwargs, **self._save_kwargs()); self.written = True
+        self.save_seconds += time.perf_counter() - started; self.bytes_written = os.path.getsize(path)
+
+    def finish(self, metadata):
+        self.doc.set_metadata(metadata)
+        if not self.window:
+            self._write(self.save_path, final=True); self.doc.close(); return
+        self.pending = 1; self._write(self.part_path); self.doc.close()
+        # 中間寫出的頁窗以增量更新附加，未套用壓縮與物件串流；最後整份重寫，輸出才與非串流模式使用相同的存檔方式
+        self.doc = fitz.open(self.part_path)
+        if self.doc.is_encrypted: self.doc.authenticate(self.password)
+        self.written = False; self._write(self.save_path, final=True); self.doc.close()
+        os.remove(self.part_path)
+        if self.state_path and os.path.exists(self.state_path): os.remove(self.state_path)
+
+    def stats(self):
+        return {'profile': self.profile, 'seconds': self.save_seconds, 'bytes': os.path.getsize(self.save_path)}
+
+    def abort(self, keep_progress=False):
+        """放棄輸出；續傳模式且 keep_progress 時先寫出已完成的頁面，保留 .part 與進度檔供下次續傳"""
+        if self.state_path and keep_progress: self.flush()
+        self.doc.close()
+        if self.state_path: return
+        if self.part_path and os.path.exists(self.part_path): os.remove(self.part_path)
+
+def _freeze(value):
+    """JSON 還原後的巢狀串列轉回 tuple，作為內容鍵使用"""
+    return tuple(_freeze(v) for v in value) if isinstance(value, list) else value
+
+def linearize_pdf(src, dst, password=""):
+    """以 pikepdf 將 src 重寫為線性化 (快速網頁檢視) 的 dst；指定密碼時以 AES-256 加密"""
+    encryption = pikepdf.Encryption(user=password, owner=password, R=6) if password else None
+    with pikepdf.open(src) as pdf:
+        pdf.save(dst, linearize=True, object_stream_mode=pikepdf.ObjectStreamMode.generate, encryption=encryption)
+
+def convert_to_pdf(items, save_path, options, passwords=None, progress=None, pool=None, doc_pool=None, render_cache=None, cancel=None):
+    """依清單順序將圖片與 PDF 合併輸出為單一 PDF；progress 為 ProgressReporter，或舊式的 progress(已處理頁數, 總頁數) 函式 (同樣經過頻率限制)。
+    doc_pool 為共用的來源文件池，未指定時於本次轉換內建立並於結束時關閉；render_cache 為跨作業的渲染快取 (RenderCache)。
+    cancel 為 threading.Event，設定後於下一個頁面邊界引發 ConversionCancelled；options.checkpoint 時可於下次以相同輸入續傳。
+    回傳包含輸出路徑、頁數、續傳起始頁數、耗時、記憶體峰值 (MB)、文件池命中、渲染快取命中、圖片處理方式與存檔 (方式、耗時、大小) 統計的資料"""
+    passwords = passwords or {}
+    if progress is None: progress = ProgressReporter()
+    elif not isinstance(progress, ProgressReporter):
+        callback = progress; progress = ProgressReporter(lambda event: callback(event['page'], event['total']))
+    own_docs = doc_pool is None
+    if own_docs: doc_pool = DocumentPool(passwords=passwords)
+    try:
+        with MemoryMonitor() as monitor:
+            started = time.perf_counter()
+            cache_stats = {'hits': 0, 'misses': 0}; prefetch_stats = {'hits': 0, 'misses': 0}
+            pages, resumed, image_stats, save_stats = _assemble_pdf(items, save_path, options, passwords, progress, pool, doc_pool,
+                                                                    render_cache, cache_stats, cancel, prefetch_stats)
+    finally:
+        if own_docs: doc_pool.clear()
+    return {'output': save_path, 'pages': pages, 'resumed': resumed, 'seconds': time.perf_counter() - started, 'peak_rss_mb': monitor.peak_mb,
+            'doc_pool': doc_pool.stats(), 'render_cache': cache_stats, 'prefetch': prefetch_stats, 'images': image_stats,
+            'save': save_stats}
+
+JPEG_PASSTHROUGH_SOF = (0xC0, 0xC1, 0xC2)  # PDF 的 DCTDecode 可直接解碼的編碼 (基準、延伸、漸進式 Huffman)
+PASSTHROUGH_QUALITY_MARGIN = 5  # 來源品質僅略高於設定值時，重新編碼省下的空間抵不過再次失真
+DEFAULT_SOURCE_DPI = 96         # MuPDF 對未標示解析度的圖片採用的 DPI
+
+def jpeg_effective_dpi(info, options):
+    """來源 JPEG 放置到目標頁面後的實際輸出解析度"""
+    w, h = info['width'], info['height']
+    if info['orientation'] in (5, 6, 7, 8): w, h = h, w
+    dpi = info['dpi'] or DEFAULT_SOURCE_DPI
+    src_w, src_h = w * 72 / dpi, h * 72 / dpi
+    _, _, rect = compute_page_layout(src_w, src_h, options.base_size, options.orientation, options.auto_rotate, options.scale_mode)
+    return dpi / placement_scale(src_w, src_h, rect)
+
+def jpeg_passthrough(path, options):
+    """判斷來源 JPEG 能否不經解碼直接嵌入：編碼方式與色彩可直接使用，且重新編碼無法降低品質或解析度。
+    可以時回傳 insert_image 需要的逆時針旋轉角度 (套用 EXIF 方向)，否則回傳 None"""
+    try: info = read_jpeg_info(path)
+    except OSError: return None
+    if not info or info['sof'] not in JPEG_PASSTHROUGH_SOF or info['precision'] != 8: return None
+    if info['orientation'] not in (1, 3, 6, 8): return None  # 鏡像方向無法單靠旋轉呈現
+    if info['components'] not in ((1,) if options.grayscale else (1, 3)): return None
+    if options.compress:
+        if info['quality'] is None or info['quality'] > options.quality + PASSTHROUGH_QUALITY_MARGIN: return None
+        if jpeg_effective_dpi(info, options) > options.dpi * 1.05: return None
+    return (360 - _EXIF_ROTATION.get(info['orientation'], 0)) % 360
+
+def file_digest(path):
+    """檔案完整內容的 SHA-1"""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""): digest.update(chunk)
+    return digest.hexdigest()
+
+def source_keys(paths):
+    """為各來源指定內容鍵，內容相同的檔案得到相同的鍵。只有大小與其他來源相同的檔案才需要讀取全文計算雜湊"""
+    paths = list(dict.fromkeys(paths))
+    size_of = {}
+    for path in paths:
+        try: size_of[path] = os.path.getsize(path)
+        except OSError: size_of[path] = None
+    sizes = collections.Counter(size_of.values())
+    return {path: ('sha1', file_fingerprint(path)) if size_of[path] is not None and sizes[size_of[path]] > 1 else ('path', path)
+            for path in paths}
+
+def plan_conversion(items, options, passwords):
+    """將清單轉為依序執行的步驟、需平行渲染的工作與圖片處理統計。步驟種類：
+    ('render', [內容鍵...]) 依序取用渲染結果；('image', 路徑, 旋轉角度, 內容鍵) 直接嵌入原始圖片；
+    ('copy', 內容鍵) 重複出現的圖片或渲染頁，直接引用先前插入的影像物件而不重新渲染或嵌入；
+    ('pdf', 路徑, 起始頁, 結束頁) 來源 PDF 的連續頁面區間，同一來源相鄰且頁碼連續的項目會合併為單一區間。
+    統計區分原樣嵌入的 JPEG (passthrough)、無損嵌入的其他圖片 (embedded)、重新編碼的圖片 (reencoded)
+    與引用既有影像的重複頁面 (deduplicated)"""
+    c, gs, flatten, scan = options.compress, options.grayscale, options.flatten, options.scan_mode
+    scan_opts = {'scan': scan, 'despeckle': options.despeckle, 'deskew': options.deskew, 'dpi': options.dpi}
+    img_opts = dict(options.layout(), grayscale=gs, jpeg=c, quality=options.quality, **scan_opts)
+    flat_opts = dict(options.layout(), grayscale=gs, jpeg=True, quality=options.quality, **scan_opts)
+    steps, tasks = [], []
+    stats = {'passthrough': 0, 'embedded': 0, 'reencoded': 0, 'deduplicated': 0}
+    keys = source_keys(item.path for item in items)
+    seen = set(); canonical = {}  # 內容鍵 -> 第一個出現的路徑，內容相同的 PDF 共用同一份開啟的文件
+
+    def add_render(task, key):
+        last = steps[-1] if steps else None
+        if last and last[0] == 'render': last[1].append(key)
+        else: steps.append(('render', [key]))
+        tasks.append(task)
+
+    for item in items:
+        path, page = item.path, item.page
+        from_p, to_p = (page, page) if page is not None else (0, item.page_count - 1)
+        if not path.lower().endswith('.pdf'):
+            key = (keys[path], 0)
+            if key in seen: steps.append(('copy', key)); stats['deduplicated'] += 1; continue
+            seen.add(key)
+            is_jpeg = path.lower().endswith(('.jpg', '.jpeg'))
+            rotate = jpeg_passthrough(path, options) if is_jpeg and not scan else None
+            if rotate is not None or not (gs or c or scan):
+                # 只有 jpeg_passthrough 接受的 JPEG 才算原檔直嵌，被拒絕 (CMYK、鏡像方向等) 者交由 insert_image 處理
+                steps.append(('image', path, rotate or 0, key)); stats['passthrough' if rotate is not None else 'embedded'] += 1
+            else:
+                add_render((path, 0, None, img_opts), key); stats['reencoded'] += 1
+        elif flatten:
+            for p_no in range(from_p, to_p + 1):
+                key = (keys[path], p_no)
+                if key in seen: steps.append(('copy', key)); stats['deduplicated'] += 1; continue
+                seen.add(key); add_render((path, p_no, passwords.get(path, ""), flat_opts), key)
+        else:
+            first = canonical.setdefault(keys[path], path)
+            if passwords.get(first, "") == passwords.get(path, ""): path = first
+            last = steps[-1] if steps else None
+            if last and last[0] == 'pdf' and last[1] == path and last[3] == from_p - 1: steps[-1] = ('pdf', path, last[2], to_p)
+            else: steps.append(('pdf', path, from_p, to_p))
+    return steps, tasks, stats
+
+def skip_completed_steps(steps, tasks, done):
+    """續傳時略過已完成的前 done 頁，回傳剩餘的步驟與對應的渲染工作"""
+    remaining, kept, t = [], [], 0
+    for step in steps:
+        if step[0] == 'render':
+            keys = step[1]; skip = min(done, len(keys)); done -= skip
+            if skip < len(keys): remaining.append(('render', keys[skip:])); kept.extend(tasks[t + skip:t + len(keys)])
+            t += len(keys)
+        elif step[0] == 'pdf':
+            _, path, from_p, to_p = step; skip = min(done, to_p - from_p + 1); done -= skip
+            if from_p + skip <= to_p: remaining.append(('pdf', path, from_p + skip, to_p))
+        elif done: done -= 1
+        else: remaining.append(step)
+    return remaining, kept
+
+def _assemble_pdf(items, save_path, options, passwords, progress, pool, doc_pool, render_cache, cache_stats, cancel, prefetch_stats):
+    signature = options.job_signature(items) if options.checkpoint else None
+    out = PdfOutput(save_path, options.stream_window, options.encrypt_password, options.save_profile, signature)
+    total_pages = sum(item.page_count for item in items)
+    processed_pages = resumed = out.resumed_pages
+    base_size, target_orient, ar, sm = options.base_size, options.orientation, options.auto_rotate, options.scale_mode
+    steps, tasks, stats = plan_conversion(items, options, passwords)
+    if resumed: steps, tasks = skip_completed_steps(steps, tasks, resumed)
+    payloads = iter_cached_payloads(tasks, render_cache, cache_stats, options.workers, options.max_inflight, pool)
+    # 本行程直接讀取的來源 (嵌入的圖片與合併的 PDF) 依步驟順序預讀；渲染工作由子行程自行開檔
+    sources = [step[1] for step in steps if step[0] in ('image', 'pdf') and not doc_pool.is_open(step[1])]
+    prefetch = SourcePrefetcher(sources, options.prefetch_bytes) if options.prefetch_bytes and sources else None
+    progress.start(total_pages, resumed, output=save_path)
+
+    def page_done(stage, count=1):
+        nonlocal processed_pages
+        processed_pages += count
+        out.page_added(count)
+        progress.update(processed_pages, stage, out.bytes_written, out.save_seconds)
+        if cancel is not None and cancel.is_set(): raise ConversionCancelled("已取消轉換")
+
+    placed = out.placed
+
+    try:
+        for step in steps:
+            if step[0] == 'render':
+                for key in step[1]:
+                    payload = next(payloads)
+                    placed[key] = (insert_payload(out.doc, payload), payload['width'], payload['height'], payload['rect'], 0)
+                    page_done('render')
+            elif step[0] == 'copy':
+                xref, width, height, rect, rotate = placed[step[1]]
+                page = out.doc.new_page(width=width, height=height)
+                page.insert_image(fitz.Rect(rect), xref=xref, keep_proportion=True, rotate=rotate)
+                page_done('copy')
+            elif step[0] == 'image':
+                _, path, rotate, key = step
+                with doc_pool.acquire(path, prefetch=prefetch) as img_doc: img_rect = img_doc[0].rect  # 已套用 EXIF 方向
+                width, height, rect = compute_page_layout(img_rect.width, img_rect.height, base_size, target_orient, ar, sm)
+                page = out.doc.new_page(width=width, height=height)
+                data = prefetch.get(path) if prefetch else None
+                # insert_image 不接受 memoryview；以 mmap 對映的大檔已由系統預讀，仍以檔名嵌入
+                source = {'stream': data} if isinstance(data, bytes) else {'filename': path}
+                placed[key] = (page.insert_image(fitz.Rect(rect), keep_proportion=True, rotate=rotate, **source), width, height, rect, rotate)
+                if prefetch: prefetch.release(path)
+                page_done('embed')
+            else:
+                _, path, from_p, to_p = step
+                with doc_pool.acquire(path, passwords.get(path, ""), prefetch) as sub:
+                    to_p = min(to_p, len(sub) - 1)
+                    if base_size:
+                        for p_no in range(from_p, to_p + 1):
+                            sp = sub[p_no]
+                            width, height, rect = compute_page_layout(sp.rect.width, sp.rect.height, base_size, target_orient, ar, sm)
+                            page = out.doc.new_page(width=width, height=height)
+                            page.show_pdf_page(fitz.Rect(rect), sub, p_no)
+                            page_done('merge')
+                    else:
+                        # 整段區間一次插入；串流模式下依頁窗剩餘容量切分，確保每次寫出的頁數不超過頁窗
+                        p_no = from_p
+                        while p_no <= to_p:
+                            end_p = min(to_p, p_no + min(out.room(), INSERT_CHUNK_PAGES) - 1)
+                            # 同一區間分段插入時保留對照表以共用資源；最後一段設定 final 釋放對照表，
+                            # 否則對照表會持有來源文件，文件池關閉的檔案仍佔用檔案描述元直到輸出文件關閉
+                            out.doc.insert_pdf(sub, from_page=p_no, to_page=end_p, final=end_p == to_p)
+                            page_done('merge', end_p - p_no + 1); p_no = end_p + 1
+                if prefetch: prefetch.release(path)
+        out.finish(dict(options.metadata, creator=options.creator, producer="PyMuPDF"))
+        progress.update(processed_pages, 'save', out.bytes_written, out.save_seconds); progress.emit('done')
+    except ConversionCancelled:
+        out.abort(keep_progress=True); progress.emit('cancelled'); raise
+    except BaseException as e:
+        out.abort(); progress.emit('error', message=str(e)); raise
+    finally:
+        payloads.close()
+        if prefetch: prefetch.close(); prefetch_stats.update(prefetch.stats())
+    return processed_pages, resumed, stats, out.stats()
+
+# 4. 轉換作業佇列：作業建立時保存清單與設定的快照，排程器在 CPU 與記憶體上限內並行執行多個作業
+DEFAULT_MAX_JOBS = 2           # 同時執行的作業數上限
+JOB_BASE_MEMORY_MB = 64        # 單一作業的基本記憶體用量估計
+DEFAULT_JOB_MEMORY_FRACTION = 0.5  # 未指定時，所有執行中作業的估計記憶體總量不超過實體記憶體的一半
+JOB_STATE_LABELS = {'queued': '等待中', 'running': '轉換中', 'done': '完成', 'failed': '失敗', 'cancelled': '已取消'}
+
+def estimate_job_memory_mb(items, options):
+    """粗估作業的記憶體峰值 (MB)：整份於記憶體組裝時約與來源檔案總大小相當，串流輸出只需保留一個頁窗；
+    平面化與掃描文件模式另需容納同時渲染中的點陣頁面 (以 A4 與輸出 DPI 估算)"""
+    sizes = {}
+    for item in items:
+        if item.path not in sizes:
+            try: sizes[item.path] = os.path.getsize(item.path)
+            except OSError: sizes[item.path] = 0
+    pages = max(1, sum(item.page_count for item in items))
+    source_mb = sum(sizes.values()) / 2**20
+    if options.stream_window: source_mb *= min(1.0, options.stream_window / pages)
+    raster_mb = 0
+    if options.flatten or options.scan_mode:
+        raster_mb = 8.27 * options.dpi * 11.69 * options.dpi * 3 / 2**20 * max(1, min(options.max_inflight, pages))
+    return JOB_BASE_MEMORY_MB + source_mb + raster_mb
+
+class ConversionJob:
+    """轉換佇列中的一項作業。建立時即複製清單項目與密碼，之後修改清單或介面設定都不影響此作業；
+    options 應為此作業專屬的 ConversionOptions，開始執行時排程器會依可用 CPU 調整其 workers。
+    建立作業不做任何檔案 I/O，可在介面執行緒呼叫"""
+    _ids = itertools.count(1)
+    def __init__(self, items, output, options, passwords=None, priority=0, name=None):
+        self.id = next(ConversionJob._ids); self.items = list(items); self.output = output; self.options = options
+        self.passwords = dict(passwords or {}); self.priority = int(priority); self.name = name or os.path.basename(output)
+        self.state = 'queued'; self.event = None; self.result = None; self.error = None
+        self.cancel = threading.Event(); self.done = threading.Event(); self.workers = 0  # done 於作業結束 (含失敗、取消) 時設定
+        self.memory_mb = None  # 由排程器於背景估算 (需讀取來源檔案大小)，估算完成前不會開始執行
+        self.submitted = time.time(); self.started = self.finished = None
+
+    def is_finished(self): return self.state in ('done', 'failed', 'cancelled')
+
+    @property
+    def pages(self): return sum(item.page_count for item in self.items)
+
+    @property
+    def fraction(self):
+        if self.state == 'done': return 1.0
+        event = self.event
+        return event['page'] / event['total'] if event and event['total'] else 0.0
+
+    def snapshot(self):
+        """可序列化為 JSON 的作業狀態"""
+        event = self.event or {}
+        return {'id': self.id, 'name': self.name, 'output': self.output, 'state': self.state, 'priority': self.priority,
+                'pages': self.pages, 'done_pages': self.pages if self.state == 'done' else event.get('page', 0), 'stage': event.get('stage'),
+                'eta': event.get('eta'), 'memory_mb': round(self.memory_mb, 1) if self.memory_mb is not None else None, 'workers': self.workers, 'error': self.error,
+                'submitted': self.submitted, 'started': self.started, 'finished': self.finished}
+
+class JobScheduler:
+    """依優先順序 (相同時先到先做) 執行轉換作業，限制同時執行的作業數、渲染行程總數 (cpu_limit) 與估計記憶體總量。
+    最高優先的作業資源不足時會等待，不讓後面的小作業插隊以免大作業一直排不到；沒有作業在執行時一律放行。
+    runner(job, progress) 於各作業的執行緒中執行轉換；listener(job, event) 於狀態改變 (event 為 None) 或收到進度事件時被呼叫"""
+    def __init__(self, runner, max_jobs=DEFAULT_MAX_JOBS, cpu_limit=None, memory_limit_mb=None, listener=None):
+        self.runner = runner; self.listener = listener
+        self.max_jobs = max(1, int(max_jobs)); self.cpu_limit = max(1, int(cpu_limit or os.cpu_count() or 1))
+        self.memory_limit_mb = memory_limit_mb or (total_memory_bytes() * DEFAULT_JOB_MEMORY_FRACTION / 2**20) or 2048
+        self._cond = threading.Condition(); self._queue = []; self._seq = itertools.count()
+        self._jobs = collections.OrderedDict(); self._running = set()
+
+    def submit(self, job):
+        """排入作業並立即返回；記憶體估算 (讀取來源檔案大小，網路磁碟上可能很慢) 於背景執行緒進行"""
+        with self._cond:
+            self._jobs[job.id] = job; heapq.heappush(self._queue, (-job.priority, next(self._seq), job.id))
+        self._notify(job)
+        threading.Thread(target=self._estimate, args=(job,), daemon=True).start()
+        return job
+
+    def _estimate(self, job):
+        memory_mb = estimate_job_memory_mb(job.items, job.options)
+        with self._cond:
+            job.memory_mb = memory_mb; self._dispatch()
+
+    def get(self, job_id):
+        with self._cond: return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._cond: return list(self._jobs.values())
+
+    def configure(self, max_jobs=None, cpu_limit=None, memory_limit_mb=None):
+        """調整資源上限；放寬時立即啟動可執行的等待中作業，收緊時不影響已在執行的作業"""
+        with self._cond:
+            if max_jobs: self.max_jobs = max(1, int(max_jobs))
+            if cpu_limit: self.cpu_limit = max(1, int(cpu_limit))
+            if memory_limit_mb: self.memory_limit_mb = memory_limit_mb
+            self._dispatch()
+
+    def set_priority(self, job_id, priority):
+        """調整等待中作業的優先順序 (數字越大越優先)；執行中的作業不會被中斷"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.priority == priority: return
+            job.priority = int(priority)
+            if job.state == 'queued':
+                heapq.heappush(self._queue, (-job.priority, next(self._seq), job_id)); self._dispatch()
+        self._notify(job)
+
+    def cancel(self, job_id):
+        """取消作業：等待中的直接移出佇列，執行中的於下一個頁面邊界停止"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished(): return False
+            job.cancel.set()
+            if job.state == 'queued':
+                job.state = 'cancelled'; job.finished = time.time(); job.done.set(); self._cond.notify_all()
+        self._notify(job)
+        return True
+
+    def cancel_all(self):
+        for job in self.jobs(): self.cancel(job.id)
+
+    def remove_finished(self):
+        """移除已結束的作業紀錄並回傳"""
+        with self._cond:
+            removed = [job for job in self._jobs.values() if job.is_finished()]
+            for job in removed: del self._jobs[job.id]
+        return removed
+
+    def active(self):
+        with self._cond: return sum(not job.is_finished() for job in self._jobs.values())
+
+    def wait(self, timeout=None):
+        """等待所有作業結束；逾時時回傳 False"""
+        with self._cond: return self._cond.wait_for(lambda: not any(not job.is_finished() for job in self._jobs.values()), timeout)
+
+    def stats(self):
+        with self._cond:
+            states = collections.Counter(job.state for job in self._jobs.values())
+            return {'states': dict(states), 'running': len(self._running), 'max_jobs': self.max_jobs,
+                    'cpu_used': sum(job.workers for job in self._running), 'cpu_limit': self.cpu_limit,
+                    'memory_used_mb': round(sum(job.memory_mb for job in self._running), 1), 'memory_limit_mb': round(self.memory_limit_mb, 1)}
+
+    def _notify(self, job, event=None):
+        if self.listener: self.listener(job, event)
+
+    def _peek(self):
+        """最高優先的等待中作業；順便丟棄已取消或已調整優先順序的舊堆積項目"""
+        while self._queue:
+            neg_priority, _, job_id = self._queue[0]; job = self._jobs.get(job_id)
+            if job is not None and job.state == 'queued' and -neg_priority == job.priority: return job
+            heapq.heappop(self._queue)
+        return None
+
+    def _fits(self, job):
+        if not self._running: return True
+        if len(self._running) >= self.max_jobs or sum(j.workers for j in self._running) >= self.cpu_limit: return False
+        return sum(j.memory_mb for j in self._running) + job.memory_mb <= self.memory_limit_mb
+
+    def _dispatch(self):
+        """於持有鎖時呼叫：依序啟動資源足夠的等待中作業，並把剩餘的 CPU 配給作業的渲染行程"""
+        while True:
+            job = self._peek()
+            # 最高優先的作業尚未估算完成時同樣等待，維持優先順序
+            if job is None or job.memory_mb is None or not self._fits(job): return
+            heapq.heappop(self._queue)
+            options = job.options; requested = max(1, options.workers)
+            job.workers = max(1, min(requested, self.cpu_limit - sum(j.workers for j in self._running)))
+            options.workers = job.workers; options.max_inflight = max(job.workers, options.max_inflight * job.workers // requested)
+            job.state = 'running'; job.started = time.time(); self._running.add(job)
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        def listen(event):
+            job.event = event; self._notify(job, event)
+        self._notify(job)
+        try:
+            job.result = self.runner(job, ProgressReporter(listen)); state = 'done'
+        except ConversionCancelled: state = 'cancelled'
+        except Exception as e: job.error = str(e); state = 'failed'
+        with self._cond:
+            job.state = state; job.finished = time.time(); job.done.set(); self._running.discard(job)
+            self._dispatch(); self._cond.notify_all()
+        self._notify(job)
+
+# 5. 持久化縮圖快取：以檔案內容指紋為鍵存於 SQLite，重新開啟相同檔案時不需重新渲染
+THUMB_SIZE = 50
+DEFAULT_THUMB_CACHE_BYTES = 256 * 1024 * 1024
+
+def get_cache_dir(*parts):
+    """各平台慣用的使用者快取資料夾，可用環境變數 IMG2PDF_CACHE_DIR 覆寫"""
+    base = os.environ.get("IMG2PDF_CACHE_DIR")
+    if not base:
+        if platform.system() == "Windows": base = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.expanduser("~"), "ImageToPdfConverter", "Cache")
+        elif platform.system() == "Darwin": base = os.path.expanduser("~/Library/Caches/ImageToPdfConverter")
+        else: base = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "image-pdf-converter")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+FINGERPRINT_MEMO_SIZE = 4096  # 記憶的指紋筆數上限
+_fingerprint_memo = collections.OrderedDict(); _fingerprint_lock = threading.Lock()
+
+def file_fingerprint(path):
+    """檔案完整內容的 SHA-1，作為渲染快取、續傳與重複內容比對的鍵；與路徑及修改時間無關，檔案搬移、改名或複製後仍可命中。
+    結果依 (路徑, 大小, 修改時間) 記憶，檔案未變更時不必重新讀取全文"""
+    st = os.stat(path); memo_key = (path, st.st_size, st.st_mtime_ns)
+    with _fingerprint_lock:
+        if memo_key in _fingerprint_memo:
+            _fingerprint_memo.move_to_end(memo_key); return _fingerprint_memo[memo_key]
+    digest = file_digest(path)
+    with _fingerprint_lock:
+        _fingerprint_memo[memo_key] = digest
+        if len(_fingerprint_memo) > FINGERPRINT_MEMO_SIZE: _fingerprint_memo.popitem(last=False)
+    return digest
+
+def file_quick_fingerprint(path):
+    """只讀取開頭 4 KB 的快速指紋 (大小、修改時間與開頭內容)，作為縮圖快取的鍵：命中時不必讀取全文，
+    檔案搬移或改名後仍可命中。極少數碰撞只會顯示錯誤的縮圖，不影響輸出內容"""
+    st = os.stat(path)
+    with open(path, "rb") as f: head = f.read(4096)
+    return hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}:".encode() + head).hexdigest()
+
+_EXIF_ROTATION = {3: 180, 6: 90, 8: 270}  # EXIF Orientation → 順時針旋轉角度（不處理鏡像）
+
+# IJG 標準亮度量化表 (品質 50)；與檔案中的量化表比較即可估計編碼品質
+_IJG_LUMA_TABLE = (16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55, 14, 13, 16, 24, 40, 57, 69, 56,
+                   14, 17, 22, 29, 51, 87, 80, 62, 18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+                   49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99)
+
+def estimate_jpeg_quality(table):
+    """由亮度量化表反推 IJG 品質 (1~100)；非 IJG 編碼器產生的檔案只能得到近似值"""
+    scale = sum(table) * 100.0 / sum(_IJG_LUMA_TABLE)
+    quality = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+    return max(1, min(100, int(round(quality))))
+
+def read_jpeg_info(path):
+    """僅掃描 JPEG 標頭（至 SOS 為止），回傳尺寸、色彩通道數、EXIF 方向與內嵌縮圖、
+    編碼方式 (SOF 標記與取樣精度)、估計品質與解析度 (DPI，未標示時為 None)；非 JPEG 回傳 None"""
+    info = {'width': 0, 'height': 0, 'components': 0, 'orientation': 1, 'exif_thumbnail': None,
+            'sof': None, 'precision': 0, 'quality': None, 'dpi': None}
+    jfif_dpi = exif_dpi = None
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8": return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA): break
+            length = struct.unpack(">H", f.read(2))[0]
+            segment = f.read(length - 2)
+            kind = marker[1]
+            if kind == 0xE1 and segment[:6] == b"Exif\x00\x00":
+                info['orientation'], info['exif_thumbnail'], exif_dpi = _parse_exif(segment[6:])
+            elif kind == 0xE0 and segment[:5] == b"JFIF\x00" and len(segment) >= 12:
+                units, density = segment[7], struct.unpack(">H", segment[8:10])[0]
+                if units in (1, 2) and density: jfif_dpi = density * (2.54 if units == 2 else 1)
+            elif kind == 0xDB:
+                pos = 0
+                while pos < len(segment):  # 一個 DQT 區段可包含多張表，每張 64 個 8 或 16 位元值
+                    wide, table_id = segment[pos] >> 4, segment[pos] & 0x0F
+                    table = struct.unpack(">64H" if wide else "64B", segment[pos + 1: pos + 1 + (128 if wide else 64)])
+                    if table_id == 0: info['quality'] = estimate_jpeg_quality(table)
+                    pos += 1 + (128 if wide else 64)
+            elif kind in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                info['sof'], info['precision'] = kind, segment[0]
+                info['height'], info['width'] = struct.unpack(">HH", segment[1:5]); info['components'] = segment[5]
+    info['dpi'] = jfif_dpi or exif_dpi
+    return info
+
+def _parse_exif(tiff):
+    """解析 EXIF 的 TIFF 結構，回傳 (方向, IFD1 內嵌 JPEG 縮圖, 水平解析度 DPI)"""
+    orientation, thumb, dpi = 1, None, None
+    try:
+        endian = {b"II": "<", b"MM": ">"}[tiff[:2]]
+        def read_ifd(offset):
+            count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+            tags = {}
+            for n in range(count):
+                entry = tiff[offset + 2 + n * 12: offset + 14 + n * 12]
+                tag, typ = struct.unpack(endian + "HH", entry[:4])
+                tags[tag] = struct.unpack(endian + ("H" if typ == 3 else "I"), entry[8:10] if typ == 3 else entry[8:12])[0]
+                if typ == 5:  # RATIONAL 存放於偏移位置：分子 / 分母
+                    num, den = struct.unpack(endian + "II", tiff[tags[tag]:tags[tag] + 8]); tags[tag] = num / den if den else 0
+            next_offset = struct.unpack(endian + "I", tiff[offset + 2 + count * 12: offset + 6 + count * 12])[0]
+            return tags, next_offset
+        ifd0, ifd1_offset = read_ifd(struct.unpack(endian + "I", tiff[4:8])[0])
+        orientation = ifd0.get(0x0112, 1)
+        if ifd0.get(0x011A): dpi = ifd0[0x011A] * (2.54 if ifd0.get(0x0128) == 3 else 1)
+        if ifd1_offset:
+            ifd1, _ = read_ifd(ifd1_offset)
+            start, length = ifd1.get(0x0201), ifd1.get(0x0202)
+            if start and length and tiff[start:start + 2] == b"\xff\xd8": thumb = tiff[start:start + length]
+    except (KeyError, struct.error): pass
+    return orientation, thumb, dpi
+
+def _pixmap_thumbnail(page, size, rotation=0):
+    rect = page.rect
+    if rotation in (90, 270): rect = fitz.Rect(0, 0, rect.height, rect.width)
+    zoom = min(size / rect.width, size / rect.height)
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom).prerotate(rotation)).tobytes("png")
+
+def render_raster_thumbnail(path, size=THUMB_SIZE):
+    """點陣圖片的快速縮圖：優先使用 EXIF 內嵌縮圖，其次以 Pillow 縮放解碼；皆不可用時回傳 None，
+    由呼叫端改以 PyMuPDF 完整解碼。輸出方向與 PyMuPDF 一致（已套用 EXIF 方向）"""
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        info = read_jpeg_info(path)
+        thumb = info and info['exif_thumbnail']
+        if thumb:
+            with fitz.open(stream=thumb, filetype="jpg") as doc:
+                page = doc[0]
+                # 部分相機的內嵌縮圖長寬比與原圖不同（含黑邊），此時改用其他方式
+                if info['width'] and abs(page.rect.width / page.rect.height - info['width'] / info['height']) < 0.02:
+                    return _pixmap_thumbnail(page, size, _EXIF_ROTATION.get(info['orientation'], 0))
+    if PILImage is None: return None
+    with PILImage.open(path) as im:
+        im.draft("RGB", (size, size))  # JPEG 於解碼階段即以 1/2、1/4、1/8 比例縮小
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((size, size))
+        buf = io.BytesIO()
+        im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB").save(buf, "PNG")
+        return buf.getvalue()
+
+DEFAULT_THUMB_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+class ThumbnailScheduler:
+    """多執行緒縮圖排程器。每個鍵 (路徑, 頁碼) 同時只會有一筆工作；重複請求只會調整優先順序，
+    retain() 可取消不再需要的工作。完成的結果累積後以 wakeup() 通知 UI 執行緒一次取回 (drain)"""
+    def __init__(self, loader, wakeup, workers=DEFAULT_THUMB_WORKERS):
+        self.loader = loader; self.wakeup = wakeup
+        self._cond = threading.Condition()
+        self._heap = []; self._pending = {}; self._running = set(); self._seq = 0
+        self._results = []; self._stopped = False
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(max(1, workers))]
+        for t in self._threads: t.start()
+
+    def request(self, key, priority):
+        """要求產生縮圖；數字越小越優先，已排入者只會提高優先順序"""
+        with self._cond:
+            if key in self._running or self._pending.get(key, priority + 1) <= priority: return
+            self._pending[key] = priority; self._seq += 1
+            heapq.heappush(self._heap, (priority, self._seq, key))
+            self._cond.notify()
+
+    def retain(self, keys):
+        """取消不在 keys 之中的待處理工作（執行中的工作仍會完成）"""
+        with self._cond:
+            for key in [k for k in self._pending if k not in keys]: del self._pending[key]
+            if len(self._heap) > 2 * len(self._pending) + 64:  # 清除已失效的堆積項目
+                self._heap = [e for e in self._heap if self._pending.get(e[2]) == e[0]]; heapq.heapify(self._heap)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._heap: self._cond.wait()
+                if self._stopped: return
+                priority, _, key = heapq.heappop(self._heap)
+                if self._pending.get(key) != priority: continue  # 已取消或已被更高優先的項目取代
+                del self._pending[key]; self._running.add(key)
+            try: data = self.loader(*key)
+            except Exception: data = None
+            with self._cond:
+                self._running.discard(key)
+                notify = not self._results
+                self._results.append((key, data))
+            if notify: self.wakeup()
+
+    def drain(self):
+        """於 UI 執行緒取回目前所有完成的結果"""
+        with self._cond:
+            results, self._results = self._results, []
+        return results
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True; self._cond.notify_all()
+
+# 6. 放大預覽：先顯示低解析度全頁，再以 clip 只渲染可見範圍的圖塊；結果存於有上限的記憶體快取
+PREVIEW_TILE = 512          # 圖塊邊長 (像素)
+PREVIEW_LOWRES_SIZE = 384   # 低解析度全頁的長邊 (像素)
+PREVIEW_ZOOM_STEPS = (0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0)  # 相對於「符合視窗」的縮放倍率
+PREVIEW_MAX_BACKDROP_SCALE = 4  # 低解析度全頁放大超過此倍數時不再墊底，避免產生過大的影像
+DEFAULT_PREVIEW_CACHE_BYTES = 192 * 1024 * 1024
+DEFAULT_PREVIEW_WORKERS = 2
+
+PREVIEW_MASTER_MAX_PIXELS = 32 * 1000 * 1000  # 掃描頁母圖的像素上限
+
+def preview_scan_zoom(page):
+    """頁面以點陣影像為主 (掃描檔、相片，影像覆蓋四分之一頁以上) 時回傳影像原始解析度對應的縮放倍率，否則回傳 0"""
+    rect = page.rect; zoom = 0
+    for info in page.get_image_info():
+        box = fitz.Rect(info['bbox']) & rect
+        if box.is_empty or box.width * box.height < 0.25 * rect.width * rect.height: continue
+        zoom = max(zoom, max(info['width'], info['height']) / max(box.width, box.height))
+    return min(zoom, (PREVIEW_MASTER_MAX_PIXELS / (rect.width * rect.height)) ** 0.5)
+
+def preview_master(page, cache, key):
+    """掃描頁每次以 clip 渲染都會重新解碼整張影像，因此以原始解析度渲染一次整頁作為母圖存入快取，
+    之後的圖塊與低解析度全頁都由母圖裁切縮放。回傳 (母圖, 縮放倍率)；非掃描頁的母圖為 None"""
+    master = cache.get(key)
+    if master is None:
+        zoom = preview_scan_zoom(page)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False) if zoom else None
+        master = (pix, zoom); cache.put(key, master, pix.stride * pix.height if pix else 0)
+    return master
+
+def render_preview_lowres(page, master=None, size=PREVIEW_LOWRES_SIZE):
+    """低解析度全頁 (PPM)"""
+    rect = page.rect; zoom = size / max(rect.width, rect.height)
+    if master and master[0]:
+        return fitz.Pixmap(master[0], max(1, round(rect.width * zoom)), max(1, round(rect.height * zoom))).tobytes("ppm")
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("ppm")
+
+def render_preview_tile(page, zoom, tx, ty, master=None, tile=PREVIEW_TILE):
+    """縮放後頁面上第 (tx, ty) 個 tile × tile 像素的圖塊 (PPM)。有母圖且未超過其解析度時由母圖裁切縮放，
+    否則以 clip 只渲染該範圍；clip 以旋轉後的頁面座標表示"""
+    step = tile / zoom
+    clip = fitz.Rect(tx * step, ty * step, (tx + 1) * step, (ty + 1) * step) & page.rect
+    if clip.is_empty: raise ValueError(f"圖塊 ({tx}, {ty}) 超出頁面範圍")
+    if master and master[0] and zoom <= master[1]:
+        pix = master[0]; area = fitz.Rect(clip.x0 * master[1], clip.y0 * master[1], clip.x1 * master[1], clip.y1 * master[1]).round() & pix.irect
+        crop = fitz.Pixmap(pix.colorspace, area, False); crop.copy(pix, area)
+        return fitz.Pixmap(crop, max(1, round(clip.width * zoom)), max(1, round(clip.height * zoom))).tobytes("ppm")
+    return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False).tobytes("ppm")
+
+class PreviewCache:
+    """預覽影像的記憶體 LRU 快取，以資料位元組數限制總量；所有預覽視窗共用，重新開啟或來回翻頁時不必重新渲染。
+    鍵的第 2、3 個元素為 (路徑, 頁碼)"""
+    def __init__(self, max_bytes=DEFAULT_PREVIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes; self.bytes = 0
+        self._lock = threading.Lock(); self._entries = collections.OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1; return None
+            self._entries.move_to_end(key); self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self.bytes -= old[1]
+            self._entries[key] = (value, size); self.bytes += size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, n) = self._entries.popitem(last=False); self.bytes -= n; self.evictions += 1
+
+    def discard_path(self, path):
+        """來源檔案移出清單後丟棄其所有預覽影像"""
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == path]: self.bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock: self._entries.clear(); self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class BlobStore:
+    """以 SQLite 儲存的鍵值快取；總容量超過上限時依最後使用時間淘汰"""
+    def __init__(self, path, max_bytes):
+        self.path = path; self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        # 舊版以 thumbs 為表名，其中的鍵使用舊的檔案指紋已不會再命中，直接移除並釋放空間
+        if self._db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'thumbs'").fetchone():
+            self._db.execute("DROP TABLE thumbs"); self._db.commit(); self._db.execute("VACUUM")
+        self._db.execute("CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def contains(self, keys):
+        """回傳 keys 中已存在於快取的鍵"""
+        keys = list(keys); found = set()
+        with self._lock:
+            for n in range(0, len(keys), 500):  # SQLite 單一查詢的參數數量有上限
+                chunk = keys[n:n + 500]
+                found.update(row[0] for row in self._db.execute(f"SELECT key FROM blobs WHERE key IN ({','.join('?' * len(chunk))})", chunk))
+        return found
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM blobs WHERE key = ?", (key,)).fetchone()
+            if row is None: return None
+            self._db.execute("UPDATE blobs SET last_used = ? WHERE key = ?", (time.time(), key)); self._db.commit()
+            return row[0]
+
+    def put(self, key, data):
+        with self._lock:
+            old = self._db.execute("SELECT size FROM blobs WHERE key = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO blobs (key, data, size, last_used) VALUES (?, ?, ?, ?)", (key, data, len(data), time.time()))
+            self._total += len(data) - (old[0] if old else 0)
+            if self._total > self.max_bytes: self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # 一次淘汰至上限的九成，避免每次寫入都觸發淘汰
+        target = self.max_bytes * 0.9
+        for key, size in self._db.execute("SELECT key, size FROM blobs ORDER BY last_used").fetchall():
+            if self._total <= target: break
+            self._db.execute("DELETE FROM blobs WHERE key = ?", (key,)); self._total -= size
+
+    def close(self):
+        with self._lock: self._db.close()
+
+class ThumbnailStore(BlobStore):
+    """縮圖的磁碟快取，鍵值為 (快速指紋, 頁碼, 縮圖尺寸)"""
+    def __init__(self, path=None, max_bytes=DEFAULT_THUMB_CACHE_BYTES):
+        super().__init__(path or os.path.join(get_cache_dir(), "thumbnails.sqlite3"), max_bytes)
+
+    @staticmethod
+    def make_key(path, page, size=THUMB_SIZE):
+        return f"{file_quick_fingerprint(path)}:{page}:{size}"
+
+DEFAULT_RENDER_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+RENDER_CACHE_VERSION = 2  # 渲染結果的格式或演算法改變時遞增，使舊的快取全部失效
+
+class RenderCache(BlobStore):
+    """跨作業的渲染結果快取：鍵值為 (來源內容指紋, 頁碼, 影響渲染結果的全部設定)，
+    只改變中繼資料、加密或頁面順序後重新轉換時，幾乎不必再次點陣化與編碼"""
+    def __init__(self, path=None, max_bytes=DEFAULT_RENDER_CACHE_BYTES):
+        super().__init__(path or os.path.join(get_cache_dir(), "renders.sqlite3"), max_bytes)
+
+    @staticmethod
+    def make_key(fingerprint, page_no, opts):
+        settings = hashlib.sha1(json.dumps(opts, sort_keys=True).encode()).hexdigest()[:16]
+        return f"v{RENDER_CACHE_VERSION}:{fingerprint}:{page_no}:{settings}"
+
+    def get_payload(self, key):
+        blob = self.get(key)
+        if blob is None: return None
+        size = struct.unpack(">I", blob[:4])[0]
+        payload = json.loads(blob[4:4 + size]); payload['data'] = blob[4 + size:]
+        return payload
+
+    def put_payload(self, key, payload):
+        meta = json.dumps({k: v for k, v in payload.items() if k != 'data'}).encode()
+        self.put(key, struct.pack(">I", len(meta)) + meta + payload['data'])
+
+# 7. 待處理清單的資料模型：以 Fenwick tree 維護頁數前綴和，清單異動時只需局部更新
+class PageCountIndex:
+    """Fenwick tree：O(log n) 查詢前 i 個項目的頁數總和及單點更新；插入或刪除時以 O(n) 重建"""
+    def __init__(self, counts=()):
+        self.rebuild(counts)
+
+    def rebuild(self, counts):
+        tree = [0] * (len(counts) + 1)
+        for i, count in enumerate(counts, 1):
+            tree[i] += count
+            parent = i + (i & -i)
+            if parent < len(tree): tree[parent] += tree[i]
+        self._tree = tree
+
+    def add(self, idx, delta):
+        i = idx + 1
+        while i < len(self._tree):
+            self._tree[i] += delta; i += i & -i
+
+    def prefix(self, idx):
+        total, i = 0, idx
+        while i > 0:
+            total += self._tree[i]; i -= i & -i
+        return total
+
+class FileListModel:
+    """待處理清單：項目順序、各項目對應的 Treeview 列 (iid) 與頁數前綴和。
+    另以路徑索引各來源被引用的項目數，重複檢查與釋放來源皆為 O(1)。
+    所有異動都透過這裡進行，介面端再依回傳的影響範圍局部更新 Treeview"""
+    def __init__(self):
+        self.items = []; self.iids = []
+        self._pages = PageCountIndex()
+        self._refs = collections.Counter()   # 路徑 -> 引用此來源的項目數
+        self._whole = collections.Counter()  # 路徑 -> 整份檔案 (未展開) 項目數
+
+    def __len__(self): return len(self.items)
+    def __iter__(self): return iter(self.items)
+    def __getitem__(self, idx): return self.items[idx]
+
+    def _reindex(self): self._pages.rebuild([item.page_count for item in self.items])
+
+    def _track(self, items, sign):
+        for item in items:
+            self._refs[item.path] += sign
+            if item.page is None: self._whole[item.path] += sign
+            if self._refs[item.path] <= 0: del self._refs[item.path]
+            if self._whole[item.path] <= 0: del self._whole[item.path]
+
+    def contains_whole(self, path):
+        """清單中是否已有該檔案的整份項目"""
+        return path in self._whole
+
+    def refcount(self, path): return self._refs.get(path, 0)
+
+    def page_offset(self, idx):
+        """第 idx 個項目之前的總頁數"""
+        return self._pages.prefix(idx)
+
+    def total_pages(self): return self._pages.prefix(len(self.items))
+
+    def insert(self, idx, items):
+        self.items[idx:idx] = items; self.iids[idx:idx] = [None] * len(items)
+        self._track(items, 1); self._reindex()
+
+    def replace(self, idx, items):
+        """以 items 取代第 idx 個項目，回傳被取代項目的 iid"""
+        old_item, old_iid = self.items[idx], self.iids[idx]
+        self._track(items, 1); self._track([old_item], -1)
+        self.items[idx:idx + 1] = items; self.iids[idx:idx + 1] = [None] * len(items); self._reindex()
+        return old_iid
+
+    def delete(self, idxs):
+        """刪除多個位置的項目，回傳 ((項目, iid) 清單, 已無任何項目引用的來源路徑)"""
+        drop = set(idxs)
+        removed = [(self.items[i], self.iids[i]) for i in sorted(drop)]
+        self.items = [item for i, item in enumerate(self.items) if i not in drop]
+        self.iids = [iid for i, iid in enumerate(self.iids) if i not in drop]
+        self._track([item for item, _ in removed], -1); self._reindex()
+        released = {item.path for item, _ in removed if item.path not in self._refs}
+        return removed, released
+
+    def swap(self, i, j):
+        a, b = self.items[i].page_count, self.items[j].page_count
+        self.items[i], self.items[j] = self.items[j], self.items[i]
+        self.iids[i], self.iids[j] = self.iids[j], self.iids[i]
+        if a != b: self._pages.add(i, b - a); self._pages.add(j, a - b)
+
+    def reorder(self, order):
+        """order 為新順序下各位置對應的舊索引"""
+        self.items = [self.items[i] for i in order]; self.iids = [self.iids[i] for i in order]; self._reindex()
+
+    def clear(self):
+        self.items = []; self.iids = []; self._refs.clear(); self._whole.clear(); self._reindex()
+
+# 未安裝 Tk 時以 object 作為介面類別的基底，讓轉換核心與命令列仍可匯入本模組；開啟視窗前會先檢查 tk
+_TkEntry, _TkToplevel = (tk.Entry, tk.Toplevel) if tk else (object, object)
+
+class PlaceholderEntry(_TkEntry):
     def __init__(self, container, placeholder, is_password=False, *args, **kwargs):     
         if 'font' not in kwargs:
             kwargs['font'] = (SYSTEM_FONT, 10 + FONT_OFFSET)
@@ -80,7 +1719,7 @@ class PlaceholderEntry(tk.Entry):
             return ""
         return self.get()
 
-class FilePasswordDialog(tk.Toplevel):
+class FilePasswordDialog(_TkToplevel):
     def __init__(self, parent, filename):
         super().__init__(parent)
         self.title("PDF 檔案解鎖")
@@ -112,6 +1751,232 @@ class FilePasswordDialog(tk.Toplevel):
         self.password = self.entry.get()
         self.destroy()
 
+class PreviewWindow(_TkToplevel):
+    """放大預覽：立即以放大的低解析度全頁墊底，背景執行緒再依可見範圍渲染清晰圖塊並逐塊替換。
+    滾輪或 +/- 縮放、拖曳平移、←/→ 逐頁切換清單內容、Esc 關閉；前後頁會預先渲染，結果存於 app.preview_cache"""
+    def __init__(self, app, index):
+        super().__init__(app.root)
+        self.app = app; self.cache = app.preview_cache
+        self.configure(bg="#1a1a1a"); self.transient(app.root)
+        sw, sh = app.root.winfo_screenwidth(), app.root.winfo_screenheight()
+        self.view_w, self.view_h = int(sw * 0.7), int(sh * 0.75)  # 「符合視窗」縮放的基準，固定下來讓快取鍵在視窗縮放後仍可重用
+        self.canvas = tk.Canvas(self, width=self.view_w, height=self.view_h, bg="#1a1a1a", highlightthickness=0, cursor="fleur")
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.info_label = tk.Label(self, bg="#1a1a1a", fg="#cccccc", font=app.font_status); self.info_label.pack(fill=tk.X, pady=(0, 4))
+        self.geometry(f"+{(sw - self.view_w) // 2}+{max(0, (sh - self.view_h) // 2 - 30)}")
+        self.scheduler = ThumbnailScheduler(self._load, self._wakeup, DEFAULT_PREVIEW_WORKERS)
+        self.sizes = {}    # (路徑, 頁碼) -> 頁面尺寸 (點)
+        self.photos = {}   # 畫布上的圖塊鍵 -> (PhotoImage, 畫布項目)
+        self.wanted = {}; self.backdrop = None; self.offset = None; self._drag = None; self._refresh_job = None; self._closed = False
+        self.canvas.bind("<ButtonPress-1>", self._on_press); self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<MouseWheel>", lambda e: self._zoom_by(1 if e.delta > 0 else -1, e.x, e.y))
+        self.canvas.bind("<Button-4>", lambda e: self._zoom_by(1, e.x, e.y)); self.canvas.bind("<Button-5>", lambda e: self._zoom_by(-1, e.x, e.y))
+        self.canvas.bind("<Configure>", lambda e: self._schedule_refresh())
+        for keys, handler in ((("<Escape>",), lambda e: self.close()), (("<Left>", "<Prior>"), lambda e: self.flip(-1)),
+                              (("<Right>", "<Next>", "<space>"), lambda e: self.flip(1)), (("<plus>", "<equal>", "<KP_Add>"), lambda e: self._zoom_by(1)),
+                              (("<minus>", "<KP_Subtract>"), lambda e: self._zoom_by(-1)), (("<Key-0>",), lambda e: self._zoom_by(0))):
+            for key in keys: self.bind(key, handler)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.focus_set()
+        self.show(index, 0)
+
+    def _wakeup(self):
+        try: self.after(0, self._apply)
+        except (tk.TclError, RuntimeError): pass  # 視窗已關閉
+
+    def close(self):
+        self._closed = True; self.scheduler.shutdown(); self.photos.clear(); self.backdrop = None
+        self.destroy()
+
+    def _source(self, index, page):
+        item = self.app.file_list[index]
+        return item.path, item.page if item.page is not None else page
+
+    def _neighbor(self, delta):
+        """清單中前/後一頁的 (項目位置, 項目內頁碼)；整份 PDF 會逐頁翻閱"""
+        files = self.app.file_list; index, page = self.index, self.page + delta
+        if index >= len(files): return None
+        if not 0 <= page < files[index].page_count:
+            index += delta
+            if not 0 <= index < len(files): return None
+            page = 0 if delta > 0 else files[index].page_count - 1
+        return index, page
+
+    def show(self, index, page):
+        if not 0 <= index < len(self.app.file_list): return
+        self.index, self.page = index, page; self.source = self._source(index, page)
+        self.title(f"預覽：{os.path.basename(self.source[0])}")
+        self.step = PREVIEW_ZOOM_STEPS.index(1.0); self.offset = None
+        self._redraw()
+
+    def flip(self, delta):
+        target = self._neighbor(delta)
+        if target: self.show(*target)
+
+    def _size(self, source):
+        """頁面尺寸：尚未得知時查詢快取中的低解析度全頁"""
+        if source not in self.sizes:
+            low = self.cache.get(('low',) + source)
+            if low is None: return None
+            self.sizes[source] = low[:2]
+        return self.sizes[source]
+
+    def _zoom(self, size, step=None):
+        fit = min(self.view_w / size[0], self.view_h / size[1])
+        return round(fit * PREVIEW_ZOOM_STEPS[self.step if step is None else step], 4)
+
+    def _canvas_size(self):
+        w, h = self.canvas.winfo_width(), self.canvas.winfo_height()
+        return (w, h) if w > 1 and h > 1 else (self.view_w, self.view_h)  # 視窗尚未顯示時以預設大小計算
+
+    def _clamp(self, size):
+        """頁面小於畫布時置中，大於畫布時不讓頁面邊緣離開畫布"""
+        zoom = self._zoom(size); cw, ch = self._canvas_size(); ox, oy = self.offset
+        pw, ph = size[0] * zoom, size[1] * zoom
+        ox = (cw - pw) / 2 if pw <= cw else min(0, max(cw - pw, ox))
+        oy = (ch - ph) / 2 if ph <= ch else min(0, max(ch - ph, oy))
+        self.offset = (round(ox), round(oy))
+
+    def _redraw(self):
+        """頁面或縮放改變：清除畫布，以低解析度全頁墊底後重新排定圖塊"""
+        self.canvas.delete("all"); self.photos.clear(); self.backdrop = None
+        size = self._size(self.source)
+        if size is None:
+            cw, ch = self._canvas_size()
+            self.canvas.create_text(cw // 2, ch // 2, text="載入中…", fill="#cccccc", font=self.app.font_main, tags="message")
+        else:
+            if self.offset is None: self.offset = (0, 0)
+            self._clamp(size)
+            low = self.cache.get(('low',) + self.source)
+            if low: self._draw_backdrop(low)
+        self._refresh()
+
+    def _tiles(self, source, size, zoom, view, base):
+        """與 view (相對於頁面左上角的像素範圍；None 表示整頁) 相交的圖塊鍵，優先順序依與範圍中心的距離"""
+        cols, rows = (max(1, int(-(-(n * zoom - 0.5) // PREVIEW_TILE))) for n in size)  # 不足半像素的邊緣不另成圖塊
+        x0, y0, x1, y1 = view or (0, 0, cols * PREVIEW_TILE, rows * PREVIEW_TILE)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2; tiles = {}
+        for ty in range(max(0, int(y0 // PREVIEW_TILE)), min(rows - 1, int(y1 // PREVIEW_TILE)) + 1):
+            for tx in range(max(0, int(x0 // PREVIEW_TILE)), min(cols - 1, int(x1 // PREVIEW_TILE)) + 1):
+                tiles[('tile',) + source + (zoom, tx, ty)] = base + (abs((tx + 0.5) * PREVIEW_TILE - cx) + abs((ty + 0.5) * PREVIEW_TILE - cy)) / PREVIEW_TILE
+        return tiles
+
+    def _schedule_refresh(self):
+        if self._refresh_job is None: self._refresh_job = self.after(40, self._refresh)
+
+    def _refresh(self):
+        """依目前頁面、縮放與平移位置排定工作：低解析度全頁、可見圖塊 (含周圍半個圖塊)，再來是前後頁的符合視窗圖塊"""
+        self._refresh_job = None
+        if self._closed: return
+        wanted = {('low',) + self.source: 0}
+        size = self._size(self.source)
+        if size and self.offset is not None:
+            self._clamp_and_move(size)
+            (cw, ch), (ox, oy), margin = self._canvas_size(), self.offset, PREVIEW_TILE // 2
+            wanted.update(self._tiles(self.source, size, self._zoom(size), (-ox - margin, -oy - margin, cw - ox + margin, ch - oy + margin), 1))
+        for rank, delta in enumerate((1, -1)):
+            target = self._neighbor(delta)
+            if target is None: continue
+            source = self._source(*target); wanted[('low',) + source] = 1000 + rank
+            neighbor_size = self._size(source)
+            if neighbor_size: wanted.update(self._tiles(source, neighbor_size, self._zoom(neighbor_size, PREVIEW_ZOOM_STEPS.index(1.0)), None, 2000 + 1000 * rank))
+        for key in [k for k in self.photos if k not in wanted]: self.canvas.delete(self.photos.pop(key)[1])  # 已捲出範圍的圖塊
+        self.wanted = wanted; self.scheduler.retain(wanted)
+        for key, priority in wanted.items():
+            current = key[1:3] == self.source
+            if current and key in self.photos: continue
+            data = self.cache.get(key)
+            if data is None: self.scheduler.request(key, priority)
+            elif current and key[0] == 'tile': self._draw_tile(key, data)
+        self._update_info()
+
+    def _clamp_and_move(self, size):
+        """視窗大小改變後重新限制平移範圍，並把已繪製的內容移到新位置"""
+        old = self.offset; self._clamp(size)
+        if old != self.offset: self.canvas.move("all", self.offset[0] - old[0], self.offset[1] - old[1])
+
+    def _apply(self):
+        """於 UI 執行緒取回背景渲染結果：得知頁面尺寸後排定圖塊，屬於目前畫面的影像直接繪製"""
+        if self._closed: return
+        redraw = refresh = False
+        for key, data in self.scheduler.drain():
+            source = key[1:3]; current = source == self.source
+            if data is None:
+                if current and key[0] == 'low' and source not in self.sizes:
+                    self.canvas.delete("message"); cw, ch = self._canvas_size()
+                    self.canvas.create_text(cw // 2, ch // 2, text="無法讀取此頁", fill="#ff8080", font=self.app.font_main, tags="message")
+                continue
+            if key[0] == 'low':
+                if source not in self.sizes:
+                    self.sizes[source] = data[:2]
+                    if current: redraw = True
+                    else: refresh = True
+                elif current and self.backdrop is None and self.offset is not None: self._draw_backdrop(data)
+            elif current and key in self.wanted: self._draw_tile(key, data)
+        if redraw: self._redraw()
+        elif refresh: self._refresh()
+
+    def _draw_backdrop(self, low):
+        width, height, ppm = low
+        zoom = self._zoom((width, height)); ox, oy = self.offset; pw, ph = width * zoom, height * zoom
+        self.canvas.create_rectangle(ox, oy, ox + pw, oy + ph, fill="white", outline="", tags="backdrop")
+        photo = tk.PhotoImage(data=ppm); scale = pw / photo.width()
+        if scale >= 1.5: photo = photo.zoom(round(scale)) if scale <= PREVIEW_MAX_BACKDROP_SCALE else None
+        elif scale < 0.75: photo = photo.subsample(round(1 / scale))
+        if photo: self.canvas.create_image(ox + pw / 2, oy + ph / 2, image=photo, tags="backdrop")
+        self.backdrop = photo
+        self.canvas.tag_lower("backdrop")
+
+    def _draw_tile(self, key, data):
+        photo = tk.PhotoImage(data=data); ox, oy = self.offset; tx, ty = key[4:]
+        self.photos[key] = (photo, self.canvas.create_image(ox + tx * PREVIEW_TILE, oy + ty * PREVIEW_TILE, image=photo, anchor="nw", tags="tile"))
+
+    def _load(self, kind, path, page, *rest):
+        """背景執行緒：先查快取，未命中才渲染並寫回快取"""
+        key = (kind, path, page) + rest
+        data = self.cache.get(key)
+        if data is not None: return data
+        thumb = None
+        if kind == 'low' and not path.lower().endswith('.pdf'):
+            try: thumb = render_raster_thumbnail(path, PREVIEW_LOWRES_SIZE)  # 圖片檔以 Pillow 縮放解碼最快顯示
+            except Exception: thumb = None
+        with self.app.doc_pool.acquire(path) as doc:
+            pg = doc[page]
+            if kind == 'low':
+                data = (pg.rect.width, pg.rect.height, thumb or render_preview_lowres(pg, preview_master(pg, self.cache, ('master', path, page))))
+            else:
+                data = render_preview_tile(pg, *rest, master=preview_master(pg, self.cache, ('master', path, page)))
+        self.cache.put(key, data, len(data[2]) if kind == 'low' else len(data))
+        return data
+
+    def _on_press(self, event):
+        self._drag = (event.x, event.y)
+
+    def _on_drag(self, event):
+        size = self._size(self.source)
+        if self._drag is None or size is None or self.offset is None: return
+        old = self.offset; dx, dy = event.x - self._drag[0], event.y - self._drag[1]; self._drag = (event.x, event.y)
+        self.offset = (old[0] + dx, old[1] + dy); self._clamp(size)
+        self.canvas.move("all", self.offset[0] - old[0], self.offset[1] - old[1])
+        self._schedule_refresh()
+
+    def _zoom_by(self, delta, x=None, y=None):
+        """delta 為 +1/-1 時放大/縮小一級並保持游標下的位置不動，0 表示回到符合視窗"""
+        size = self._size(self.source)
+        if size is None or self.offset is None: return
+        step = PREVIEW_ZOOM_STEPS.index(1.0) if delta == 0 else min(len(PREVIEW_ZOOM_STEPS) - 1, max(0, self.step + delta))
+        if step == self.step: return
+        cw, ch = self._canvas_size(); x = cw / 2 if x is None else x; y = ch / 2 if y is None else y
+        ratio = self._zoom(size, step) / self._zoom(size); ox, oy = self.offset
+        self.step = step; self.offset = (x - (x - ox) * ratio, y - (y - oy) * ratio)
+        self._redraw()
+
+    def _update_info(self):
+        files = self.app.file_list
+        if self.index >= len(files): return
+        number = files.page_offset(self.index) + (self.page if files[self.index].page is None else 0) + 1
+        self.info_label.config(text=f"第 {number} / {files.total_pages()} 頁　{PREVIEW_ZOOM_STEPS[self.step]:.0%}　滾輪縮放・拖曳平移・←/→ 切換頁面・Esc 關閉")
+
 class ImageToPdfConverter:
     def __init__(self, root):
         self.root = root
@@ -146,19 +2011,50 @@ class ImageToPdfConverter:
         # 設定最小尺寸，確保 UI 功能不重疊
         self.root.minsize(980, 600)
         
-        self.file_list = []      
+        self.file_list = FileListModel()
+        self.row_thumb_keys = {}  # Treeview 列 -> 縮圖鍵 (路徑, 頁碼)
+        self._thumb_generation = 0; self._thumb_scroll_job = None
+        self._index_dirty_from = 0  # 此位置之後的「順序/頁碼」欄可能過期，捲動到可見範圍時才更新
         self.pdf_passwords = {}  
-        self.thumbnails = {}     
-        self.doc_handles = {}    
-        self.is_converting = False 
+        self.thumbnails = {}     # (路徑, 頁碼) -> PhotoImage
+        self.thumb_keys_by_path = {}  # 路徑 -> 該檔案已載入的縮圖鍵，移除檔案時免於掃描全部縮圖
+        self.doc_pool = DocumentPool(passwords=self.pdf_passwords)
+        # 轉換作業佇列：按下轉換即保存清單與設定的快照排入佇列，轉換期間仍可繼續編輯清單
+        self.job_scheduler = JobScheduler(self._run_conversion_job, DEFAULT_MAX_JOBS, listener=self._on_job_event)
+        self.job_rows = {}  # 作業編號 -> 佇列 Treeview 列
+        self._job_updates = set(); self._job_updates_lock = threading.Lock(); self._finished_jobs = set()
+        self.render_workers = DEFAULT_RENDER_WORKERS
+        self.render_max_inflight = DEFAULT_MAX_INFLIGHT
+        self.stream_window = DEFAULT_STREAM_WINDOW
 
-        self.thumb_queue = queue.Queue()
-        self.thumb_thread_running = True
-        self.thumb_worker = threading.Thread(target=self._thumbnail_worker, daemon=True)
-        self.thumb_worker.start()
+        self.preview_cache = None  # 第一次開啟放大預覽時建立
+        self.thumb_store = self.render_cache = self.thumb_scheduler = None  # 於視窗顯示後由 _finish_startup 建立
+        self.thumb_waiters = {}  # (路徑, 頁碼) -> 等待該縮圖的 Treeview 列
+        self.ingestors = collections.deque()  # 背景匯入工作，依加入順序逐一取回結果
+        self.password_queue = collections.deque(); self._prompting_password = False
+        self._ingest_job = None; self._ingest_failed = []
 
         self.setup_styles()
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after_idle(self._finish_startup)
+
+    def _finish_startup(self):
+        """視窗第一次顯示後才開啟磁碟快取與縮圖執行緒，並在背景預先載入 PyMuPDF，縮短開啟程式到可操作的時間"""
+        startup_timer.mark("視窗首次顯示")
+        try: self.thumb_store = ThumbnailStore()
+        except (OSError, sqlite3.Error): self.thumb_store = None  # 快取資料夾無法寫入時僅使用記憶體快取
+        try: self.render_cache = RenderCache()
+        except (OSError, sqlite3.Error): self.render_cache = None
+        self.thumb_scheduler = ThumbnailScheduler(self._load_thumbnail, lambda: self.root.after(30, self._apply_thumbnails), DEFAULT_THUMB_WORKERS)
+        startup_timer.mark("快取與縮圖排程就緒")
+        def preload():
+            for module in (fitz, PILImage):
+                try:
+                    if module: module.preload()
+                except ImportError: pass
+            startup_timer.mark("背景預載完成"); startup_timer.report()
+        threading.Thread(target=preload, daemon=True).start()
 
     def setup_styles(self):
         self.primary_color = "#0056b3"
@@ -205,6 +2101,9 @@ class ImageToPdfConverter:
         left_exec_ctrl.pack(side=tk.LEFT, fill=tk.Y)
         self.auto_open_var = tk.BooleanVar(value=False)
         tk.Checkbutton(left_exec_ctrl, text="轉換完成後自動開啟資料夾", variable=self.auto_open_var, font=self.font_main, bg="white").pack(anchor="w")
+        self.checkpoint_var = tk.BooleanVar(value=False)
+        self.check_checkpoint = tk.Checkbutton(left_exec_ctrl, text="定期儲存進度 (中斷後可續傳)", variable=self.checkpoint_var, font=self.font_main, bg="white")
+        self.check_checkpoint.pack(anchor="w")
         self.status_label = tk.Label(left_exec_ctrl, text="等待作業中...", font=self.font_status, bg="white", fg="gray")
         self.status_label.pack(anchor="w")
         self.progress = ttk.Progressbar(left_exec_ctrl, orient=tk.HORIZONTAL, length=300, mode='determinate')
@@ -216,6 +2115,32 @@ class ImageToPdfConverter:
             highlightthickness=0, activebackground="#1890ff", activeforeground="white"
         )
         self.btn_run.pack(side=tk.RIGHT, pady=2)
+        self.btn_cancel = tk.Button(exec_inner, text="停止作業", command=self.cancel_conversion, font=self.font_main, bg="#fafafa", fg="#cf1322",
+                                    relief=tk.GROOVE, padx=12, pady=6, cursor="hand2")
+        self.btn_cancel.pack(side=tk.RIGHT, padx=10, pady=2)
+
+        self.queue_section_frame, queue_title_bar = self.create_section(main_content, "轉換佇列")
+        self.queue_section_frame.master.pack(side=tk.BOTTOM, fill=tk.X, pady=2)
+        self.queue_label = tk.Label(queue_title_bar, text="佇列中沒有進行中的作業", font=(SYSTEM_FONT, 9 + FONT_OFFSET, "bold"), bg="#fafafa", fg=self.primary_color)
+        self.queue_label.pack(side=tk.LEFT, padx=(10, 0))
+        queue_inner = tk.Frame(self.queue_section_frame, bg="white", padx=15, pady=4)
+        queue_inner.pack(fill=tk.X)
+        self.job_tree = ttk.Treeview(queue_inner, columns=("Name", "State", "Progress", "Priority"), show='headings', selectmode='extended', height=3)
+        self.job_tree.heading("Name", text="輸出檔案"); self.job_tree.heading("State", text="狀態"); self.job_tree.heading("Progress", text="進度"); self.job_tree.heading("Priority", text="優先")
+        self.job_tree.column("Name", width=200); self.job_tree.column("State", width=70, anchor="center")
+        self.job_tree.column("Progress", width=260); self.job_tree.column("Priority", width=50, anchor="center")
+        job_scrollbar = ttk.Scrollbar(queue_inner, orient=tk.VERTICAL, command=self.job_tree.yview); self.job_tree.configure(yscroll=job_scrollbar.set)
+        self.job_tree.pack(side=tk.LEFT, fill=tk.X, expand=True); job_scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        job_ctrl = tk.Frame(queue_inner, bg="white")
+        job_ctrl.pack(side=tk.RIGHT, padx=(10, 0))
+        max_jobs_row = tk.Frame(job_ctrl, bg="white"); max_jobs_row.pack(anchor="w")
+        tk.Label(max_jobs_row, text="同時轉換:", font=self.font_main, bg="white").pack(side=tk.LEFT)
+        self.max_jobs_var = tk.StringVar(value=str(DEFAULT_MAX_JOBS))
+        self.combo_max_jobs = ttk.Combobox(max_jobs_row, textvariable=self.max_jobs_var, values=[str(n) for n in range(1, max(4, os.cpu_count() or 1) + 1)], state="readonly", width=3)
+        self.combo_max_jobs.pack(side=tk.LEFT, padx=5); self.combo_max_jobs.bind("<<ComboboxSelected>>", self.set_max_jobs)
+        job_btn_row = tk.Frame(job_ctrl, bg="white"); job_btn_row.pack(anchor="w", pady=(4, 0))
+        for text, command in (("提高優先", lambda: self.change_job_priority(1)), ("降低優先", lambda: self.change_job_priority(-1)), ("清除已完成", self.clear_finished_jobs)):
+            tk.Button(job_btn_row, text=text, command=command, font=self.font_status, bg="#fafafa", relief=tk.GROOVE, padx=6, cursor="hand2").pack(side=tk.LEFT, padx=(0, 4))
 
         self.param_section_frame, _ = self.create_section(main_content, "參數設定與文件資訊 (選填)")
         self.param_section_frame.master.pack(side=tk.BOTTOM, fill=tk.X, pady=2)
@@ -233,6 +2158,9 @@ class ImageToPdfConverter:
         tk.Label(row1, text="圖片縮放:", font=self.font_main, bg="white").pack(side=tk.LEFT, padx=(12,0))
         self.scale_mode_var = tk.StringVar(value="自動填滿")
         self.combo_scale = ttk.Combobox(row1, textvariable=self.scale_mode_var, values=["自動填滿", "保持原尺寸"], state="readonly", width=10); self.combo_scale.pack(side=tk.LEFT, padx=5)
+        tk.Label(row1, text="解析度 (DPI):", font=self.font_main, bg="white").pack(side=tk.LEFT, padx=(12,0))
+        self.dpi_var = tk.StringVar(value=str(DEFAULT_OUTPUT_DPI))
+        self.combo_dpi = ttk.Combobox(row1, textvariable=self.dpi_var, values=[str(d) for d in OUTPUT_DPI_CHOICES], state="readonly", width=5); self.combo_dpi.pack(side=tk.LEFT, padx=5)
 
         row2 = tk.Frame(grid_container, bg="white")
         row2.pack(fill=tk.X, pady=2)
@@ -263,6 +2191,22 @@ class ImageToPdfConverter:
         self.check_pdf_flatten = tk.Checkbutton(row2, text="PDF 平面化", variable=self.pdf_flatten_var, font=self.font_main, bg="white")
         self.check_pdf_flatten.pack(side=tk.LEFT, padx=5)
 
+        row_scan = tk.Frame(grid_container, bg="white")
+        row_scan.pack(fill=tk.X, pady=2)
+        self.scan_var = tk.BooleanVar(value=False); self.despeckle_var = tk.BooleanVar(value=True); self.deskew_var = tk.BooleanVar(value=False)
+        self.check_scan = tk.Checkbutton(row_scan, text="掃描文件模式 (1-bit 黑白)", variable=self.scan_var, font=self.font_main, bg="white", command=self.toggle_scan)
+        self.check_scan.pack(side=tk.LEFT)
+        self.check_despeckle = tk.Checkbutton(row_scan, text="去除斑點", variable=self.despeckle_var, font=self.font_main, bg="white", state=tk.DISABLED)
+        self.check_despeckle.pack(side=tk.LEFT, padx=5)
+        self.check_deskew = tk.Checkbutton(row_scan, text="自動校正歪斜", variable=self.deskew_var, font=self.font_main, bg="white", state=tk.DISABLED)
+        self.check_deskew.pack(side=tk.LEFT, padx=5)
+        if np is None: self.check_scan.config(state=tk.DISABLED, text="掃描文件模式 (需安裝 numpy)")
+        tk.Frame(row_scan, bg="#eee", width=1).pack(side=tk.LEFT, fill=tk.Y, padx=12)
+        tk.Label(row_scan, text="存檔方式:", font=self.font_main, bg="white").pack(side=tk.LEFT)
+        self.save_profile_var = tk.StringVar(value=SAVE_PROFILE_LABELS[DEFAULT_SAVE_PROFILE])
+        profiles = [label for key, label in SAVE_PROFILE_LABELS.items() if key != "web" or pikepdf is not None]
+        self.combo_save_profile = ttk.Combobox(row_scan, textvariable=self.save_profile_var, values=profiles, state="readonly", width=10); self.combo_save_profile.pack(side=tk.LEFT, padx=5)
+
         row3 = tk.Frame(grid_container, bg="white")
         row3.pack(fill=tk.X, pady=2)
         meta_items = [("標題:", "meta_title", "標題", 8), ("作者:", "meta_author", "作者", 8), ("主題:", "meta_subject", "主題", 8), ("關鍵字:", "meta_keywords", "關鍵字", 8)]
@@ -276,6 +2220,10 @@ class ImageToPdfConverter:
         self.list_section_frame.master.pack(side=tk.TOP, fill=tk.BOTH, expand=True, pady=2)
         self.file_count_label = tk.Label(list_title_bar, text="已選擇: 0 個項目", font=(SYSTEM_FONT, 9 + FONT_OFFSET, "bold"), bg="#fafafa", fg=self.primary_color)
         self.file_count_label.pack(side=tk.LEFT, padx=(10, 0))
+        # 匯入進度 (僅在背景讀取檔案時顯示)
+        self.ingest_label = tk.Label(list_title_bar, text="", font=(SYSTEM_FONT, 9 + FONT_OFFSET), bg="#fafafa", fg="gray")
+        self.ingest_progress = ttk.Progressbar(list_title_bar, orient=tk.HORIZONTAL, length=120, mode='determinate')
+        self.btn_stop_ingest = tk.Button(list_title_bar, text="停止讀取", command=self.cancel_ingest, font=(SYSTEM_FONT, 9 + FONT_OFFSET), bg="#fafafa", fg="#cf1322", relief=tk.FLAT, cursor="hand2")
         
         list_main_container = tk.Frame(self.list_section_frame, bg="white", padx=15, pady=5)
         list_main_container.pack(fill=tk.BOTH, expand=True)
@@ -291,7 +2239,7 @@ class ImageToPdfConverter:
         self.tree.configure(show="tree headings")
         self.tree.heading("#0", text="預覽")
 
-        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview); self.tree.configure(yscroll=scrollbar.set); self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True); scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview); self.tree.configure(yscroll=lambda *a: (scrollbar.set(*a), self._on_tree_scrolled())); self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True); scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.bind("<Delete>", lambda e: self.remove_selected())
         self.tree.bind("<Double-1>", self.on_tree_double_click)
 
@@ -345,6 +2293,7 @@ class ImageToPdfConverter:
         self.btn_clear = tk.Button(self.side_btn_bar, text="🗑 全部清空", command=self.clear_all, bg="#fff1f0", fg="#cf1322", **BTN_OPT)
         self.btn_clear.pack(pady=1, padx=5)
         
+        from tkinterdnd2 import DND_FILES  # 支援拖放檔案功能
         self.tree.drop_target_register(DND_FILES); self.tree.dnd_bind('<<Drop>>', self.handle_drop)
 
     def create_section(self, parent, title):
@@ -355,119 +2304,152 @@ class ImageToPdfConverter:
         content = tk.Frame(container, bg="white"); content.pack(fill=tk.BOTH, expand=True)
         return content, title_bar
 
-    def _get_pdf_doc(self, path):
-        if path in self.doc_handles: return self.doc_handles[path]
+    def _get_pdf_page_count(self, path):
         try:
-            doc = fitz.open(path)
-            if doc.is_encrypted: doc.authenticate(self.pdf_passwords.get(path, ""))
-            self.doc_handles[path] = doc
-            return doc
+            with self.doc_pool.acquire(path) as doc: return len(doc)
         except: return None
 
-    def _thumbnail_worker(self):
-        while self.thumb_thread_running:
+    def _load_thumbnail(self, path, page_idx):
+        """先查詢磁碟快取，未命中才渲染並寫回快取"""
+        store_key = None
+        if self.thumb_store:
             try:
-                item_id, path, page_idx = self.thumb_queue.get(timeout=1)
-                cache_key = f"{path}_{page_idx}"
-                if cache_key not in self.thumbnails:
-                    with fitz.open(path) as doc:
-                        if doc.is_encrypted: doc.authenticate(self.pdf_passwords.get(path, ""))
-                        page = doc[page_idx]
-                        rect = page.rect
-                        target_size = 50
-                        zoom = min(target_size/rect.width, target_size/rect.height)
-                        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
-                        img_data = pix.tobytes("png")
-                        self.root.after(0, self._update_item_thumbnail, item_id, cache_key, img_data)
-                else:
-                    self.root.after(0, lambda: self.tree.item(item_id, image=self.thumbnails[cache_key]))
-                self.thumb_queue.task_done()
-            except queue.Empty: continue
+                store_key = ThumbnailStore.make_key(path, page_idx)
+                img_data = self.thumb_store.get(store_key)
+                if img_data: return img_data
+            except (OSError, sqlite3.Error): store_key = None
+        img_data = None
+        if not path.lower().endswith('.pdf'):
+            try: img_data = render_raster_thumbnail(path)
+            except Exception: img_data = None  # 格式不支援快速解碼時改由 PyMuPDF 處理
+        if img_data is None:
+            with self.doc_pool.acquire(path) as doc: img_data = _pixmap_thumbnail(doc[page_idx], THUMB_SIZE)
+        if store_key:
+            try: self.thumb_store.put(store_key, img_data)
+            except sqlite3.Error: pass
+        return img_data
 
-    def _update_item_thumbnail(self, item_id, cache_key, img_data):
-        if not self.tree.exists(item_id): return
-        photo = tk.PhotoImage(data=img_data)
-        self.thumbnails[cache_key] = photo
-        self.tree.item(item_id, image=photo)
+    def _apply_thumbnails(self):
+        """一次套用所有已完成的縮圖，避免每張縮圖各自排入一個 Tk 回呼"""
+        for cache_key, img_data in self.thumb_scheduler.drain():
+            rows = self.thumb_waiters.pop(cache_key, ())
+            if img_data is None: continue
+            photo = tk.PhotoImage(data=img_data)
+            self.thumbnails[cache_key] = photo
+            self.thumb_keys_by_path.setdefault(cache_key[0], set()).add(cache_key)
+            for item_id in rows:
+                if self.tree.exists(item_id): self.tree.item(item_id, image=photo)
+
+    def _visible_row_range(self):
+        rows = len(self.file_list)
+        if not rows: return 0, -1
+        top, bottom = self.tree.yview()
+        return int(top * rows), min(rows - 1, int(bottom * rows) + 1)
+
+    def _on_tree_scrolled(self):
+        """捲動時延後合併處理：更新可見列過期的頁碼欄，並以遞增的世代編號讓最新的可見範圍縮圖最優先"""
+        if self._thumb_scroll_job: return
+        def run():
+            self._thumb_scroll_job = None; self._thumb_generation += 1
+            self._refresh_visible_index()
+            first, last = self._visible_row_range()
+            for item_id in self.file_list.iids[first:last + 1]:
+                key = self.row_thumb_keys.get(item_id)
+                if key in self.thumb_waiters: self.thumb_scheduler.request(key, -self._thumb_generation)
+        self._thumb_scroll_job = self.root.after(80, run)
+
+    def _queue_thumbnails(self, idxs):
+        """為指定位置的列排定縮圖：可見列最優先，其餘依與可見範圍的距離排序"""
+        first, last = self._visible_row_range()
+        for idx in idxs:
+            item_id = self.file_list.iids[idx]
+            key = self.row_thumb_keys.get(item_id)
+            if key is None: continue
+            if key in self.thumbnails: self.tree.item(item_id, image=self.thumbnails[key]); continue
+            self.thumb_waiters.setdefault(key, set()).add(item_id)
+            distance = -self._thumb_generation if first <= idx <= last else (first - idx if idx < first else idx - last)
+            self.thumb_scheduler.request(key, distance)
+
+    def _forget_rows(self, item_ids):
+        """移除列後清除其縮圖等待紀錄，並取消已無任何列需要的縮圖工作"""
+        for item_id in item_ids:
+            key = self.row_thumb_keys.pop(item_id, None)
+            rows = self.thumb_waiters.get(key)
+            if rows is not None:
+                rows.discard(item_id)
+                if not rows: del self.thumb_waiters[key]
+        self.thumb_scheduler.retain(self.thumb_waiters)
 
     def on_tree_double_click(self, event):
         item_id = self.tree.identify_row(event.y)
         if not item_id: return
-        all_ids = self.tree.get_children()
-        try:
-            idx = all_ids.index(item_id)
-            item = self.file_list[idx]
-            self.show_enlarged_preview(item)
-        except (ValueError, IndexError): pass
-
-    def show_enlarged_preview(self, item):
-        path = item['path']
-        page_idx = item['page'] if item['page'] is not None else 0
-        preview_win = tk.Toplevel(self.root)
-        preview_win.title(f"預覽：{os.path.basename(path)}")
-        preview_win.configure(bg="#1a1a1a")
-        preview_win.transient(self.root)
-        screen_h = self.root.winfo_screenheight()
-        max_h = int(screen_h * 0.8)
         try:
-            with fitz.open(path) as doc:
-                if doc.is_encrypted: doc.authenticate(self.pdf_passwords.get(path, ""))
-                page = doc[page_idx]
-                rect = page.rect
-                zoom = max_h / rect.height
-                zoom = min(zoom, 2.0)
-                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
-                img_data = pix.tobytes("png")
-                photo = tk.PhotoImage(data=img_data)
-                preview_win.photo = photo
-                lbl = tk.Label(preview_win, image=photo, bg="#1a1a1a", cursor="hand2")
-                lbl.pack(padx=10, pady=10)
-                lbl.bind("<Button-1>", lambda e: preview_win.destroy())
-                preview_win.bind("<Key>", lambda e: preview_win.destroy())
-                preview_win.update_idletasks()
-                w, h = preview_win.winfo_width(), preview_win.winfo_height()
-                sw, sh = self.root.winfo_screenwidth(), self.root.winfo_screenheight()
-                preview_win.geometry(f"+{(sw-w)//2}+{(sh-h)//2}")
-        except Exception as e:
-            messagebox.showerror("預覽失敗", f"無法讀取檔案：\n{str(e)}")
-            preview_win.destroy()
+            self.show_enlarged_preview(self.tree.index(item_id))
+        except (tk.TclError, IndexError): pass
 
-    def update_tree_content(self):
-        while not self.thumb_queue.empty():
-            try: self.thumb_queue.get_nowait()
-            except queue.Empty: break
-        for i in self.tree.get_children(): self.tree.delete(i)
-        current_page_offset = 1
-        for idx, item in enumerate(self.file_list):
-            path = item['path']
-            fname = os.path.basename(path); ext = fname.split('.')[-1].upper()
-            item_page_count = item.get('page_count', 1)
-            index_text = f"{current_page_offset} ~ {current_page_offset + item_page_count - 1}" if item_page_count > 1 else str(current_page_offset)
-            current_page_offset += item_page_count
-            if item['page'] is not None:
-                type_text = f"{ext} (分頁)"; display_name = f"{fname}\n(第 {item['page'] + 1} 頁)"; target_page = item['page']
-            else:
-                type_text = ext; display_name = fname; target_page = 0
-            item_id = self.tree.insert("", tk.END, values=(index_text, type_text, display_name))
-            cache_key = f"{path}_{target_page}"
-            if cache_key in self.thumbnails: self.tree.item(item_id, image=self.thumbnails[cache_key])
-            else: self.thumb_queue.put((item_id, path, target_page))
+    def show_enlarged_preview(self, index):
+        if self.preview_cache is None: self.preview_cache = PreviewCache()
+        try: PreviewWindow(self, index)
+        except tk.TclError as e: messagebox.showerror("預覽失敗", f"無法開啟預覽：\n{str(e)}")
+
+    def _index_text(self, idx):
+        start = self.file_list.page_offset(idx) + 1; count = self.file_list[idx].page_count
+        return f"{start} ~ {start + count - 1}" if count > 1 else str(start)
+
+    def _row_values(self, idx):
+        item = self.file_list[idx]; path = item.path
+        fname = os.path.basename(path); ext = fname.split('.')[-1].upper()
+        if item.page is not None:
+            return self._index_text(idx), f"{ext} (分頁)", f"{fname}\n(第 {item.page + 1} 頁)"
+        if item.size and item.page_count == 1 and ext != 'PDF':
+            return self._index_text(idx), ext, f"{fname}\n({item.size[0]} × {item.size[1]} px)"
+        return self._index_text(idx), ext, fname
+
+    def _insert_rows(self, idx, items):
+        """在 idx 插入項目並只新增對應的列；其後各列的頁碼欄改為延遲更新"""
+        self.file_list.insert(idx, items)
+        self._create_rows(idx, len(items))
+
+    def _create_rows(self, idx, count):
+        for n in range(idx, idx + count):
+            item = self.file_list[n]
+            item_id = self.tree.insert("", n, values=self._row_values(n))
+            self.file_list.iids[n] = item_id
+            self.row_thumb_keys[item_id] = (item.path, item.page if item.page is not None else 0)
+        self._queue_thumbnails(range(idx, idx + count))
+        self._mark_index_dirty(idx + count)
+
+    def _mark_index_dirty(self, idx):
+        self._index_dirty_from = min(self._index_dirty_from, idx)
+        self._refresh_visible_index()
         self.file_count_label.config(text=f"已選擇: {len(self.file_list)} 個項目")
 
+    def _refresh_visible_index(self):
+        """只更新可見範圍內可能過期的頁碼欄；每列以前綴和 O(log n) 算出起始頁碼"""
+        first, last = self._visible_row_range()
+        for idx in range(max(first, self._index_dirty_from), last + 1):
+            self.tree.set(self.file_list.iids[idx], "Index", self._index_text(idx))
+        if self._index_dirty_from >= first and last >= len(self.file_list) - 1: self._index_dirty_from = len(self.file_list)
+
+    def update_tree_content(self):
+        """依資料模型完整重建清單（僅於全部清空等情況使用，一般異動皆為局部更新）"""
+        children = self.tree.get_children()
+        if children: self.tree.delete(*children)
+        self._forget_rows(children)
+        self._index_dirty_from = len(self.file_list)
+        self._create_rows(0, len(self.file_list))
+
     def expand_selected_pdf(self):
-        if self.is_converting: return
         sel = self.tree.selection(); idxs = sorted([self.tree.index(i) for i in sel], reverse=True)
-        expanded_any = False
         for idx in idxs:
-            item = self.file_list[idx]; path = item['path']
-            if path.lower().endswith('.pdf') and item['page'] is None:
-                doc = self._get_pdf_doc(path)
-                if doc:
-                    count = len(doc)
-                    page_items = [{'path': path, 'page': p, 'page_count': 1} for p in range(count)]
-                    self.file_list[idx:idx+1] = page_items
-                    expanded_any = True
-        if expanded_any: self.update_tree_content()
+            item = self.file_list[idx]; path = item.path
+            if path.lower().endswith('.pdf') and item.page is None:
+                count = self._get_pdf_page_count(path)
+                if count:
+                    page_items = [FileEntry(path, p) for p in range(count)]
+                    old_iid = self.file_list.replace(idx, page_items)
+                    self.tree.delete(old_iid); self._forget_rows([old_iid])
+                    self._create_rows(idx, count)
 
     def update_quality_label(self, val): self.quality_val_label.config(text=f"{val}%")
 
@@ -497,70 +2479,122 @@ class ImageToPdfConverter:
         text_box.insert(tk.END, license_desc); text_box.config(state=tk.DISABLED); text_box.pack(fill=tk.X)
 
     def handle_drop(self, event):
-        if not self.is_converting: self.process_incoming_files(self.root.tk.splitlist(event.data))
+        self.process_incoming_files(self.root.tk.splitlist(event.data))
 
     def add_files(self):
-        if not self.is_converting:
-            files = filedialog.askopenfilenames(title="選擇檔案", filetypes=[("支援格式", "*.jpg *.jpeg *.png *.pdf *.bmp *.tiff")])
-            if files: self.process_incoming_files(files)
+        files = filedialog.askopenfilenames(title="選擇檔案", filetypes=[("支援格式", "*.jpg *.jpeg *.png *.pdf *.bmp *.tiff")])
+        if files: self.process_incoming_files(files)
 
     def process_incoming_files(self, files):
-        valid = ('.jpg', '.jpeg', '.png', '.pdf', '.bmp', '.tiff'); added = False
-        for f in files:
-            exists = any(item['path'] == f and item['page'] is None for item in self.file_list)
-            if f.lower().endswith(valid) and not exists:
-                count = 1
-                if f.lower().endswith('.pdf'):
-                    doc = self._get_pdf_doc(f)
-                    if doc:
-                        if doc.is_encrypted and not self.pdf_passwords.get(f):
-                            correct = False
-                            while not correct:
-                                dialog = FilePasswordDialog(self.root, os.path.basename(f))
-                                self.root.wait_window(dialog)
-                                if dialog.password is None: break
-                                if doc.authenticate(dialog.password): self.pdf_passwords[f] = dialog.password; correct = True
-                                else: messagebox.showerror("錯誤", "密碼不正確")
-                            if not correct: continue
-                        count = len(doc)
-                self.file_list.append({'path': f, 'page': None, 'page_count': count}); added = True
-        if added: self.update_tree_content()
+        """於背景遞迴掃描並探測加入的檔案與資料夾，結果由 _poll_ingest 分批加入清單"""
+        self.ingestors.append(SourceIngestor(files, self.pdf_passwords))
+        if self._ingest_job is None: self._show_ingest_progress(True); self._poll_ingest()
+
+    def _show_ingest_progress(self, show):
+        widgets = (self.ingest_label, self.ingest_progress, self.btn_stop_ingest)
+        for w in widgets: w.pack_forget()
+        if show:
+            for w in widgets: w.pack(side=tk.LEFT, padx=(10, 0))
+
+    def _poll_ingest(self):
+        """取回背景匯入的結果並插入清單，同時更新進度；多次加入的檔案依加入順序排列"""
+        self._ingest_job = None
+        while self.ingestors and self.ingestors[0].finished: self.ingestors.popleft()
+        if not self.ingestors:
+            self._show_ingest_progress(False)
+            if self._ingest_failed:
+                names = "\n".join(os.path.basename(p) for p, _ in self._ingest_failed[:10])
+                more = f"\n…等共 {len(self._ingest_failed)} 個檔案" if len(self._ingest_failed) > 10 else ""
+                self._ingest_failed = []
+                messagebox.showwarning("提示", f"下列檔案無法讀取，已略過：\n{names}{more}")
+            return
+        entries, locked, failed = self.ingestors[0].drain(INGEST_BATCH_ROWS)
+        added = []; batch = set()
+        for entry in entries:
+            if entry.path in batch or self.file_list.contains_whole(entry.path): continue
+            added.append(entry); batch.add(entry.path)
+        if added: self._insert_rows(len(self.file_list), added)
+        self._ingest_failed.extend(failed)
+        if locked: self.password_queue.extend(locked); self.root.after_idle(self._prompt_passwords)
+        found = sum(i.found for i in self.ingestors); probed = sum(i.probed for i in self.ingestors)
+        self.ingest_progress.configure(maximum=max(found, 1), value=probed)
+        self.ingest_label.config(text=f"讀取中 {probed}/{found}")
+        self._ingest_job = self.root.after(1 if len(entries) == INGEST_BATCH_ROWS else INGEST_POLL_MS, self._poll_ingest)
+
+    def _prompt_passwords(self):
+        """逐一詢問加密 PDF 的密碼；對話框開啟期間背景匯入仍持續進行"""
+        if self._prompting_password: return
+        self._prompting_password = True
+        try:
+            while self.password_queue:
+                f = self.password_queue.popleft()
+                if self.file_list.contains_whole(f): continue
+                try:
+                    with self.doc_pool.acquire(f) as doc:
+                        while doc.is_encrypted:
+                            dialog = FilePasswordDialog(self.root, os.path.basename(f))
+                            self.root.wait_window(dialog)
+                            if dialog.password is None: break
+                            if doc.authenticate(dialog.password): self.pdf_passwords[f] = dialog.password
+                            else: messagebox.showerror("錯誤", "密碼不正確")
+                        if doc.is_encrypted: continue
+                        entry = FileEntry(f, None, len(doc), tuple(doc[0].rect[2:]) if len(doc) else None)
+                except Exception: continue
+                self._insert_rows(len(self.file_list), [entry])
+        finally:
+            self._prompting_password = False
+
+    @property
+    def is_ingesting(self): return bool(self.ingestors or self.password_queue or self._prompting_password)
+
+    def cancel_ingest(self):
+        """停止所有背景匯入；已加入清單的項目保留"""
+        for ingestor in self.ingestors: ingestor.cancel()
+        self.ingestors.clear(); self.password_queue.clear(); self._ingest_failed = []
+        if self._ingest_job is not None: self.root.after_cancel(self._ingest_job); self._ingest_job = None
+        self._show_ingest_progress(False)
 
     def sort_files(self, rev):
-        if not self.is_converting: self.file_list.sort(key=lambda x: (os.path.basename(x['path']).lower(), x['page'] if x['page'] is not None else -1), reverse=rev); self.update_tree_content()
+        items = self.file_list.items
+        order = sorted(range(len(items)), key=lambda i: (os.path.basename(items[i].path).lower(), items[i].page if items[i].page is not None else -1), reverse=rev)
+        self.file_list.reorder(order)
+        # 以 move 調整既有列的位置，不需刪除重建，也保留已載入的縮圖
+        for n, item_id in enumerate(self.file_list.iids): self.tree.move(item_id, "", n)
+        self._mark_index_dirty(0)
+
+    def _swap_rows(self, i, j):
+        self.file_list.swap(i, j)
+        self.tree.move(self.file_list.iids[i], "", i)
+        for idx in (i, j): self.tree.set(self.file_list.iids[idx], "Index", self._index_text(idx))
 
     def move_up(self):
-        if self.is_converting: return
         sel = self.tree.selection(); idxs = sorted([self.tree.index(i) for i in sel])
         if not idxs or idxs[0] <= 0: return
-        for idx in idxs: self.file_list[idx], self.file_list[idx-1] = self.file_list[idx-1], self.file_list[idx]
-        self.update_tree_content()
-        for idx in idxs: self.tree.selection_add(self.tree.get_children()[idx-1])
+        for idx in idxs: self._swap_rows(idx - 1, idx)
     
     def move_down(self):
-        if self.is_converting: return
         sel = self.tree.selection(); idxs = sorted([self.tree.index(i) for i in sel], reverse=True)
         if not idxs or idxs[0] >= len(self.file_list) - 1: return
-        for idx in idxs: self.file_list[idx], self.file_list[idx+1] = self.file_list[idx+1], self.file_list[idx]
-        self.update_tree_content()
-        for idx in idxs: self.tree.selection_add(self.tree.get_children()[idx+1])
+        for idx in idxs: self._swap_rows(idx, idx + 1)
 
     def remove_selected(self):
-        if not self.is_converting:
-            sel = self.tree.selection(); idxs = sorted([self.tree.index(i) for i in sel], reverse=True)
-            for idx in idxs: 
-                item = self.file_list.pop(idx)
-                if not any(it['path'] == item['path'] for it in self.file_list):
-                    if item['path'] in self.doc_handles: self.doc_handles[item['path']].close(); del self.doc_handles[item['path']]
-                    self.pdf_passwords.pop(item['path'], None)
-                    keys = [k for k in self.thumbnails if k.startswith(item['path'])]
-                    for k in keys: del self.thumbnails[k]
-            self.update_tree_content()
-            
+        sel = self.tree.selection(); idxs = [self.tree.index(i) for i in sel]
+        if not idxs: return
+        removed, released = self.file_list.delete(idxs)
+        self.tree.delete(*[item_id for _, item_id in removed]); self._forget_rows([item_id for _, item_id in removed])
+        for path in released:
+            self.doc_pool.discard(path)
+            self.pdf_passwords.pop(path, None)
+            for k in self.thumb_keys_by_path.pop(path, ()): self.thumbnails.pop(k, None)
+            if self.preview_cache: self.preview_cache.discard_path(path)
+        self._mark_index_dirty(min(idxs))
+        
     def clear_all(self):
-        if not self.is_converting and self.file_list and messagebox.askyesno("確認", "是否清空？"):
-            for h in self.doc_handles.values(): h.close()
-            self.file_list.clear(); self.pdf_passwords.clear(); self.thumbnails.clear(); self.doc_handles.clear(); self.update_tree_content()
+        if (self.file_list or self.is_ingesting) and messagebox.askyesno("確認", "是否清空？"):
+            self.cancel_ingest(); self.doc_pool.clear()
+            self.file_list.clear(); self.pdf_passwords.clear(); self.thumbnails.clear(); self.thumb_keys_by_path.clear()
+            if self.preview_cache: self.preview_cache.clear()
+            self.update_tree_content()
 
     def toggle_compress(self): 
         s = tk.NORMAL if self.compress_var.get() else tk.DISABLED
@@ -568,7 +2602,13 @@ class ImageToPdfConverter:
 
     def toggle_encrypt(self): self.password_entry.config(state=tk.NORMAL if self.encrypt_var.get() else tk.DISABLED)
 
+    def toggle_scan(self):
+        s = tk.NORMAL if self.scan_var.get() else tk.DISABLED
+        self.check_despeckle.config(state=s); self.check_deskew.config(state=s)
+
     def start_conversion_thread(self):
+        """保存目前清單、設定與密碼的快照並排入轉換佇列；資源足夠時立即開始，清單可繼續編輯以準備下一個作業"""
+        if self.is_ingesting: messagebox.showwarning("提示", "仍在讀取加入的檔案，請稍候或先停止讀取。"); return
         if not self.file_list: 
             messagebox.showwarning("提示", "清單中尚無檔案，請先加入想要轉換的圖片或 PDF。")
             return
@@ -576,110 +2616,666 @@ class ImageToPdfConverter:
         if self.encrypt_var.get() and not opw: messagebox.showwarning("警告", "請設定密碼"); return
         save_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF 檔案", "*.pdf")])
         if not save_path: return
-        self.is_converting = True; self.toggle_ui_state(tk.DISABLED)
-        self.progress['value'] = 0; self.status_label.config(text="準備開始轉換...", fg="blue")
-        threading.Thread(target=self.perform_conversion, args=(save_path,), daemon=True).start()
-
-    def toggle_ui_state(self, state):
-        btns = [self.btn_run, self.btn_select, self.btn_up, self.btn_down, self.btn_remove, self.btn_clear, self.btn_sort_asc, self.btn_sort_desc, self.btn_expand, self.check_compress, self.check_encrypt, self.combo_size, self.combo_orient, self.check_auto_rotate, self.check_grayscale, self.combo_scale, self.check_pdf_flatten]
-        for b in btns: b.config(state=state)
-        if state == tk.NORMAL: self.toggle_compress(); self.toggle_encrypt()
-        else: self.quality_scale.config(state=tk.DISABLED); self.password_entry.config(state=tk.DISABLED)
-
-    def perform_conversion(self, save_path):
-        """核心轉換邏輯，修正進度條計算方式為總頁數"""
-        doc = fitz.open()
-        total_pages = sum(item.get('page_count', 1) for item in self.file_list)
-        processed_pages = 0
-        c, q = self.compress_var.get(), self.quality_scale.get()
-        enc, opw = self.encrypt_var.get(), self.password_entry.get_real_value()
-        gs, ar, sm = self.grayscale_var.get(), self.auto_rotate_var.get(), self.scale_mode_var.get()
-        flatten = self.pdf_flatten_var.get() # PDF 平面化標誌
-        meta = {"title": self.meta_title.get_real_value(), "creator": self.window_title, "producer": "PyMuPDF"}
-        base_size = PAGE_SIZES.get(self.page_size_var.get()); target_orient = self.orientation_var.get()
-        HIGH_RES_DPI = 300 / 72 
-        try:
-            for item in self.file_list:
-                path = item['path']
-                if not path.lower().endswith('.pdf'):
-                    processed_pages += 1
-                    self.root.after(0, lambda p=processed_pages: self.status_label.config(text=f"處理中 {p}/{total_pages}..."))
-                    img_doc = fitz.open(path); img_page = img_doc[0]; img_rect = img_page.rect
-                    if gs or c:
-                        pix = img_page.get_pixmap(matrix=fitz.Matrix(HIGH_RES_DPI, HIGH_RES_DPI))
-                        if gs: pix = fitz.Pixmap(fitz.csGRAY, pix)
-                        if c and pix.alpha:
-                            new_pix = fitz.Pixmap(fitz.csRGB, pix.width, pix.height, 0); new_pix.clear_with(255); new_pix.copy(pix, pix.irect); pix = new_pix
-                        img_data = pix.tobytes("jpg", jpg_quality=q) if c else pix.tobytes("png")
-                        if base_size:
-                            tw, th = base_size if target_orient == "直式" else (base_size[1], base_size[0])
-                            if ar and ((pix.width > pix.height) != (tw > th)): tw, th = th, tw
-                            page = doc.new_page(width=tw, height=th); rect = page.rect if sm == "自動填滿" else img_rect
-                            page.insert_image(rect, stream=img_data, keep_proportion=True)
-                        else:
-                            page = doc.new_page(width=img_rect.width, height=img_rect.height); page.insert_image(page.rect, stream=img_data)
-                        pix = None
-                    else:
-                        if base_size:
-                            tw, th = base_size if target_orient == "直式" else (base_size[1], base_size[0])
-                            if ar and ((img_rect.width > img_rect.height) != (tw > th)): tw, th = th, tw
-                            page = doc.new_page(width=tw, height=th); rect = page.rect if sm == "自動填滿" else img_rect
-                            page.insert_image(rect, filename=path, keep_proportion=True)
-                        else:
-                            page = doc.new_page(width=img_rect.width, height=img_rect.height); page.insert_image(page.rect, filename=path)
-                    img_doc.close()
-                    self.root.after(0, lambda v=(processed_pages / total_pages) * 100: self.progress.configure(value=v))
+        target = os.path.abspath(save_path)
+        if any(os.path.abspath(job.output) == target and not job.is_finished() for job in self.job_scheduler.jobs()):
+            messagebox.showwarning("提示", "佇列中已有作業輸出到此檔案，請選擇其他檔名。"); return
+        job = ConversionJob(self.file_list, save_path, self.collect_options(), self.pdf_passwords)
+        self.job_rows[job.id] = self.job_tree.insert("", tk.END, values=self._job_values(job))
+        self.job_scheduler.submit(job)
+        self.status_label.config(text=f"已加入佇列：{job.name}", fg="blue")
+
+    def collect_options(self):
+        """於 Tk 執行緒讀取介面設定，轉為與介面無關的 ConversionOptions"""
+        metadata = {key: getattr(self, f"meta_{key}").get_real_value() for key in ("title", "author", "subject", "keywords")}
+        return ConversionOptions(
+            page_size=self.page_size_var.get(), orientation=self.orientation_var.get(), scale_mode=self.scale_mode_var.get(),
+            compress=self.compress_var.get(), quality=self.quality_scale.get(), dpi=int(self.dpi_var.get()), grayscale=self.grayscale_var.get(),
+            auto_rotate=self.auto_rotate_var.get(), flatten=self.pdf_flatten_var.get(),
+            scan_mode=self.scan_var.get(), despeckle=self.despeckle_var.get(), deskew=self.deskew_var.get(),
+            encrypt_password=self.password_entry.get_real_value() if self.encrypt_var.get() else "",
+            metadata=metadata, creator=self.window_title, workers=self.render_workers, max_inflight=self.render_max_inflight,
+            stream_window=self.stream_window,
+            save_profile={label: key for key, label in SAVE_PROFILE_LABELS.items()}[self.save_profile_var.get()], checkpoint=self.checkpoint_var.get())
+
+    def _run_conversion_job(self, job, progress):
+        """排程器的工作執行緒：以作業的快照執行轉換，進度事件已由 ProgressReporter 限制頻率"""
+        return run_conversion_job(job, progress, render_cache=self.render_cache)
+
+    def _on_job_event(self, job, event):
+        """排程器回報狀態或進度 (工作執行緒)；累積後只排入一次介面更新，避免多個作業同時回報時塞滿 Tk 事件佇列"""
+        with self._job_updates_lock:
+            schedule = not self._job_updates; self._job_updates.add(job)
+        if schedule: self.root.after(0, self._apply_job_updates)
+
+    def _apply_job_updates(self):
+        with self._job_updates_lock:
+            jobs, self._job_updates = self._job_updates, set()
+        for job in sorted(jobs, key=lambda j: j.id):
+            row = self.job_rows.get(job.id)
+            if row is not None and self.job_tree.exists(row): self.job_tree.item(row, values=self._job_values(job))
+            if job.is_finished() and job.id not in self._finished_jobs:
+                self._finished_jobs.add(job.id); self.on_job_finished(job)
+        self._update_queue_summary()
+
+    def _job_values(self, job):
+        event = job.event; state = JOB_STATE_LABELS[job.state]
+        if job.state == 'running' and job.cancel.is_set(): state = "停止中"
+        if job.state == 'running' and event:
+            eta = f"，剩餘約 {event['eta']:.0f} 秒" if event['eta'] is not None else ""
+            progress = f"{event['page']}/{event['total']} 頁（{event['pages_per_sec']:.1f} 頁/秒{eta}）"
+        elif job.state == 'failed': progress = job.error
+        else: progress = f"{job.pages} 頁"
+        return job.name, state, progress, job.priority
+
+    def _update_queue_summary(self):
+        """佇列標題顯示各狀態的作業數，進度列顯示所有未完成作業合計的進度"""
+        jobs = [job for job in self.job_scheduler.jobs() if not job.is_finished()]
+        running = sum(job.state == 'running' for job in jobs)
+        self.queue_label.config(text=f"轉換中 {running} 個、等待中 {len(jobs) - running} 個" if jobs else "佇列中沒有進行中的作業")
+        total = sum(job.pages for job in jobs)
+        if total: self.progress.configure(value=sum(job.fraction * job.pages for job in jobs) / total * 100)
+
+    def on_job_finished(self, job):
+        if job.state == 'done':
+            result = job.result
+            status = f"完成 {job.name}！記憶體峰值 {result['peak_rss_mb']:.0f} MB，{format_save_stats(result['save'])}，{format_image_stats(result['images'])}"
+            if result['resumed']: status = f"{status}（自第 {result['resumed'] + 1} 頁續傳）"
+            self.status_label.config(text=status, fg="green")
+            if not self.job_scheduler.active(): self.progress.configure(value=100)
+            if self.auto_open_var.get():
+                d = os.path.dirname(os.path.abspath(job.output))
+                if platform.system() == "Windows": os.startfile(d)
                 else:
-                    with fitz.open(path) as sub:
-                        if sub.is_encrypted: sub.authenticate(self.pdf_passwords.get(path, ""))
-                        from_p = item['page'] if item['page'] is not None else 0
-                        to_p = item['page'] if item['page'] is not None else len(sub) - 1
-                        for p_no in range(from_p, to_p + 1):
-                            processed_pages += 1
-                            self.root.after(0, lambda p=processed_pages: self.status_label.config(text=f"處理中 {p}/{total_pages}..."))
-                            sp = sub[p_no]
-                            if flatten:
-                                pix = sp.get_pixmap(matrix=fitz.Matrix(HIGH_RES_DPI, HIGH_RES_DPI))
-                                if gs: pix = fitz.Pixmap(fitz.csGRAY, pix)
-                                if pix.alpha:
-                                    new_pix = fitz.Pixmap(fitz.csRGB, pix.width, pix.height, 0)
-                                    new_pix.clear_with(255); new_pix.copy(pix, pix.irect); pix = new_pix
-                                img_data = pix.tobytes("jpg", jpg_quality=q)
-                                if base_size:
-                                    tw, th = base_size if target_orient == "直式" else (base_size[1], base_size[0])
-                                    if ar and ((sp.rect.width > sp.rect.height) != (tw > th)): tw, th = th, tw
-                                    page = doc.new_page(width=tw, height=th); rect = page.rect if sm == "自動填滿" else sp.rect
-                                    page.insert_image(rect, stream=img_data, keep_proportion=True)
-                                else:
-                                    page = doc.new_page(width=sp.rect.width, height=sp.rect.height)
-                                    page.insert_image(page.rect, stream=img_data)
-                                pix = None
-                            else:
-                                if base_size:
-                                    tw, th = base_size if target_orient == "直式" else (base_size[1], base_size[0])
-                                    lw, lh = (th, tw) if ar and ((sp.rect.width > sp.rect.height) != (tw > th)) else (tw, th)
-                                    page = doc.new_page(width=lw, height=lh); rect = page.rect if sm == "自動填滿" else sp.rect
-                                    page.show_pdf_page(rect, sub, sp.number)
-                                else:
-                                    doc.insert_pdf(sub, from_page=p_no, to_page=p_no)
-                            self.root.after(0, lambda v=(processed_pages / total_pages) * 100: self.progress.configure(value=v))
-            doc.set_metadata(meta)
-            if enc and opw: doc.save(save_path, garbage=4, deflate=True, encryption=fitz.PDF_ENCRYPT_AES_256, user_pw=opw, owner_pw=opw)
-            else: doc.save(save_path, garbage=4, deflate=True)
-            doc.close()
-            self.root.after(0, lambda: self.on_conversion_success(save_path))
-        except Exception as e: 
-            self.root.after(0, lambda msg=str(e): self.on_conversion_error(msg))
-
-    def on_conversion_success(self, p):
-        self.is_converting = False; self.toggle_ui_state(tk.NORMAL); self.status_label.config(text="完成！", fg="green"); messagebox.showinfo("成功", "PDF 已產生")
-        if self.auto_open_var.get():
-            d = os.path.dirname(os.path.abspath(p))
-            if platform.system() == "Windows": os.startfile(d)
-            else: webbrowser.open(f"file://{d}")
-
-    def on_conversion_error(self, m):
-        self.is_converting = False; self.toggle_ui_state(tk.NORMAL); self.status_label.config(text="失敗", fg="red"); messagebox.showerror("錯誤", f"轉換出錯：\n{m}")
+                    import webbrowser
+                    webbrowser.open(f"file://{d}")
+        elif job.state == 'failed':
+            self.status_label.config(text=f"失敗：{job.name}", fg="red"); messagebox.showerror("錯誤", f"{job.name} 轉換出錯：\n{job.error}")
+        else:
+            saved = job.options.checkpoint and job.started
+            self.status_label.config(text=f"已停止 {job.name}" + ("，進度已保存；以相同檔案與設定再次轉換即可續傳" if saved else ""), fg="gray")
+
+    def _selected_jobs(self):
+        rows = set(self.job_tree.selection())
+        return [job for job in self.job_scheduler.jobs() if self.job_rows.get(job.id) in rows]
+
+    def cancel_conversion(self):
+        """停止佇列中選取的作業；未選取時停止所有未完成的作業。執行中的作業於下一個頁面邊界停止"""
+        selected = self._selected_jobs()
+        jobs = [job for job in (selected or self.job_scheduler.jobs()) if not job.is_finished()]
+        if not jobs: return
+        if not selected and len(jobs) > 1 and not messagebox.askyesno("確認", f"是否停止全部 {len(jobs)} 個作業？"): return
+        for job in jobs: self.job_scheduler.cancel(job.id)
+        self.status_label.config(text="正在停止...", fg="blue")
+
+    def change_job_priority(self, delta):
+        for job in self._selected_jobs(): self.job_scheduler.set_priority(job.id, job.priority + delta)
+
+    def clear_finished_jobs(self):
+        for job in self.job_scheduler.remove_finished():
+            row = self.job_rows.pop(job.id, None); self._finished_jobs.discard(job.id)
+            if row is not None and self.job_tree.exists(row): self.job_tree.delete(row)
+        self._update_queue_summary()
+
+    def set_max_jobs(self, event=None): self.job_scheduler.configure(max_jobs=int(self.max_jobs_var.get()))
+
+    def on_close(self):
+        """仍有作業時先確認；確定離開則停止所有作業，待其於頁面邊界結束 (清除暫存檔或保存進度) 後才關閉視窗"""
+        active = self.job_scheduler.active()
+        if active and not messagebox.askyesno("確認", f"仍有 {active} 個轉換作業尚未完成，確定要停止並離開？"): return
+        self.job_scheduler.cancel_all(); self._close_when_idle()
+
+    def _close_when_idle(self):
+        if self.job_scheduler.active(): self.root.after(100, self._close_when_idle)
+        else: self.root.destroy()
+
+# 8. 命令列與批次模式：不建立任何 Tk 視窗，可在無圖形介面的伺服器上執行
+CLI_ORIENTATIONS = {"portrait": "直式", "landscape": "橫式", "直式": "直式", "橫式": "橫式"}
+CLI_SCALE_MODES = {"fill": "自動填滿", "original": "保持原尺寸", "自動填滿": "自動填滿", "保持原尺寸": "保持原尺寸"}
+
+def resolve_page_size(name):
+    """接受完整名稱或前綴（如 A4、Letter、original）對應至 PAGE_SIZES 的鍵值"""
+    if name in (None, "", "original"): return "原始大小"
+    if name in PAGE_SIZES: return name
+    matches = [k for k in PAGE_SIZES if k.split(" ")[0].lower() == str(name).lower()]
+    if len(matches) != 1: raise ValueError(f"不支援的頁面尺寸：{name}")
+    return matches[0]
+
+def options_from_mapping(conf):
+    """由命令列參數或清單檔 (manifest) 的設定建立 ConversionOptions"""
+    metadata = {key: conf[key] for key in ("title", "author", "subject", "keywords") if conf.get(key)}
+    # compress 可為布林值或直接指定 JPEG 品質的整數
+    compress, quality = conf.get("compress"), conf.get("quality", 80)
+    if isinstance(compress, int) and not isinstance(compress, bool): quality = compress
+    orientation, scale = conf.get("orientation") or "portrait", conf.get("scale") or "fill"
+    if orientation not in CLI_ORIENTATIONS: raise ValueError(f"orientation 需為 {'、'.join(CLI_ORIENTATIONS)} 之一：{orientation}")
+    if scale not in CLI_SCALE_MODES: raise ValueError(f"scale 需為 {'、'.join(CLI_SCALE_MODES)} 之一：{scale}")
+    return ConversionOptions(
+        page_size=resolve_page_size(conf.get("size")),
+        orientation=CLI_ORIENTATIONS[orientation], scale_mode=CLI_SCALE_MODES[scale],
+        compress=compress not in (None, False), quality=quality, dpi=conf.get("dpi") or DEFAULT_OUTPUT_DPI,
+        grayscale=conf.get("grayscale", False), scan_mode=conf.get("scan", False),
+        despeckle=conf.get("despeckle", True), deskew=conf.get("deskew", False), auto_rotate=conf.get("auto_rotate", False), flatten=conf.get("flatten", False),
+        encrypt_password=conf.get("encrypt") or "", metadata=metadata,
+        workers=conf.get("workers") or DEFAULT_RENDER_WORKERS, max_inflight=conf.get("max_inflight") or DEFAULT_MAX_INFLIGHT,
+        stream_window=conf.get("stream_window") or DEFAULT_STREAM_WINDOW, save_profile=conf.get("save_profile") or DEFAULT_SAVE_PROFILE,
+        checkpoint=conf.get("checkpoint", False),
+        prefetch_bytes=int(conf["prefetch_mb"] * 2**20) if conf.get("prefetch_mb") is not None else DEFAULT_PREFETCH_BYTES)
+
+def open_render_cache(conf):
+    """依 cache 設定開啟渲染快取；停用或快取資料夾無法寫入時回傳 None"""
+    if not conf.get("cache", True): return None
+    try: return RenderCache(max_bytes=int(conf.get("cache_mb") or DEFAULT_RENDER_CACHE_BYTES // 2**20) * 2**20)
+    except (OSError, sqlite3.Error): return None
+
+def prepare_job(conf):
+    """由命令列參數或清單檔的設定建立轉換作業；conf 需包含 inputs 與 output，可選 priority，其餘鍵值同命令列參數"""
+    # 統一為絕對路徑，資料夾展開後的檔案才能對應到指定的密碼
+    passwords = {os.path.abspath(k): v for k, v in (conf.get("passwords") or {}).items()}
+    items = build_items([os.path.abspath(p) for p in conf["inputs"]], passwords)
+    if not items: raise ValueError("沒有可轉換的檔案")
+    return ConversionJob(items, conf["output"], options_from_mapping(conf), passwords, conf.get("priority") or 0)
+
+def run_conversion_job(job, progress=None, pool=None, render_cache=None):
+    """以作業專屬的文件池執行轉換，結束時關閉其開啟的來源檔案"""
+    doc_pool = DocumentPool(passwords=job.passwords)
+    try:
+        return convert_to_pdf(job.items, job.output, job.options, job.passwords, progress, pool=pool, doc_pool=doc_pool,
+                              render_cache=render_cache, cancel=job.cancel)
+    finally:
+        doc_pool.clear()
+
+def run_job(conf, pool=None, render_cache=None, progress=None):
+    """執行單一轉換作業；conf 同 prepare_job"""
+    return run_conversion_job(prepare_job(conf), progress, pool, render_cache if conf.get("cache", True) else None)
+
+def format_image_stats(stats):
+    return (f"圖片：原檔直嵌 {stats['passthrough']}、無損嵌入 {stats['embedded']}、重新編碼 {stats['reencoded']}、"
+            f"重複引用 {stats['deduplicated']}")
+
+def interrupted_message(conf):
+    if conf.get("checkpoint"): return f"已中斷 {conf.get('output')}；進度已保存，以相同輸入與參數重新執行即可續傳"
+    return f"已中斷 {conf.get('output')}"
+
+def format_save_stats(stats):
+    return f"存檔 ({SAVE_PROFILE_LABELS[stats['profile']]}) {stats['seconds']:.1f} 秒、{stats['bytes'] / 1e6:.1f} MB"
+
+def format_result(result):
+    docs, renders = result['doc_pool'], result['render_cache']
+    cached = f"，渲染快取命中 {renders['hits']}/{renders['hits'] + renders['misses']}" if renders['hits'] + renders['misses'] else ""
+    if result['resumed']: cached += f"，自第 {result['resumed'] + 1} 頁續傳"
+    return (f"已產生 {result['output']}（{result['pages']} 頁，{result['seconds']:.1f} 秒，記憶體峰值 {result['peak_rss_mb']:.0f} MB，"
+            f"文件池命中 {docs['hits']}/{docs['hits'] + docs['misses']}{cached}；{format_save_stats(result['save'])}；{format_image_stats(result['images'])}）")
+
+def load_manifest(path):
+    """讀取批次清單：JSON 陣列、{"defaults": {...}, "jobs": [...]}，或每行一個作業的 JSON Lines"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith(".jsonl"):
+        data = {"jobs": [json.loads(line) for line in text.splitlines() if line.strip()]}
+    else:
+        data = json.loads(text)
+        if isinstance(data, list): data = {"jobs": data}
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for job in data.get("jobs", []):
+        conf = dict(data.get("defaults") or {}, **job)
+        conf["inputs"] = [os.path.join(base_dir, p) for p in conf.get("inputs", [])]
+        conf["output"] = os.path.join(base_dir, conf["output"])
+        conf["passwords"] = {os.path.join(base_dir, k): v for k, v in (conf.get("passwords") or {}).items()}
+        jobs.append(conf)
+    return jobs
+
+def _add_option_arguments(parser):
+    parser.add_argument("--size", default="original", help="頁面尺寸，如 A4、Letter 或 original (預設)")
+    parser.add_argument("--orientation", choices=["portrait", "landscape"], default="portrait", help="頁面方向")
+    parser.add_argument("--scale", choices=["fill", "original"], default="fill", help="圖片縮放：自動填滿或保持原尺寸")
+    parser.add_argument("--compress", type=int, metavar="QUALITY", help="啟用圖片壓縮並指定 JPEG 品質 (10-100)")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_OUTPUT_DPI, help="點陣化的輸出解析度，依頁面上的實際大小計算 (常用 150/200/300)")
+    parser.add_argument("--grayscale", action="store_true", help="黑白模式")
+    parser.add_argument("--scan", action="store_true", help="掃描文件模式：二值化為 1-bit 影像 (需要 numpy)")
+    parser.add_argument("--no-despeckle", dest="despeckle", action="store_false", help="掃描文件模式下不去除孤立斑點")
+    parser.add_argument("--deskew", action="store_true", help="掃描文件模式下自動校正歪斜")
+    parser.add_argument("--auto-rotate", action="store_true", help="自動旋轉以符合頁面方向")
+    parser.add_argument("--flatten", action="store_true", help="PDF 平面化")
+    parser.add_argument("--encrypt", metavar="PASSWORD", help="以 AES-256 加密輸出檔案")
+    parser.add_argument("--pdf-password", action="append", default=[], metavar="FILE=PASSWORD", help="來源 PDF 的開啟密碼，可重複指定")
+    for key in ("title", "author", "subject", "keywords"): parser.add_argument(f"--{key}", help=f"文件資訊：{key}")
+    parser.add_argument("--workers", type=int, default=DEFAULT_RENDER_WORKERS, help="平行渲染的子行程數")
+    parser.add_argument("--max-inflight", type=int, default=DEFAULT_MAX_INFLIGHT, help="同時進行渲染的最大頁數")
+    parser.add_argument("--stream-window", type=int, default=DEFAULT_STREAM_WINDOW, metavar="PAGES",
+                        help="串流輸出：每累積指定頁數即寫入磁碟，限制大型作業的記憶體用量 (0 為關閉)")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="定期儲存進度 (預設每 100 頁)；中斷後以相同輸入與參數重新執行，會從最後保存的頁面續傳")
+    parser.add_argument("--prefetch-mb", type=float, default=DEFAULT_PREFETCH_BYTES // 2**20,
+                        help="背景預讀來源檔案的記憶體上限 (MB)，讓網路磁碟的讀檔與轉換重疊；0 為關閉")
+    parser.add_argument("--save-profile", choices=list(SAVE_PROFILES), default=DEFAULT_SAVE_PROFILE,
+                        help="存檔方式：fast 最快、standard 平衡 (預設)、compact 檔案最小、web 線性化供網頁快速檢視 (需要 pikepdf)")
+    _add_cache_arguments(parser); _add_progress_arguments(parser)
+
+def _add_progress_arguments(parser):
+    parser.add_argument("--progress", action="store_true", help="於標準錯誤輸出顯示進度、速度與預估剩餘時間")
+    parser.add_argument("--events", metavar="FILE", help="將結構化進度事件以 JSON Lines 附加寫入檔案")
+
+def progress_listeners(args, stack):
+    """依 --progress / --events 建立進度 listener；開啟的檔案交由 stack 於結束時關閉"""
+    listeners = [terminal_listener()] if args.progress else []
+    if args.events: listeners.append(jsonl_listener(stack.enter_context(open(args.events, "a", encoding="utf-8"))))
+    return listeners
+
+def _add_cache_arguments(parser):
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="不使用跨作業的渲染快取")
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_RENDER_CACHE_BYTES // 2**20, help="渲染快取的容量上限 (MB)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ImageToPdfConverter", description="圖片轉 PDF 小工具（命令列模式）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_convert = sub.add_parser("convert", help="將圖片與 PDF 合併為單一 PDF")
+    p_convert.add_argument("inputs", nargs="+", help="輸入檔案或資料夾")
+    p_convert.add_argument("-o", "--output", required=True, help="輸出 PDF 路徑")
+    _add_option_arguments(p_convert)
+    p_batch = sub.add_parser("batch", help="依清單檔 (JSON / JSON Lines) 在同一行程內執行多個轉換作業")
+    p_batch.add_argument("manifest", help="批次清單檔路徑")
+    p_batch.add_argument("--workers", type=int, default=DEFAULT_RENDER_WORKERS, help="所有作業共用的渲染子行程數")
+    p_batch.add_argument("--jobs", type=int, default=1, help="同時執行的作業數 (預設 1，依清單與 priority 順序逐一執行)")
+    p_batch.add_argument("--memory-limit-mb", type=float, help="並行作業的估計記憶體總量上限 (MB)，預設為實體記憶體的一半")
+    _add_cache_arguments(p_batch); _add_progress_arguments(p_batch)
+    p_serve = sub.add_parser("serve", help="啟動本機 HTTP 轉換服務，供其他程式以 POST /convert 轉換檔案")
+    p_serve.add_argument("--host", default=DEFAULT_SERVICE_HOST, help="監聽位址 (預設只接受本機連線)")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_SERVICE_PORT, help="監聽埠號；0 為由系統指定")
+    p_serve.add_argument("--workers", type=int, default=DEFAULT_RENDER_WORKERS, help="預先啟動、所有請求共用的渲染子行程數")
+    p_serve.add_argument("--jobs", type=int, default=DEFAULT_MAX_JOBS, help="同時執行的轉換數")
+    p_serve.add_argument("--max-pending", type=int, default=DEFAULT_SERVICE_MAX_PENDING,
+                         help="執行中與等待中的請求上限，超過時回應 503 與 Retry-After")
+    p_serve.add_argument("--memory-limit-mb", type=float, help="並行轉換的估計記憶體總量上限 (MB)，預設為實體記憶體的一半")
+    p_serve.add_argument("--max-upload-mb", type=float, default=DEFAULT_SERVICE_UPLOAD_MB, help="單一請求的上傳資料上限 (MB)")
+    p_serve.add_argument("--allow-path", action="append", default=[], metavar="DIR",
+                         help="允許以伺服器端路徑指定此資料夾內的來源檔案，可重複指定 (預設只接受上傳)")
+    p_serve.add_argument("--quiet", action="store_true", help="不輸出每個請求的存取紀錄")
+    _add_cache_arguments(p_serve); _add_progress_arguments(p_serve)
+    args = parser.parse_args(argv)
+    with contextlib.ExitStack() as stack:
+        listeners = progress_listeners(args, stack)
+        return {"convert": run_convert, "batch": run_batch, "serve": run_serve}[args.command](args, listeners)
+
+def run_convert(args, listeners):
+    conf = vars(args).copy()
+    conf["passwords"] = dict(pw.split("=", 1) for pw in args.pdf_password)
+    render_cache = open_render_cache(conf)
+    try: result = run_job(conf, render_cache=render_cache, progress=ProgressReporter(*listeners))
+    except KeyboardInterrupt:
+        print(interrupted_message(conf), file=sys.stderr); return 130
+    except Exception as e:
+        print(f"轉換失敗：{e}", file=sys.stderr); return 1
+    finally:
+        if render_cache: render_cache.close()
+    print(format_result(result))
+    return 0
+
+def run_batch(args, listeners):
+    confs = load_manifest(args.manifest); total = len(confs); failed = 0
+    # 批次模式共用同一個行程池，子行程只需載入一次 PyMuPDF；並行的作業也共用這些子行程
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    render_cache = open_render_cache(vars(args))  # 各作業可在清單中以 "cache": false 個別停用
+    numbers = {}; job_confs = {}
+
+    def runner(job, progress):
+        return run_conversion_job(job, progress, pool, render_cache if job_confs[job.id].get("cache", True) else None)
+
+    def on_job(job, event):
+        if event is not None:
+            for listener in listeners: listener(dict(event, job=job.name))
+        elif job.state == 'done': print(f"[{numbers[job.id]}/{total}] {format_result(job.result)}")
+        elif job.state == 'failed': print(f"[{numbers[job.id]}/{total}] 轉換失敗 {job.output}：{job.error}", file=sys.stderr)
+        elif job.state == 'cancelled': print(f"[{numbers[job.id]}/{total}] {interrupted_message(job_confs[job.id])}", file=sys.stderr)
+
+    scheduler = JobScheduler(runner, args.jobs, max(1, args.workers), args.memory_limit_mb, on_job)
+    try:
+        for n, conf in enumerate(confs, 1):
+            conf.setdefault("workers", args.workers)
+            try: job = prepare_job(conf)
+            except Exception as e:
+                failed += 1; print(f"[{n}/{total}] 轉換失敗 {conf.get('output')}：{e}", file=sys.stderr); continue
+            numbers[job.id] = n; job_confs[job.id] = conf
+            scheduler.submit(job)  # 先準備好的作業先開始，其餘作業的檔案探測與轉換同時進行
+        scheduler.wait()
+    except KeyboardInterrupt:
+        scheduler.cancel_all(); scheduler.wait(); return 130
+    finally:
+        if pool: pool.shutdown()
+        if render_cache: render_cache.close()
+    return 1 if failed or any(job.state != 'done' for job in scheduler.jobs()) else 0
+
+# 9. 本機 HTTP 轉換服務：請求轉為 ConversionJob 交給 JobScheduler，渲染子行程於啟動時預先建立並載入 PyMuPDF
+DEFAULT_SERVICE_HOST = "127.0.0.1"  # 預設只接受本機連線
+DEFAULT_SERVICE_PORT = 8765
+DEFAULT_SERVICE_MAX_PENDING = 8     # 執行中與等待中的轉換請求上限，超過時回應 503 讓呼叫端稍後重試
+DEFAULT_SERVICE_UPLOAD_MB = 512     # 單一請求的上傳資料上限
+SERVICE_RETRY_AFTER = 2             # 503 回應建議的重試秒數
+SERVICE_POLL_SECONDS = 0.5          # 等待轉換時檢查呼叫端是否已斷線的間隔
+SERVICE_LATENCY_WINDOW = 1000       # 延遲分佈以最近幾筆成功的請求計算
+SERVICE_THROUGHPUT_SECONDS = 60     # 吞吐量以最近幾秒計算
+SERVICE_STREAM_CHUNK = 1024 * 1024
+SERVICE_OPTION_KEYS = ("size", "orientation", "scale", "compress", "quality", "dpi", "grayscale", "scan", "despeckle", "deskew",
+                       "auto_rotate", "flatten", "encrypt", "title", "author", "subject", "keywords", "save_profile", "stream_window",
+                       "priority", "passwords", "filename")
+SERVICE_BOOL_KEYS = ("grayscale", "scan", "despeckle", "deskew", "auto_rotate", "flatten")
+SERVICE_INT_KEYS = ("quality", "dpi", "stream_window", "priority")
+SERVICE_TRUE_VALUES, SERVICE_FALSE_VALUES = ("1", "true", "yes", "on"), ("0", "false", "no", "off")
+# 直接以檔案內容作為請求本體 (非 multipart) 時，依 Content-Type 決定副檔名
+SERVICE_UPLOAD_TYPES = {"application/pdf": ".pdf", "image/jpeg": ".jpg", "image/png": ".png", "image/bmp": ".bmp", "image/tiff": ".tiff"}
+
+class ServiceError(Exception):
+    """回應給呼叫端的錯誤，附帶 HTTP 狀態碼與額外標頭"""
+    def __init__(self, status, message, headers=None):
+        super().__init__(message); self.status = status; self.headers = headers or {}
+
+def parse_service_flag(value):
+    """查詢字串或表單的布林值：1/true/yes/on 與 0/false/no/off，其餘值引發 ValueError"""
+    value = value.strip().lower()
+    if value in SERVICE_TRUE_VALUES: return True
+    if value in SERVICE_FALSE_VALUES: return False
+    raise ValueError(value)
+
+def service_options(values):
+    """將查詢字串、表單欄位或 JSON 的設定轉為 prepare_job 的 conf；字串值依欄位轉為布林或整數，未知參數視為錯誤"""
+    conf = {}
+    for key, value in values.items():
+        key = key.replace("-", "_")
+        if key not in SERVICE_OPTION_KEYS: raise ServiceError(400, f"不支援的參數：{key}")
+        try:
+            if key == "passwords" and isinstance(value, str): value = json.loads(value)
+            elif isinstance(value, str) and key in SERVICE_BOOL_KEYS: value = parse_service_flag(value)
+            elif isinstance(value, str) and key == "compress":  # JPEG 品質或開關
+                value = int(value) if value.strip().isdigit() else parse_service_flag(value)
+            elif isinstance(value, str) and key in SERVICE_INT_KEYS: value = int(value)
+        except ValueError: raise ServiceError(400, f"參數格式不正確：{key}={value}")
+        conf[key] = value
+    if not isinstance(conf.get("passwords", {}), dict): raise ServiceError(400, "passwords 需為 {檔名: 密碼} 物件")
+    return conf
+
+def latency_summary(values):
+    """延遲分佈 (秒)：筆數、平均、p50 / p90 / p99 與最大值"""
+    if not values: return {'count': 0}
+    values = sorted(values); n = len(values)
+    pick = lambda q: round(values[min(n - 1, int(q * n))], 4)
+    return {'count': n, 'mean': round(sum(values) / n, 4), 'p50': pick(0.5), 'p90': pick(0.9), 'p99': pick(0.99), 'max': round(values[-1], 4)}
+
+class ServiceMetrics:
+    """服務統計：依狀態碼累計回應數、頁數與傳輸量，並以最近成功的轉換請求計算延遲分佈與吞吐量"""
+    def __init__(self, window=SERVICE_LATENCY_WINDOW):
+        self._lock = threading.Lock(); self.started = time.time()
+        self.responses = collections.Counter(); self.totals = collections.Counter()
+        self._recent = collections.deque(maxlen=window)  # (完成時間, 總延遲, 排隊時間, 頁數, 輸出位元組)
+        self.in_flight = 0
+
+    def record(self, status, seconds=0.0, queued=0.0, pages=0, bytes_in=0, bytes_out=0):
+        with self._lock:
+            self.responses[status] += 1; self.totals.update(pages=pages, bytes_in=bytes_in, bytes_out=bytes_out)
+            if status == 200: self._recent.append((time.time(), seconds, queued, pages, bytes_out))
+
+    def track(self, delta):
+        with self._lock: self.in_flight += delta
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            recent = list(self._recent); responses = dict(self.responses); totals = dict(self.totals); in_flight = self.in_flight
+        window = [r for r in recent if now - r[0] <= SERVICE_THROUGHPUT_SECONDS]
+        span = max(1e-6, min(SERVICE_THROUGHPUT_SECONDS, now - self.started))
+        return {'uptime': round(now - self.started, 1), 'in_flight': in_flight, 'responses': responses,
+                'totals': {k: totals.get(k, 0) for k in ('pages', 'bytes_in', 'bytes_out')},
+                'latency': latency_summary([r[1] for r in recent]), 'queue_wait': latency_summary([r[2] for r in recent]),
+                'throughput': {'window_seconds': round(span, 1), 'requests_per_second': round(len(window) / span, 3),
+                               'pages_per_second': round(sum(r[3] for r in window) / span, 3),
+                               'mb_out_per_second': round(sum(r[4] for r in window) / span / 2**20, 3)}}
+
+def _warm_render_worker():
+    """渲染子行程的 initializer：先載入 PyMuPDF，第一個請求不必等待匯入"""
+    fitz.preload()
+
+class ConversionService:
+    """HTTP 服務背後與協定無關的部分：預先啟動的渲染行程池、作業排程、請求數上限 (背壓) 與統計。
+    allowed_roots 為允許以伺服器端路徑指定來源的資料夾；未指定時只接受上傳檔案"""
+    def __init__(self, workers=DEFAULT_RENDER_WORKERS, max_jobs=DEFAULT_MAX_JOBS, max_pending=DEFAULT_SERVICE_MAX_PENDING,
+                 memory_limit_mb=None, render_cache=None, allowed_roots=(), max_upload_bytes=DEFAULT_SERVICE_UPLOAD_MB * 2**20, listeners=()):
+        fitz.preload()  # 頁數少或只有一個渲染行程時在本行程渲染，同樣不需在第一個請求時匯入
+        self.workers = max(1, int(workers)); self.max_pending = max(1, int(max_pending))
+        self.render_cache = render_cache; self.max_upload_bytes = max_upload_bytes; self.listeners = list(listeners)
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots]
+        self.metrics = ServiceMetrics(); self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.pool = None
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_render_worker)
+            # 同時送出與子行程數相同的工作，讓行程池在第一個請求前就啟動全部子行程
+            for future in [self.pool.submit(os.getpid) for _ in range(self.workers)]: future.result()
+        self.scheduler = JobScheduler(self._run, max_jobs, self.workers, memory_limit_mb, self._on_job)
+
+    def _run(self, job, progress):
+        return run_conversion_job(job, progress, self.pool, self.render_cache)
+
+    def _on_job(self, job, event):
+        if event is not None:
+            for listener in self.listeners: listener(dict(event, job=job.name))
+
+    @contextlib.contextmanager
+    def admit(self):
+        """取得一個請求名額；已達 max_pending 時立即以 503 拒絕，而不是讓請求無限排隊"""
+        if not self._slots.acquire(blocking=False):
+            raise ServiceError(503, "轉換請求過多，請稍後再試", {'Retry-After': str(SERVICE_RETRY_AFTER)})
+        self.metrics.track(1)
+        try: yield
+        finally:
+            self.metrics.track(-1); self._slots.release()
+
+    @contextlib.contextmanager
+    def workspace(self):
+        """單一請求的暫存資料夾 (上傳檔案與輸出 PDF)，回應結束後刪除"""
+        import shutil, tempfile
+        path = tempfile.mkdtemp(prefix="img2pdf-")
+        try: yield path
+        finally: shutil.rmtree(path, ignore_errors=True)
+
+    def resolve_path(self, path):
+        """檢查伺服器端路徑位於允許的資料夾內"""
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([real, root]) == root for root in self.allowed_roots):
+            raise ServiceError(403, f"不允許存取此路徑：{path}")
+        if not os.path.exists(real): raise ServiceError(400, f"找不到檔案：{path}")
+        return real
+
+    def build_job(self, conf, uploads, workdir):
+        """由請求設定建立作業：uploads 為已寫入 workdir 的 (原始檔名, 路徑)，conf['inputs'] 為伺服器端路徑；
+        passwords 以上傳時的檔名或伺服器端路徑為鍵"""
+        passwords = dict(conf.get("passwords") or {}); inputs = []
+        for name, path in uploads:
+            inputs.append(path)
+            if name in passwords: passwords[path] = passwords.pop(name)
+        for path in conf.get("inputs") or []:
+            real = self.resolve_path(path); inputs.append(real)
+            if path in passwords: passwords[real] = passwords.pop(path)
+        if not inputs: raise ServiceError(400, "請上傳檔案或以 inputs 指定來源路徑")
+        conf = dict(conf, inputs=inputs, passwords=passwords, output=os.path.join(workdir, "output.pdf"), workers=self.workers)
+        try: return prepare_job(conf)
+        except Exception as e: raise ServiceError(400, str(e))
+
+    def run(self, job, gone=None):
+        """排入作業並等待結束；gone() 回傳 True (呼叫端已斷線) 時取消作業，釋放資源給其他請求"""
+        self.scheduler.submit(job)
+        while not job.done.wait(SERVICE_POLL_SECONDS):
+            if gone is not None and gone(): self.scheduler.cancel(job.id)
+        self.scheduler.remove_finished()
+        return job
+
+    def health(self):
+        return {'status': 'ok', 'pid': os.getpid(), 'workers': self.workers, 'render_processes': self.workers if self.pool else 0,
+                'max_pending': self.max_pending, 'server_paths': bool(self.allowed_roots)}
+
+    def describe_options(self):
+        """可用的參數值，供呼叫端建立請求"""
+        return {'sizes': ["original"] + [name for name, size in PAGE_SIZES.items() if size],
+                'orientations': ["portrait", "landscape"], 'scales': ["fill", "original"],
+                'save_profiles': list(SAVE_PROFILES), 'extensions': list(SUPPORTED_EXTS), 'options': list(SERVICE_OPTION_KEYS)}
+
+    def metrics_snapshot(self):
+        return dict(self.metrics.snapshot(), scheduler=self.scheduler.stats())
+
+    def close(self):
+        self.scheduler.cancel_all(); self.scheduler.wait(10)
+        if self.pool: self.pool.shutdown(cancel_futures=True)
+
+def create_service_server(service, host=DEFAULT_SERVICE_HOST, port=DEFAULT_SERVICE_PORT, quiet=False):
+    """建立處理 HTTP 請求的 ThreadingHTTPServer；port 為 0 時由系統指定可用埠號 (見 server.server_address)。
+    GET /health、/options、/metrics、/jobs 回傳 JSON；POST /convert 接受 multipart 上傳、JSON (伺服器端路徑) 或單一檔案本體，回應 PDF"""
+    import select, shutil, socket, urllib.parse
+    from email import policy
+    from email.parser import BytesParser
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ConversionRequestHandler(BaseHTTPRequestHandler):
+        server_version = "ImageToPdfConverter"
+
+        def log_message(self, format, *args):
+            if not quiet: super().log_message(format, *args)
+
+        def _json(self, status, data, headers=None):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8"); self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items(): self.send_header(key, value)
+            self.end_headers(); self.wfile.write(body)
+
+        def do_GET(self):
+            routes = {"/health": service.health, "/options": service.describe_options, "/metrics": service.metrics_snapshot,
+                      "/jobs": lambda: {'jobs': [job.snapshot() for job in service.scheduler.jobs()]}}
+            route = routes.get(urllib.parse.urlsplit(self.path).path)
+            if route is None: self._json(404, {'error': "找不到此路徑"})
+            else: self._json(200, route())
+
+        def _client_gone(self):
+            try:
+                readable = select.select([self.connection], [], [], 0)[0]
+                return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+            except OSError: return True
+
+        def _read_body(self, workdir):
+            """讀取請求本體，回傳 (設定, 上傳檔案清單, 位元組數)；單一檔案本體直接分段寫入磁碟"""
+            url = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            if self.headers.get("Content-Length") is None: raise ServiceError(411, "需要 Content-Length")
+            length = int(self.headers["Content-Length"])
+            if length > service.max_upload_bytes: raise ServiceError(413, f"上傳資料超過上限 {service.max_upload_bytes // 2**20} MB")
+            ctype = self.headers.get_content_type(); fields = {}; files = []
+            if ctype in SERVICE_UPLOAD_TYPES:
+                name = os.path.basename(query.pop("name", "") or self.headers.get("X-Filename", "")) or "upload" + SERVICE_UPLOAD_TYPES[ctype]
+                files.append((name, self.rfile, length))
+            elif ctype == "application/json":
+                body = self.rfile.read(length); self._unread = 0
+                data = json.loads(body or b"{}")
+                if not isinstance(data, dict): raise ServiceError(400, "JSON 本體需為物件")
+                fields = data
+            elif ctype == "multipart/form-data":
+                head = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("latin-1")
+                body = self.rfile.read(length); self._unread = 0
+                message = BytesParser(policy=policy.HTTP).parsebytes(head + body)
+                for part in message.iter_parts():
+                    data = part.get_payload(decode=True) or b""
+                    if part.get_filename(): files.append((os.path.basename(part.get_filename()), io.BytesIO(data), len(data)))
+                    elif part.get_param("name", header="content-disposition") == "options":
+                        options = json.loads(data)
+                        if not isinstance(options, dict): raise ServiceError(400, "options 需為 JSON 物件")
+                        fields.update(options)
+                    else: fields[part.get_param("name", header="content-disposition")] = data.decode("utf-8")
+            elif length: raise ServiceError(415, f"不支援的內容類型：{ctype}")
+            inputs = fields.pop("inputs", None)
+            if inputs is not None and (not isinstance(inputs, list) or not all(isinstance(p, str) for p in inputs)):
+                raise ServiceError(400, "inputs 需為路徑字串陣列")
+            conf = service_options(dict(query, **fields)); conf["inputs"] = inputs
+            uploads = []
+            for n, (name, stream, size) in enumerate(files, 1):
+                if not name.lower().endswith(SUPPORTED_EXTS): raise ServiceError(400, f"不支援的檔案格式：{name}")
+                path = os.path.join(workdir, f"{n:04d}-{name}")  # 加上序號保留上傳順序並避免同名檔案互相覆蓋
+                with open(path, "wb") as f:
+                    while size > 0:
+                        chunk = stream.read(min(size, SERVICE_STREAM_CHUNK))
+                        if not chunk: raise ServiceError(400, "上傳資料不完整")
+                        f.write(chunk); size -= len(chunk)
+                        if stream is self.rfile: self._unread -= len(chunk)
+                uploads.append((name, path))
+            return conf, uploads, length
+
+        def _discard_body(self):
+            """提早拒絕時讀掉尚未讀取的本體，呼叫端送完資料後才能收到錯誤回應而不是連線中斷；
+            _unread 隨實際讀取遞減，已讀完的本體不會再等待不存在的資料"""
+            remaining = self._unread if self._unread <= service.max_upload_bytes else 0
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, SERVICE_STREAM_CHUNK))
+                if not chunk: break
+                remaining -= len(chunk)
+
+        def do_POST(self):
+            if urllib.parse.urlsplit(self.path).path != "/convert": self._json(404, {'error': "找不到此路徑"}); return
+            started = time.perf_counter(); status, job, received, sent = 500, None, 0, 0
+            try: self._unread = int(self.headers.get("Content-Length") or 0)
+            except ValueError: self._unread = 0
+            try:
+                with service.admit(), service.workspace() as workdir:
+                    conf, uploads, received = self._read_body(workdir)
+                    if conf.get("inputs") and not service.allowed_roots: raise ServiceError(403, "此服務未開放伺服器端路徑 (--allow-path)")
+                    job = service.run(service.build_job(conf, uploads, workdir), self._client_gone)
+                    if job.state == 'cancelled': status = 499; return  # 呼叫端已斷線，不需回應
+                    if job.state == 'failed': raise ServiceError(500, f"轉換失敗：{job.error}")
+                    sent = os.path.getsize(job.output)
+                    filename = os.path.basename(conf.get("filename") or "converted.pdf")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/pdf"); self.send_header("Content-Length", str(sent))
+                    self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{urllib.parse.quote(filename)}")
+                    self.send_header("X-Job-Id", str(job.id)); self.send_header("X-Pages", str(job.result['pages']))
+                    self.send_header("X-Queue-Seconds", f"{job.started - job.submitted:.3f}")
+                    self.send_header("X-Convert-Seconds", f"{job.result['seconds']:.3f}")
+                    self.end_headers()
+                    with open(job.output, "rb") as f: shutil.copyfileobj(f, self.wfile, SERVICE_STREAM_CHUNK)
+                    status = 200
+            except ServiceError as e:
+                status = e.status; self._json(e.status, {'error': str(e)}, e.headers); self._discard_body()
+            except (ValueError, UnicodeDecodeError) as e:
+                status = 400; self._json(400, {'error': f"請求格式不正確：{e}"}); self._discard_body()
+            except (BrokenPipeError, ConnectionResetError):
+                status = 499
+            finally:
+                ok = status == 200
+                service.metrics.record(status, time.perf_counter() - started, job.started - job.submitted if ok else 0.0,
+                                       job.result['pages'] if ok else 0, received, sent if ok else 0)
+
+    server = ThreadingHTTPServer((host, port), ConversionRequestHandler)
+    server.daemon_threads = True
+    return server
+
+def run_serve(args, listeners):
+    render_cache = open_render_cache(vars(args))
+    service = ConversionService(args.workers, args.jobs, args.max_pending, args.memory_limit_mb, render_cache, args.allow_path,
+                                int(args.max_upload_mb * 2**20), listeners)
+    try: server = create_service_server(service, args.host, args.port, args.quiet)
+    except OSError as e:
+        service.close(); print(f"無法啟動服務：{e}", file=sys.stderr); return 1
+    host, port = server.server_address[:2]
+    print(f"轉換服務已啟動：http://{host}:{port}/（渲染子行程 {service.workers if service.pool else '無 (本行程渲染)'}，"
+          f"同時轉換 {args.jobs}，請求上限 {service.max_pending}）", flush=True)
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally:
+        server.server_close(); service.close()
+        if render_cache: render_cache.close()
+    return 0
+
+startup_timer.mark("載入程式模組")
 
 if __name__ == "__main__":
-    root = TkinterDnD.Tk(); app = ImageToPdfConverter(root); root.mainloop()
\ No newline at end of file
+    multiprocessing.freeze_support()  # PyInstaller 單一執行檔下啟動子行程所需
+    if len(sys.argv) > 1:
+        code = main(); startup_timer.mark("命令列作業結束"); startup_timer.report(); sys.exit(code)
+    if tk is None:
+        print("無法開啟圖形介面：未安裝 Tk (python3-tk)。命令列模式請執行 ImageToPdfConverter.py --help", file=sys.stderr); sys.exit(1)
+    from tkinterdnd2 import TkinterDnD  # 拖放支援只有介面需要，命令列模式不必安裝
+    root = TkinterDnD.Tk(); startup_timer.mark("建立 Tk 視窗")
+    app = ImageToPdfConverter(root); startup_timer.mark("建立介面元件")
+    root.mainloop()
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""轉換效能基準測試：於暫存資料夾產生合成的測試檔案，量測各轉換路徑的耗時。
+
+    python benchmark.py merge --pages 2000
+    python benchmark.py suite --output bench.json
+    python benchmark.py suite --baseline bench.json --fail-on-regression
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import fitz
+
+import ImageToPdfConverter as app
+
+
+def make_sample_pdf(path, pages):
+    """產生含文字、共用圖片與連結的多頁 PDF，模擬實際合併作業的資源與註解負擔"""
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 200, 120), 0); pix.clear_with(180)
+    logo = pix.tobytes("png")
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Benchmark page {n + 1}", fontsize=18)
+        page.insert_image(fitz.Rect(72, 100, 272, 220), stream=logo)
+        page.insert_link({"kind": fitz.LINK_URI, "from": fitz.Rect(72, 60, 300, 80), "uri": "https://example.com"})
+    doc.save(path, garbage=4, deflate=True); doc.close()
+
+
+def merge_per_page(items, save_path):
+    """改版前的做法：每一頁各呼叫一次 insert_pdf"""
+    doc = fitz.open()
+    for item in items:
+        with fitz.open(item.path) as sub:
+            pages = [item.page] if item.page is not None else range(len(sub))
+            for p_no in pages: doc.insert_pdf(sub, from_page=p_no, to_page=p_no)
+    doc.save(save_path, garbage=4, deflate=True); doc.close()
+
+
+def timed(func, *args):
+    started = time.perf_counter(); func(*args)
+    return time.perf_counter() - started
+
+
+def bench_merge(pages, files):
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = [os.path.join(tmp, f"src{n}.pdf") for n in range(files)]
+        for path in sources: make_sample_pdf(path, pages // files)
+        whole = [app.FileEntry(p, None, pages // files) for p in sources]
+        # 模擬「展開 PDF」後的清單：每頁一個項目，但頁碼仍連續
+        expanded = [app.FileEntry(p, n) for p in sources for n in range(pages // files)]
+        options = app.ConversionOptions()
+        out = os.path.join(tmp, "out.pdf")
+        for label, items in (("整份 PDF", whole), ("展開後逐頁項目", expanded)):
+            before = timed(merge_per_page, items, out); before_size = os.path.getsize(out)
+            after = timed(app.convert_to_pdf, items, out, options); after_size = os.path.getsize(out)
+            print(f"{label}：逐頁插入 {before:.2f} 秒 ({before_size / 1e6:.1f} MB) → "
+                  f"區間合併 {after:.2f} 秒 ({after_size / 1e6:.1f} MB)，加速 {before / after:.1f} 倍")
+
+
+# 合成測試資料的規模：(檔名前綴, 格式, 寬, 高, 數量)；PDF 為 (一般頁數, 加密頁數)
+CORPUS_SCALES = {
+    "small": {'images': [("photo", "jpg", 3000, 2000, 2), ("small", "jpg", 640, 480, 10), ("chart", "png", 1200, 900, 4),
+                         ("scan", "bmp", 1240, 1754, 2), ("fax", "tiff", 1240, 1754, 2)], 'pdf': (40, 10)},
+    "full": {'images': [("photo", "jpg", 4000, 3000, 6), ("small", "jpg", 640, 480, 40), ("chart", "png", 1600, 1200, 10),
+                        ("scan", "bmp", 2480, 3508, 4), ("fax", "tiff", 2480, 3508, 4)], 'pdf': (300, 100)},
+}
+BENCH_PASSWORD = "bench"
+LIST_ITEMS = 20000
+
+
+def make_sample_image(path, fmt, width, height, rng):
+    """以 PyMuPDF 繪製隨機色塊與文字後點陣化，產生可重現的合成圖片；BMP 與 TIFF 需要 Pillow"""
+    if fmt in ("bmp", "tiff") and app.PILImage is None: return False
+    doc = fitz.open(); page = doc.new_page(width=width / 10, height=height / 10)
+    for _ in range(40):
+        x, y = rng.uniform(0, page.rect.width), rng.uniform(0, page.rect.height)
+        rect = fitz.Rect(x, y, x + rng.uniform(5, page.rect.width / 2), y + rng.uniform(5, page.rect.height / 2))
+        page.draw_rect(rect, color=None, fill=(rng.random(), rng.random(), rng.random()), fill_opacity=0.7)
+    page.insert_text((5, 15), os.path.basename(path), fontsize=8)
+    pix = page.get_pixmap(matrix=fitz.Matrix(10, 10)); doc.close()
+    if fmt == "jpg": data = pix.tobytes("jpg", jpg_quality=90)
+    elif fmt == "png": data = pix.tobytes("png")
+    else:
+        app.PILImage.frombytes("RGB", (pix.width, pix.height), pix.samples).save(path, format=fmt.upper()); return True
+    with open(path, "wb") as f: f.write(data)
+    return True
+
+
+def build_corpus(folder, scale, seed=0):
+    """於 folder 產生合成測試資料 (已存在的檔案沿用)，回傳 (檔案路徑清單, 密碼對照表)"""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed); spec = CORPUS_SCALES[scale]; paths = []
+    for prefix, fmt, width, height, count in spec['images']:
+        for n in range(count):
+            path = os.path.join(folder, f"{prefix}{n:03d}.{fmt}")
+            if os.path.exists(path) or make_sample_image(path, fmt, width, height, rng): paths.append(path)
+    pages, locked_pages = spec['pdf']
+    doc_path, locked_path = os.path.join(folder, "document.pdf"), os.path.join(folder, "locked.pdf")
+    if not os.path.exists(doc_path): make_sample_pdf(doc_path, pages)
+    if not os.path.exists(locked_path):
+        make_sample_pdf(locked_path, locked_pages)
+        with fitz.open(locked_path) as doc: data = doc.tobytes(encryption=fitz.PDF_ENCRYPT_AES_256, user_pw=BENCH_PASSWORD, owner_pw=BENCH_PASSWORD)
+        with open(locked_path, "wb") as f: f.write(data)
+    return paths + [doc_path, locked_path], {locked_path: BENCH_PASSWORD}
+
+
+def record(name, seconds, count, peak_rss_mb, output_bytes=None):
+    return {'name': name, 'seconds': round(seconds, 4), 'count': count, 'per_sec': round(count / seconds, 2) if seconds else None,
+            'peak_rss_mb': round(peak_rss_mb, 1), 'output_bytes': output_bytes}
+
+
+def bench_conversions(paths, passwords, folder, repeat, selected):
+    """以所有模式組合 (原始大小 / A4、壓縮、黑白、平面化、加密) 轉換整份測試資料"""
+    items = app.build_items(paths, passwords)
+    pages = sum(item.page_count for item in items)
+    out = os.path.join(folder, "out.pdf")
+    for size, compress, gray, flatten, encrypt in itertools.product(("original", "A4"), (False, True), (False, True), (False, True), (False, True)):
+        name = "convert/" + "+".join([size] + [flag for flag, on in (("compress", compress), ("gray", gray), ("flatten", flatten), ("encrypt", encrypt)) if on])
+        if not selected(name): continue
+        options = app.ConversionOptions(page_size=app.resolve_page_size(size), compress=compress, quality=70, grayscale=gray,
+                                        flatten=flatten, encrypt_password=BENCH_PASSWORD if encrypt else "")
+        # 取多次執行中最快的一次，降低背景負載的干擾
+        result = min((app.convert_to_pdf(items, out, options, passwords) for _ in range(repeat)), key=lambda r: r['seconds'])
+        yield record(name, result['seconds'], pages, result['peak_rss_mb'], os.path.getsize(out))
+
+
+def bench_thumbnails(paths, passwords, repeat, selected):
+    """圖片縮圖 (EXIF 內嵌縮圖、Pillow 縮放解碼或 PyMuPDF 完整解碼) 與 PDF 頁面縮圖的產生速度"""
+    images = [p for p in paths if not p.lower().endswith(".pdf")]
+    pdfs = [p for p in paths if p.lower().endswith(".pdf")]
+
+    def image_thumbs():
+        for path in images:
+            if app.render_raster_thumbnail(path) is None:
+                with fitz.open(path) as doc: app._pixmap_thumbnail(doc[0], app.THUMB_SIZE)
+        return len(images)
+
+    def pdf_thumbs():
+        count = 0
+        for path in pdfs:
+            with fitz.open(path) as doc:
+                if doc.is_encrypted: doc.authenticate(passwords.get(path, ""))
+                for page in doc: app._pixmap_thumbnail(page, app.THUMB_SIZE); count += 1
+        return count
+
+    for name, func in (("thumbnails/images", image_thumbs), ("thumbnails/pdf-pages", pdf_thumbs)):
+        if selected(name): yield timed_record(name, func, repeat)
+
+
+def bench_list_operations(repeat, selected):
+    """待處理清單的插入、交換、重新排序、頁碼查詢與刪除"""
+    entries = [app.FileEntry(f"/bench/file{n:05d}.pdf", None, 1 + n % 7) for n in range(LIST_ITEMS)]
+    rng = random.Random(1)
+    swaps = [(rng.randrange(LIST_ITEMS), rng.randrange(LIST_ITEMS)) for _ in range(2000)]
+    removals = rng.sample(range(LIST_ITEMS), 2000)
+
+    def filled():
+        model = app.FileListModel(); model.insert(0, entries); return model
+
+    def insert():
+        model = app.FileListModel()
+        for n in range(0, LIST_ITEMS, 100): model.insert(len(model), entries[n:n + 100])
+        return LIST_ITEMS // 100
+
+    def swap(model):
+        for i, j in swaps: model.swap(i, j)
+        return len(swaps)
+
+    def reorder(model):
+        model.reorder(list(reversed(range(len(model))))); return 1
+
+    def page_offsets(model):
+        for n in range(0, LIST_ITEMS, 4): model.page_offset(n)
+        return LIST_ITEMS // 4
+
+    def delete(model):
+        for n in range(0, len(removals), 100): model.delete([i for i in removals[n:n + 100] if i < len(model)])
+        return len(removals) // 100
+
+    ops = (("list/insert", insert, None), ("list/swap", swap, filled), ("list/reorder", reorder, filled),
+           ("list/page-offset", page_offsets, filled), ("list/delete", delete, filled))
+    for name, func, setup in ops:
+        if selected(name): yield timed_record(name, func, repeat, setup)
+
+
+def timed_record(name, func, repeat, setup=None):
+    best = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        with app.MemoryMonitor() as monitor:
+            started = time.perf_counter(); count = func(arg) if setup else func(); seconds = time.perf_counter() - started
+        if best is None or seconds < best['seconds']: best = record(name, seconds, count, monitor.peak_mb)
+    return best
+
+
+def compare(results, baseline, threshold):
+    """與基準結果比較耗時與輸出大小，回傳變慢超過 threshold (比例) 的項目名稱"""
+    base = {r['name']: r for r in baseline['results']}; regressions = []
+    for r in results:
+        old = base.get(r['name'])
+        if not old: print(f"  {r['name']:<48} (基準中無此項目)"); continue
+        change = r['seconds'] / old['seconds'] - 1 if old['seconds'] else 0.0
+        size = ""
+        if r['output_bytes'] and old.get('output_bytes'): size = f"，大小 {r['output_bytes'] / old['output_bytes'] - 1:+.1%}"
+        flag = ""
+        if change > threshold: regressions.append(r['name']); flag = "  ← 變慢"
+        print(f"  {r['name']:<48} {old['seconds']:.3f} → {r['seconds']:.3f} 秒 ({change:+.1%}{size}){flag}")
+    return regressions
+
+
+def bench_suite(args):
+    selected = (lambda name: any(f in name for f in args.filter)) if args.filter else (lambda name: True)
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.corpus or os.path.join(tmp, "corpus")
+        paths, passwords = build_corpus(folder, args.scale, args.seed)
+        results = []
+        groups = (bench_conversions(paths, passwords, tmp, args.repeat, selected), bench_thumbnails(paths, passwords, args.repeat, selected),
+                  bench_list_operations(args.repeat, selected))
+        for r in itertools.chain(*groups):
+            results.append(r)
+            size = f"，{r['output_bytes'] / 1e6:.1f} MB" if r['output_bytes'] else ""
+            print(f"{r['name']:<48} {r['seconds']:8.3f} 秒  {r['per_sec'] or 0:10.1f} /秒  記憶體峰值 {r['peak_rss_mb']:.0f} MB{size}")
+    report = {'version': 1, 'scale': args.scale, 'seed': args.seed, 'repeat': args.repeat, 'python': platform.python_version(),
+              'pymupdf': fitz.VersionBind, 'platform': platform.platform(), 'cpus': os.cpu_count(), 'results': results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+        print(f"與基準 {args.baseline} 比較 (容許 {args.threshold:.0%})：")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions and args.fail_on_regression: return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="圖片轉 PDF 小工具效能基準測試")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_merge = sub.add_parser("merge", help="比較逐頁 insert_pdf 與區間合併的 PDF 合併耗時")
+    p_merge.add_argument("--pages", type=int, default=2000, help="總頁數")
+    p_merge.add_argument("--files", type=int, default=4, help="來源 PDF 數量")
+    p_suite = sub.add_parser("suite", help="以合成測試資料量測各轉換模式、縮圖產生與清單操作")
+    p_suite.add_argument("--scale", choices=list(CORPUS_SCALES), default="small", help="測試資料規模")
+    p_suite.add_argument("--corpus", help="測試資料資料夾；已存在的檔案會沿用，未指定時使用暫存資料夾")
+    p_suite.add_argument("--seed", type=int, default=0, help="合成圖片的亂數種子")
+    p_suite.add_argument("--repeat", type=int, default=1, help="每個項目執行次數，取最快的一次")
+    p_suite.add_argument("--filter", action="append", default=[], help="只執行名稱包含此字串的項目，可重複指定")
+    p_suite.add_argument("--output", help="將結果寫入 JSON 檔，可作為之後比較的基準")
+    p_suite.add_argument("--baseline", help="與先前輸出的 JSON 結果比較")
+    p_suite.add_argument("--threshold", type=float, default=0.1, help="耗時增加超過此比例視為變慢 (預設 0.1)")
+    p_suite.add_argument("--fail-on-regression", action="store_true", help="有項目變慢時以結束碼 1 結束")
+    args = parser.parse_args(argv)
+    if args.command == "merge": bench_merge(args.pages, args.files)
+    else: return bench_suite(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
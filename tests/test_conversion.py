@@ -0,0 +1,153 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ImageToPdfConverter as converter
+from PIL import Image
+
+try: import resource
+except ImportError: resource = None
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ImageToPdfConverter.py")
+
+
+def make_pdf(path, pages=1, label=""):
+    doc = converter.fitz.open()
+    for n in range(pages):
+        doc.new_page().insert_text((72, 72), f"{label} {n}")
+    doc.save(path); doc.close()
+
+
+class OptionsFromMappingTest(unittest.TestCase):
+    def test_unknown_orientation_and_scale_raise_value_error(self):
+        with self.assertRaisesRegex(ValueError, "orientation"): converter.options_from_mapping({"orientation": "sideways"})
+        with self.assertRaisesRegex(ValueError, "scale"): converter.options_from_mapping({"scale": "stretch"})
+
+    def test_aliases_map_to_labels(self):
+        options = converter.options_from_mapping({"orientation": "landscape", "scale": "original"})
+        self.assertEqual((options.orientation, options.scale_mode), ("橫式", "保持原尺寸"))
+
+
+class PlanConversionTest(unittest.TestCase):
+    def test_rejected_jpeg_is_not_counted_as_passthrough(self):
+        """jpeg_passthrough 拒絕的 JPEG (CMYK) 不可計為原檔直嵌"""
+        with tempfile.TemporaryDirectory() as tmp:
+            rgb, cmyk = os.path.join(tmp, "rgb.jpg"), os.path.join(tmp, "cmyk.jpg")
+            Image.new("RGB", (64, 64), "red").save(rgb, quality=80)
+            Image.new("CMYK", (64, 64), (0, 255, 255, 0)).save(cmyk, quality=80)
+            options = converter.ConversionOptions()
+            self.assertIsNone(converter.jpeg_passthrough(cmyk, options))
+            steps, tasks, stats = converter.plan_conversion(converter.build_items([rgb, cmyk]), options, {})
+            self.assertEqual((stats['passthrough'], stats['embedded'], stats['reencoded']), (1, 1, 0))
+            self.assertEqual([step[0] for step in steps], ['image', 'image'])
+
+
+class CancelAfter:
+    """第 n 次檢查後回報已取消，讓轉換停在指定的頁面邊界"""
+    def __init__(self, n): self.n = n
+    def is_set(self):
+        self.n -= 1
+        return self.n < 0
+
+
+def expand_steps(steps, tasks):
+    """把步驟展開成逐頁的清單，渲染頁附上對應的工作"""
+    pages, t = [], iter(tasks)
+    for step in steps:
+        if step[0] == 'render': pages.extend(('render', key, next(t)) for key in step[1])
+        elif step[0] == 'pdf': pages.extend(('pdf', step[1], p_no) for p_no in range(step[2], step[3] + 1))
+        else: pages.append(step)
+    return pages
+
+
+def page_images(path):
+    with converter.fitz.open(path) as doc: return [page.get_pixmap(dpi=24).samples for page in doc]
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory(); tmp = self.tmp.name
+        a, b = os.path.join(tmp, "a.pdf"), os.path.join(tmp, "b.pdf")
+        make_pdf(a, pages=5, label="a"); make_pdf(b, pages=3, label="b")
+        images = [os.path.join(tmp, name) for name in ("red.png", "blue.png", "red-copy.png")]
+        for path, color in zip(images, ("red", "blue", "red")): Image.new("RGB", (80, 60), color).save(path)
+        # 涵蓋渲染 (灰階圖片)、重複內容 (copy)、合併區間與單頁項目
+        self.items = converter.build_items([a, images[0], b, images[1], images[2]])
+        self.items += [converter.FileEntry(a, 3, 1), converter.FileEntry(a, 4, 1), converter.FileEntry(b, 0, 1)]
+        self.total = sum(item.page_count for item in self.items)
+
+    def tearDown(self): self.tmp.cleanup()
+
+    def options(self, **kwargs): return converter.ConversionOptions(grayscale=True, workers=1, prefetch_bytes=0, **kwargs)
+
+    def test_skip_completed_steps_matches_page_suffix(self):
+        steps, tasks, _ = converter.plan_conversion(self.items, self.options(), {})
+        full = expand_steps(steps, tasks)
+        self.assertEqual(len(full), self.total)
+        for done in range(self.total + 1):
+            remaining, kept = converter.skip_completed_steps(steps, tasks, done)
+            self.assertEqual(expand_steps(remaining, kept), full[done:])
+
+    def test_resume_after_cancel_matches_uninterrupted_output(self):
+        expected, output = os.path.join(self.tmp.name, "expected.pdf"), os.path.join(self.tmp.name, "out.pdf")
+        converter.convert_to_pdf(self.items, expected, self.options())
+        for stop in (0, 2, 5):
+            with self.subTest(stop=stop):
+                with self.assertRaises(converter.ConversionCancelled):
+                    converter.convert_to_pdf(self.items, output, self.options(checkpoint=True, stream_window=2), cancel=CancelAfter(stop))
+                with converter.fitz.open(output + ".part") as part: done = len(part)
+                self.assertTrue(0 < done < self.total)
+                result = converter.convert_to_pdf(self.items, output, self.options(checkpoint=True, stream_window=2))
+                self.assertEqual((result['resumed'], result['pages']), (done, self.total))
+                self.assertEqual(page_images(output), page_images(expected))
+                self.assertFalse(os.path.exists(output + ".part") or os.path.exists(output + ".part.json"))
+                os.remove(output)
+
+
+class MergeFileDescriptorTest(unittest.TestCase):
+    @unittest.skipIf(resource is None, "需要 resource 模組 (POSIX)")
+    def test_merge_more_sources_than_pool_limit(self):
+        """來源數超過文件池上限時，已淘汰的來源必須真正關閉，不可累積檔案描述元"""
+        sources = converter.DEFAULT_MAX_OPEN_DOCS + 86
+        limit = converter.DEFAULT_MAX_OPEN_DOCS + 56  # 低於來源數，來源未關閉就會耗盡
+        with tempfile.TemporaryDirectory() as tmp:
+            src_dir = os.path.join(tmp, "src"); os.mkdir(src_dir)
+            for n in range(sources): make_pdf(os.path.join(src_dir, f"s{n:03d}.pdf"), label=str(n))
+            output = os.path.join(tmp, "out.pdf")
+            hard = resource.getrlimit(resource.RLIMIT_NOFILE)[1]
+            # 關閉預讀，來源一律由磁碟開啟
+            result = subprocess.run(
+                [sys.executable, SCRIPT, "convert", src_dir, "-o", output, "--no-cache", "--prefetch-mb", "0", "--workers", "1"],
+                capture_output=True, text=True, timeout=300, env=dict(os.environ, IMG2PDF_CACHE_DIR=os.path.join(tmp, "cache")),
+                preexec_fn=lambda: resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard)))
+            self.assertEqual(result.returncode, 0, result.stderr)
+            with converter.fitz.open(output) as doc: self.assertEqual(len(doc), sources)
+
+
+class HeadlessTest(unittest.TestCase):
+    def run_without_tk(self, *args, **kwargs):
+        """模擬未安裝 python3-tk 與 tkinterdnd2 的環境執行本程式"""
+        code = ("import runpy, sys; sys.modules.update(tkinter=None, tkinterdnd2=None); "
+                f"sys.argv = [{SCRIPT!r}] + sys.argv[1:]; runpy.run_path({SCRIPT!r}, run_name='__main__')")
+        return subprocess.run([sys.executable, "-c", code, *args], capture_output=True, text=True, timeout=120, **kwargs)
+
+    def test_convert_without_tk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source, output = os.path.join(tmp, "in.pdf"), os.path.join(tmp, "out.pdf")
+            make_pdf(source, pages=2)
+            result = self.run_without_tk("convert", source, "-o", output, "--no-cache", "--workers", "1",
+                                         env=dict(os.environ, IMG2PDF_CACHE_DIR=os.path.join(tmp, "cache")))
+            self.assertEqual(result.returncode, 0, result.stderr)
+            with converter.fitz.open(output) as doc: self.assertEqual(len(doc), 2)
+
+    def test_gui_reports_missing_tk(self):
+        result = self.run_without_tk()
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("python3-tk", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import itertools
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ImageToPdfConverter as converter
+
+
+class PageCountIndexTest(unittest.TestCase):
+    def test_prefix_and_add_match_plain_sums(self):
+        rng = random.Random(7)
+        counts = [rng.randint(0, 50) for _ in range(37)]
+        index = converter.PageCountIndex(counts)
+        for _ in range(200):
+            i = rng.randrange(len(counts)); delta = rng.randint(-counts[i], 20)
+            counts[i] += delta; index.add(i, delta)
+            for n in range(len(counts) + 1): self.assertEqual(index.prefix(n), sum(counts[:n]))
+
+
+class FileListModelTest(unittest.TestCase):
+    """隨機異動 FileListModel，並與單純的串列逐步比對項目、iid、頁數前綴和與來源引用數"""
+    PATHS = [f"/src/{name}" for name in ("a.pdf", "b.pdf", "c.png", "d.jpg", "e.pdf")]
+
+    def setUp(self):
+        self.rng = random.Random(20261017); self.ids = itertools.count(1)
+        self.model = converter.FileListModel(); self.ref = []  # [(項目, iid)]
+
+    def new_items(self):
+        items = []
+        for _ in range(self.rng.randint(1, 4)):
+            path = self.rng.choice(self.PATHS)
+            if self.rng.random() < 0.5: items.append(converter.FileEntry(path, None, self.rng.randint(1, 9)))
+            else: items.append(converter.FileEntry(path, self.rng.randrange(9), 1))
+        return items
+
+    def assign_iids(self):
+        """模擬介面端為新項目建立 Treeview 列"""
+        for i, iid in enumerate(self.model.iids):
+            if iid is None:
+                iid = f"I{next(self.ids)}"; self.model.iids[i] = iid; self.ref[i] = (self.ref[i][0], iid)
+
+    def check(self):
+        model, items = self.model, [item for item, _ in self.ref]
+        self.assertEqual(model.items, items); self.assertEqual(len(model), len(items))
+        self.assertEqual(model.iids, [iid for _, iid in self.ref])
+        for i in range(len(items) + 1): self.assertEqual(model.page_offset(i), sum(item.page_count for item in items[:i]))
+        self.assertEqual(model.total_pages(), sum(item.page_count for item in items))
+        for path in self.PATHS:
+            self.assertEqual(model.refcount(path), sum(item.path == path for item in items))
+            self.assertEqual(model.contains_whole(path), any(item.path == path and item.page is None for item in items))
+
+    def test_random_operations_match_plain_list(self):
+        rng, model, ref = self.rng, self.model, self.ref
+        for _ in range(600):
+            op = rng.choice(('insert', 'insert', 'replace', 'delete', 'swap', 'reorder', 'clear') if ref else ('insert',))
+            if op == 'insert':
+                idx, items = rng.randint(0, len(ref)), self.new_items()
+                model.insert(idx, items); ref[idx:idx] = [(item, None) for item in items]
+            elif op == 'replace':
+                idx, items = rng.randrange(len(ref)), self.new_items()
+                self.assertEqual(model.replace(idx, items), ref[idx][1]); ref[idx:idx + 1] = [(item, None) for item in items]
+            elif op == 'delete':
+                idxs = rng.sample(range(len(ref)), rng.randint(1, len(ref)))
+                removed, released = model.delete(idxs)
+                self.assertEqual(removed, [ref[i] for i in sorted(idxs)])
+                ref[:] = [pair for i, pair in enumerate(ref) if i not in set(idxs)]
+                remaining = {item.path for item, _ in ref}
+                self.assertEqual(released, {item.path for item, _ in removed} - remaining)
+            elif op == 'swap':
+                i, j = rng.randrange(len(ref)), rng.randrange(len(ref))
+                model.swap(i, j); ref[i], ref[j] = ref[j], ref[i]
+            elif op == 'reorder':
+                order = list(range(len(ref))); rng.shuffle(order)
+                model.reorder(order); ref[:] = [ref[i] for i in order]
+            elif rng.random() < 0.2:  # 清空的機率較低，讓清單有機會累積較多項目
+                model.clear(); ref.clear()
+            self.assign_iids(); self.check()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ImageToPdfConverter as converter
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline: raise AssertionError("等待逾時")
+        time.sleep(0.01)
+
+
+class JobSchedulerTest(unittest.TestCase):
+    """以可控制結束時機的假 runner 檢查排程器的放行、優先順序與取消"""
+    def setUp(self):
+        self.started = []; self.release = {}; self.lock = threading.Lock()
+        self.scheduler = None
+
+    def tearDown(self):
+        for event in self.release.values(): event.set()
+        if self.scheduler: self.scheduler.cancel_all(); self.scheduler.wait(5)
+
+    def runner(self, job, progress):
+        with self.lock: self.started.append(job.name)
+        while not self.release[job.name].wait(0.01):
+            if job.cancel.is_set(): raise converter.ConversionCancelled("已取消轉換")
+        if job.name.startswith("fail"): raise ValueError("來源損毀")
+        return job.name
+
+    def make_scheduler(self, **kwargs):
+        self.scheduler = converter.JobScheduler(self.runner, **kwargs); return self.scheduler
+
+    def submit(self, name, priority=0, workers=1):
+        self.release[name] = threading.Event()
+        job = converter.ConversionJob([], f"/tmp/{name}.pdf", converter.ConversionOptions(workers=workers), priority=priority, name=name)
+        return self.scheduler.submit(job)
+
+    def test_max_jobs_and_priority_order(self):
+        scheduler = self.make_scheduler(max_jobs=1, cpu_limit=4, memory_limit_mb=10**6)
+        first = self.submit("first"); wait_until(lambda: first.state == 'running')
+        low, high = self.submit("low"), self.submit("high", priority=5)
+        wait_until(lambda: low.memory_mb is not None and high.memory_mb is not None)
+        self.assertEqual((low.state, high.state), ('queued', 'queued'))
+        self.release["first"].set(); wait_until(lambda: high.state == 'running')
+        self.assertEqual(low.state, 'queued')
+        self.release["high"].set(); self.release["low"].set()
+        self.assertTrue(scheduler.wait(5))
+        self.assertEqual(self.started, ["first", "high", "low"])
+        self.assertEqual([job.result for job in (first, high, low)], ["first", "high", "low"])
+
+    def test_memory_and_cpu_limits_hold_back_jobs(self):
+        # 空清單的作業估計為 JOB_BASE_MEMORY_MB，上限只容得下一個
+        scheduler = self.make_scheduler(max_jobs=4, cpu_limit=4, memory_limit_mb=converter.JOB_BASE_MEMORY_MB * 1.5)
+        a = self.submit("a"); wait_until(lambda: a.state == 'running')
+        b = self.submit("b"); wait_until(lambda: b.memory_mb is not None)
+        self.assertEqual(b.state, 'queued')
+        scheduler.configure(memory_limit_mb=10**6); wait_until(lambda: b.state == 'running')
+        # CPU 已由 a、b 用去 2 個，c 只分到剩餘的 2 個渲染行程；之後 d 因 CPU 用盡而等待
+        c = self.submit("c", workers=8); wait_until(lambda: c.state == 'running')
+        self.assertEqual((c.workers, c.options.workers), (2, 2))
+        d = self.submit("d"); wait_until(lambda: d.memory_mb is not None)
+        self.assertEqual(d.state, 'queued')
+        self.assertEqual(scheduler.stats()['cpu_used'], 4)
+        self.release["c"].set(); wait_until(lambda: d.state == 'running')
+        for name in "abd": self.release[name].set()
+        self.assertTrue(scheduler.wait(5))
+
+    def test_idle_scheduler_admits_oversized_job(self):
+        scheduler = self.make_scheduler(max_jobs=1, cpu_limit=1, memory_limit_mb=1)
+        big = self.submit("big", workers=4); wait_until(lambda: big.state == 'running')
+        self.assertEqual(big.workers, 1)
+        self.release["big"].set(); self.assertTrue(scheduler.wait(5))
+        self.assertEqual(big.state, 'done')
+
+    def test_cancel_queued_and_running_jobs(self):
+        scheduler = self.make_scheduler(max_jobs=1, cpu_limit=1, memory_limit_mb=10**6)
+        running = self.submit("running"); wait_until(lambda: running.state == 'running')
+        queued = self.submit("queued")
+        self.assertTrue(scheduler.cancel(queued.id))
+        self.assertEqual(queued.state, 'cancelled'); self.assertTrue(queued.done.is_set())
+        self.assertTrue(scheduler.cancel(running.id))
+        self.assertTrue(running.done.wait(5)); self.assertEqual(running.state, 'cancelled')
+        self.assertFalse(scheduler.cancel(running.id))
+        self.assertTrue(scheduler.wait(5))
+        self.assertEqual(self.started, ["running"])
+        self.assertEqual(scheduler.stats()['states'], {'cancelled': 2})
+
+    def test_failed_job_releases_slot(self):
+        scheduler = self.make_scheduler(max_jobs=1, cpu_limit=1, memory_limit_mb=10**6)
+        failing, after = self.submit("fail"), self.submit("after")
+        self.release["fail"].set(); self.release["after"].set()
+        self.assertTrue(scheduler.wait(5))
+        self.assertEqual((failing.state, failing.error), ('failed', "來源損毀"))
+        self.assertEqual(after.state, 'done')
+        self.assertEqual(len(scheduler.remove_finished()), 2); self.assertEqual(scheduler.jobs(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ImageToPdfConverter as converter
+
+
+class ServiceOptionsTest(unittest.TestCase):
+    def test_flags_accept_digits_and_words(self):
+        conf = converter.service_options({"grayscale": "0", "despeckle": "false", "flatten": "on", "scan": "1"})
+        self.assertEqual(conf, {"grayscale": False, "despeckle": False, "flatten": True, "scan": True})
+
+    def test_compress_is_quality_or_flag(self):
+        self.assertEqual(converter.service_options({"compress": "70"}), {"compress": 70})
+        self.assertEqual(converter.service_options({"compress": "off"}), {"compress": False})
+
+    def test_invalid_flag_is_rejected(self):
+        with self.assertRaises(converter.ServiceError) as ctx: converter.service_options({"grayscale": "maybe"})
+        self.assertEqual(ctx.exception.status, 400)
+
+
+class ServiceServerTest(unittest.TestCase):
+    def setUp(self):
+        self.service = converter.ConversionService(workers=1, max_pending=2)
+        self.server = converter.create_service_server(self.service, port=0, quiet=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown(); self.server.server_close(); self.service.close()
+
+    def test_rejected_request_does_not_wait_for_more_body(self):
+        """本體已讀完後才發現的錯誤 (未知參數) 不應在持續連線上等待額外的資料"""
+        body = json.dumps({"bogus": 1}).encode()
+        # 直接使用 socket：http.client 收到 HTTP/1.0 回應後會自行關閉連線，無法重現呼叫端保持連線的情況
+        sock = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        try:
+            sock.sendall(b"POST /convert HTTP/1.1\r\nHost: localhost\r\nConnection: keep-alive\r\n"
+                         b"Content-Type: application/json\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+            self.assertTrue(sock.recv(65536).startswith(b"HTTP/1.0 400"))
+            deadline = time.time() + 2  # 處理執行緒結束後才會記錄統計
+            while self.service.metrics.responses[400] == 0 and time.time() < deadline: time.sleep(0.05)
+            self.assertEqual(self.service.metrics.responses[400], 1)
+            self.assertEqual(self.service.metrics.in_flight, 0)
+        finally:
+            sock.close()
+
+    def test_metrics_endpoint(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request("GET", "/metrics")
+        data = json.loads(conn.getresponse().read())
+        self.assertIn("latency", data); self.assertIn("throughput", data)
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()